@@ -32,4 +32,6 @@ from a video sequence using the `collect` module.
 Given the camera model the images and videos can be undistorted, as a result the straight lines
 should appear straight in the undistorted images.
 """
-from .camera_model import CameraModel, CalibrationPattern
+from .camera_model import CameraModel, CalibrationPattern, MapFormat, UndistortionPlan
+from .detection import CalibrationPoints, DetectionMode, DetectionOptions
+from .reprojection import ReprojectionError
@@ -0,0 +1,5 @@
+#!/usr/bin/env python
+"""
+Module for measuring the performance of the library
+"""
+from .benchmark import benchmark_map_formats, benchmark_corner_detection
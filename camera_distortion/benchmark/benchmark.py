@@ -0,0 +1,665 @@
+#!/usr/bin/env python
+"""
+The performance of the undistortion can be measured on synthetic data.
+The benchmarks use the given camera parameters or a typical action-camera model
+and report the results as a dictionary, which is also logged by the script.
+"""
+__author__ = "Peter Kocsis"
+__copyright__ = "Peter Kocsis"
+__credits__ = ["MIT License"]
+__version__ = "0.1"
+__maintainer__ = "Peter Kocsis"
+__email__ = "peter.kocsis@tum.de"
+__status__ = "Released"
+
+import argparse
+import logging
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Callable, List, Tuple, Union
+
+import cv2
+import numpy as np
+from PIL import Image
+
+import camera_distortion
+from camera_distortion.camera_model import CameraModel, CalibrationPattern, MapFormat
+from camera_distortion.detection import DetectionMode, detect_calibration_points_in_file
+from camera_distortion.undistortion.undistort import undistort_image
+from camera_distortion.util.buffer_pool import BufferPool
+from camera_distortion.util.cache import nbytes
+from camera_distortion.util.io import find_images
+from camera_distortion.util.logger import init_logger
+
+logger = logging.getLogger(__file__)
+
+
+def benchmark_argsparser() -> argparse.ArgumentParser:
+    """
+    Creates a parser for the script's arguments
+    :returns: ArgumentParser object for parsing the script's arguments
+    """
+    parser = argparse.ArgumentParser(
+        description="Script for measuring the performance of the undistortion."
+    )
+    parser.add_argument(
+        "-p",
+        "--parameters",
+        type=str,
+        default=None,
+        help="Path of the file containing the camera parameters, "
+        "a typical action-camera model is used if not given",
+    )
+    parser.add_argument(
+        "-r", "--repeats", type=int, default=5, help="Number of the repetitions"
+    )
+    subparsers = parser.add_subparsers(dest="benchmark", required=True)
+
+    map_formats_parser = subparsers.add_parser(
+        "map_formats", help="Compare the float and the fixed-point undistortion maps"
+    )
+    map_formats_parser.add_argument("--width", type=int, default=7680)
+    map_formats_parser.add_argument("--height", type=int, default=4320)
+    map_formats_parser.add_argument("-c", "--crop", type=float, default=0.0)
+
+    points_parser = subparsers.add_parser(
+        "points", help="Measure the bulk undistortion and distortion of points"
+    )
+    points_parser.add_argument("--width", type=int, default=1920)
+    points_parser.add_argument("--height", type=int, default=1080)
+    points_parser.add_argument("-c", "--crop", type=float, default=0.0)
+    points_parser.add_argument(
+        "-n", "--num_points", type=int, default=1000000, help="Number of the points"
+    )
+
+    redistortion_parser = subparsers.add_parser(
+        "redistortion", help="Measure the undistortion and redistortion round trip"
+    )
+    redistortion_parser.add_argument("--width", type=int, default=1920)
+    redistortion_parser.add_argument("--height", type=int, default=1080)
+    redistortion_parser.add_argument("-c", "--crop", type=float, default=0.0)
+
+    interpolation_parser = subparsers.add_parser(
+        "map_interpolation",
+        help="Compare the exact and the interpolated redistortion maps",
+    )
+    interpolation_parser.add_argument("--width", type=int, default=3840)
+    interpolation_parser.add_argument("--height", type=int, default=2160)
+    interpolation_parser.add_argument("-c", "--crop", type=float, default=0.0)
+    interpolation_parser.add_argument(
+        "-e", "--max_map_error", type=float, default=0.05
+    )
+
+    image_path_parser = subparsers.add_parser(
+        "image_path",
+        help="Compare the copying and the pooled undistortion of image files",
+    )
+    image_path_parser.add_argument("--width", type=int, default=6000)
+    image_path_parser.add_argument("--height", type=int, default=4000)
+    image_path_parser.add_argument("-c", "--crop", type=float, default=0.0)
+    image_path_parser.add_argument(
+        "-n", "--num_images", type=int, default=8, help="Number of the images in the batch"
+    )
+
+    startup_parser = subparsers.add_parser(
+        "startup",
+        help="Measure the import time of the package and the time to the first undistorted "
+        "image of the script",
+    )
+    startup_parser.add_argument("--width", type=int, default=1920)
+    startup_parser.add_argument("--height", type=int, default=1080)
+    startup_parser.add_argument("-c", "--crop", type=float, default=0.0)
+    startup_parser.add_argument(
+        "-n", "--num_images", type=int, default=4, help="Number of the images in the batch"
+    )
+
+    detection_parser = subparsers.add_parser(
+        "corner_detection",
+        help="Compare the full-resolution and the pyramid calibration pattern detection",
+    )
+    detection_parser.add_argument(
+        "-i", "--images", type=str, help="Path of the folder of calibration images"
+    )
+    detection_parser.add_argument("-cw", "--calib_width", type=int, default=9)
+    detection_parser.add_argument("-ch", "--calib_height", type=int, default=6)
+    return parser
+
+
+def default_camera_model() -> CameraModel:
+    """
+    Creates a camera model with strong barrel distortion typical for action cameras
+    :returns: The camera model
+    """
+    return CameraModel.from_values(
+        "benchmark",
+        np.array([[0.47, 0.0, 0.5], [0.0, 0.84, 0.5], [0.0, 0.0, 1.0]]),
+        np.array([[-0.26, 0.08, 0.0005, -0.0003, -0.011]]),
+    )
+
+
+def synthetic_image(image_size: Tuple[int, int], channels: int = 3) -> np.ndarray:
+    """
+    Creates a random test image
+    :param image_size: The size of the image (width, height)
+    :param channels: The number of the color channels
+    :returns: The image as numpy array
+    """
+    width, height = image_size
+    generator = np.random.default_rng(0)
+    return generator.integers(0, 256, (height, width, channels), dtype=np.uint8)
+
+
+def measure(function: Callable, repeats: int) -> float:
+    """
+    Measures the execution time of a function
+    :param function: The function to be measured
+    :param repeats: The number of the repetitions
+    :returns: The best execution time in seconds
+    """
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def benchmark_map_formats(
+    camera_model: CameraModel,
+    image_size: Tuple[int, int],
+    crop: float,
+    repeats: int = 5,
+) -> dict:
+    """
+    Compares the float and the fixed-point undistortion maps
+    :param camera_model: The camera model
+    :param image_size: The size of the image (width, height)
+    :param crop: Cropping parameter for the undistortion
+    :param repeats: The number of the repetitions
+    :returns: The memory usage, the remap time and the deviation of the two formats
+    """
+    image = synthetic_image(image_size)
+    float_maps = camera_model.get_undistortion_mapping(
+        image_size, crop, use_cache=False, map_format=MapFormat.FLOAT
+    )
+    fixed_maps = camera_model.get_undistortion_mapping(
+        image_size, crop, use_cache=False, map_format=MapFormat.FIXED
+    )
+
+    float_time = measure(
+        lambda: cv2.remap(image, *float_maps, cv2.INTER_LINEAR), repeats
+    )
+    fixed_time = measure(
+        lambda: cv2.remap(image, *fixed_maps, cv2.INTER_LINEAR), repeats
+    )
+    float_result = cv2.remap(image, *float_maps, cv2.INTER_LINEAR)
+    fixed_result = cv2.remap(image, *fixed_maps, cv2.INTER_LINEAR)
+    deviation = np.abs(float_result.astype(np.int16) - fixed_result)
+    return {
+        "float_map_bytes": nbytes(float_maps),
+        "fixed_map_bytes": nbytes(fixed_maps),
+        "saved_bytes": nbytes(float_maps) - nbytes(fixed_maps),
+        "float_remap_seconds": float_time,
+        "fixed_remap_seconds": fixed_time,
+        "remap_speedup": float_time / fixed_time,
+        "max_intensity_deviation": int(deviation.max()),
+        "mean_intensity_deviation": float(deviation.mean()),
+    }
+
+
+# pylint: disable=too-many-locals
+def benchmark_points(
+    camera_model: CameraModel,
+    image_size: Tuple[int, int],
+    crop: float,
+    num_of_points: int = 1000000,
+    repeats: int = 5,
+) -> dict:
+    """
+    Measures the bulk undistortion and distortion of points and compares them with OpenCV
+    :param camera_model: The camera model
+    :param image_size: The size of the image (width, height)
+    :param crop: Cropping parameter for the undistortion
+    :param num_of_points: The number of the points
+    :param repeats: The number of the repetitions
+    :returns: The throughputs and the deviations from the undistortion maps
+    """
+    generator = np.random.default_rng(0)
+    plan = camera_model.compile(image_size, crop)
+    points = generator.random((num_of_points, 2)) * (np.array(image_size) - 1)
+
+    undistort_time = measure(lambda: plan.undistort_points(points), repeats)
+    undistorted = plan.undistort_points(points)
+    invertible = ~np.isnan(undistorted).any(axis=1)
+    distort_time = measure(lambda: plan.distort_points(undistorted), repeats)
+    roundtrip = np.abs(
+        plan.distort_points(undistorted[invertible]) - points[invertible]
+    )
+
+    # The default OpenCV undistortion for reference
+    opencv_time = measure(
+        lambda: cv2.undistortPoints(
+            points.reshape(-1, 1, 2),
+            plan.intrinsic_matrix,
+            plan.distortion_coeffs,
+            P=plan.new_intrinsic_matrix,
+        ),
+        repeats,
+    )
+    opencv_undistorted = cv2.undistortPoints(
+        points.reshape(-1, 1, 2),
+        plan.intrinsic_matrix,
+        plan.distortion_coeffs,
+        P=plan.new_intrinsic_matrix,
+    ).reshape(-1, 2)
+
+    # The distortion of the pixel centers must match the undistortion maps
+    pixels = generator.integers(0, image_size, (min(num_of_points, 100000), 2))
+    map_x, map_y = plan.maps
+    map_points = np.stack(
+        (map_x[pixels[:, 1], pixels[:, 0]], map_y[pixels[:, 1], pixels[:, 0]]), axis=1
+    )
+    inside = np.all((map_points >= 0) & (map_points < image_size), axis=1)
+    map_deviation = np.abs(plan.distort_points(pixels) - map_points)[inside]
+    return {
+        "points": num_of_points,
+        "undistort_points_per_second": num_of_points / undistort_time,
+        "distort_points_per_second": num_of_points / distort_time,
+        "opencv_undistort_points_per_second": num_of_points / opencv_time,
+        "non_invertible_points": int(np.count_nonzero(~invertible)),
+        "max_roundtrip_error_pixels": float(roundtrip.max(initial=0.0)),
+        "max_opencv_deviation_pixels": float(
+            np.abs(opencv_undistorted - undistorted)[invertible].max(initial=0.0)
+        ),
+        "max_map_deviation_pixels": float(map_deviation.max(initial=0.0)),
+    }
+
+
+def benchmark_redistortion(
+    camera_model: CameraModel,
+    image_size: Tuple[int, int],
+    crop: float,
+    repeats: int = 5,
+) -> dict:
+    """
+    Measures the undistortion and redistortion round trip
+    :param camera_model: The camera model
+    :param image_size: The size of the image (width, height)
+    :param crop: Cropping parameter for the undistortion
+    :param repeats: The number of the repetitions
+    :returns: The creation time of the maps, the remap times and the round trip error
+              on the pixels which are inside of the undistorted image
+    """
+    # Smooth image, the round trip of noise is dominated by the resampling
+    image = cv2.GaussianBlur(synthetic_image(image_size), (0, 0), 3)
+
+    start = time.perf_counter()
+    undistortion = camera_model.compile(image_size, crop, use_cache=False)
+    undistortion_map_time = time.perf_counter() - start
+    start = time.perf_counter()
+    redistortion = camera_model.compile(
+        image_size, crop, use_cache=False, redistort=True
+    )
+    redistortion_map_time = time.perf_counter() - start
+
+    undistorted = undistortion.apply(image)
+    redistorted = redistortion.apply(undistorted)
+    map_x, map_y = redistortion.maps
+    inside = (map_x >= 0) & (map_y >= 0)
+    inside &= (map_x <= image_size[0] - 1) & (map_y <= image_size[1] - 1)
+    deviation = np.abs(redistorted.astype(np.int16) - image)[inside]
+    return {
+        "undistortion_map_seconds": undistortion_map_time,
+        "redistortion_map_seconds": redistortion_map_time,
+        "undistort_seconds": measure(lambda: undistortion.apply(image), repeats),
+        "redistort_seconds": measure(lambda: redistortion.apply(undistorted), repeats),
+        "round_trip_pixel_ratio": float(inside.mean()),
+        "max_round_trip_deviation": int(deviation.max(initial=0)),
+        "mean_round_trip_deviation": float(deviation.mean()) if deviation.size else 0.0,
+    }
+
+
+def benchmark_map_interpolation(
+    camera_model: CameraModel,
+    image_size: Tuple[int, int],
+    crop: float,
+    max_map_error: float,
+) -> dict:
+    """
+    Compares the exact redistortion maps with the maps interpolated from a coarse grid
+    :param camera_model: The camera model
+    :param image_size: The size of the image (width, height)
+    :param crop: Cropping parameter for the undistortion
+    :param max_map_error: The maximal positional error of the interpolated maps in pixels
+    :returns: The creation times and the positional error of the interpolated maps on the pixels
+              which are mapped into the undistorted image
+    """
+    width, height = image_size
+    previous_max_map_error = CameraModel.max_map_error
+    try:
+        CameraModel.max_map_error = None
+        start = time.perf_counter()
+        exact_x, exact_y = camera_model.get_redistortion_mapping(
+            image_size, crop, use_cache=False
+        )
+        exact_time = time.perf_counter() - start
+        CameraModel.max_map_error = max_map_error
+        start = time.perf_counter()
+        map_x, map_y = camera_model.get_redistortion_mapping(
+            image_size, crop, use_cache=False
+        )
+        interpolated_time = time.perf_counter() - start
+    finally:
+        CameraModel.max_map_error = previous_max_map_error
+
+    inside = (exact_x >= -1) & (exact_y >= -1)
+    inside &= (exact_x <= width) & (exact_y <= height)
+    deviation = np.hypot(map_x - exact_x, map_y - exact_y)[inside]
+    return {
+        "exact_map_seconds": exact_time,
+        "interpolated_map_seconds": interpolated_time,
+        "speedup": exact_time / interpolated_time if interpolated_time > 0 else 0.0,
+        "max_map_error_pixels": max_map_error,
+        "max_deviation_pixels": float(deviation.max(initial=0.0)),
+        "mean_deviation_pixels": float(deviation.mean()) if deviation.size else 0.0,
+    }
+
+
+def _copying_undistort_image(
+    image_path: str, out_folder: str, camera_model: CameraModel, crop: float
+):
+    """
+    Undistorts an image file with the color conversions and copies of the former image path,
+    the reference of `benchmark_image_path`
+    :param image_path: The path of the image
+    :param out_folder: The output folder path
+    :param camera_model: The camera model
+    :param crop: Cropping parameter for the undistortion
+    """
+    image = Image.open(image_path)
+    image_data = cv2.cvtColor(np.array(image), cv2.COLOR_RGB2BGR)
+    undistorted_image_data = camera_model.undistort_image(image_data, crop)
+    undistorted_image = Image.fromarray(
+        cv2.cvtColor(np.array(undistorted_image_data), cv2.COLOR_BGR2RGB)
+    )
+    undistorted_image.save(
+        os.path.join(out_folder, os.path.basename(image_path)),
+        exif=image.info["exif"],
+    )
+
+
+def benchmark_image_path(
+    camera_model: CameraModel,
+    image_size: Tuple[int, int],
+    crop: float,
+    num_of_images: int,
+) -> dict:
+    """
+    Compares the former copying image path with the pooled one of `undistort_image`
+    on a batch of JPEG images
+    :param camera_model: The camera model
+    :param image_size: The size of the images (width, height)
+    :param crop: Cropping parameter for the undistortion
+    :param num_of_images: The number of the images in the batch
+    :returns: The CPU time per image of the whole file and of the in-memory part, the peak of the
+              traced array memory and the allocations and reuses of the output buffers
+    """
+    results = {}
+    with tempfile.TemporaryDirectory() as folder:
+        exif = Image.Exif()
+        exif[0x010F] = "benchmark"  # Make
+        image = Image.fromarray(cv2.GaussianBlur(synthetic_image(image_size), (0, 0), 3))
+        image_paths = []
+        for index in range(num_of_images):
+            image_path = os.path.join(folder, f"image_{index}.jpg")
+            image.save(image_path, exif=exif.tobytes())
+            image_paths.append(image_path)
+        out_folder = os.path.join(folder, "out")
+        os.makedirs(out_folder)
+        # The maps are created beforehand, only the image path is measured
+        camera_model.compile(image_size, crop)
+        image_data = np.asarray(image)
+
+        buffers = BufferPool()
+        variants = {
+            "copying": (
+                lambda path: _copying_undistort_image(path, out_folder, camera_model, crop),
+                lambda: cv2.cvtColor(
+                    np.array(
+                        camera_model.undistort_image(
+                            cv2.cvtColor(np.array(image_data), cv2.COLOR_RGB2BGR), crop
+                        )
+                    ),
+                    cv2.COLOR_BGR2RGB,
+                ),
+            ),
+            "pooled": (
+                lambda path: undistort_image(
+                    path, out_folder, camera_model, crop, buffers=buffers
+                ),
+                lambda: buffers.release(
+                    camera_model.undistort_image(
+                        image_data,
+                        crop,
+                        dst=buffers.acquire(image_data.shape, image_data.dtype),
+                    )
+                ),
+            ),
+        }
+        for name, (undistort_file, undistort_array) in variants.items():
+            start = time.process_time()
+            for image_path in image_paths:
+                undistort_file(image_path)
+            results[f"{name}_cpu_seconds_per_image"] = (
+                time.process_time() - start
+            ) / num_of_images
+            start = time.process_time()
+            for _ in range(num_of_images):
+                undistort_array()
+            results[f"{name}_in_memory_cpu_seconds_per_image"] = (
+                time.process_time() - start
+            ) / num_of_images
+            tracemalloc.start()
+            for image_path in image_paths:
+                undistort_file(image_path)
+            results[f"{name}_peak_array_megabytes"] = (
+                tracemalloc.get_traced_memory()[1] / 1024 ** 2
+            )
+            tracemalloc.stop()
+    results["pooled_buffer_allocations"] = buffers.allocations
+    results["pooled_buffer_reuses"] = buffers.reuses
+    return results
+
+
+def _run_python(arguments: List[str]) -> subprocess.CompletedProcess:
+    """
+    Runs a fresh Python interpreter which finds this package
+    :param arguments: The arguments of the interpreter
+    :returns: The completed process
+    """
+    environment = dict(os.environ)
+    package_root = os.path.dirname(os.path.dirname(os.path.abspath(camera_distortion.__file__)))
+    environment["PYTHONPATH"] = os.pathsep.join(
+        filter(None, [package_root, environment.get("PYTHONPATH")])
+    )
+    return subprocess.run(
+        [sys.executable, *arguments],
+        env=environment,
+        check=True,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.DEVNULL,
+        universal_newlines=True,
+    )
+
+
+# pylint: disable=too-many-locals
+def benchmark_startup(
+    camera_model: CameraModel,
+    image_size: Tuple[int, int],
+    crop: float,
+    num_of_images: int,
+    repeats: int = 5,
+) -> dict:
+    """
+    Measures the startup in fresh interpreters: the import of the package and the undistortion
+    script until it saves its first image
+    :param camera_model: The camera model
+    :param image_size: The size of the images (width, height)
+    :param crop: Cropping parameter for the undistortion
+    :param num_of_images: The number of the images in the batch
+    :param repeats: The number of the repetitions
+    :returns: The best times of the interpreter startup, the import and the script, and whether
+              the import loads moviepy
+    """
+    results = {
+        "interpreter_seconds": measure(lambda: _run_python(["-c", "pass"]), repeats),
+        "import_seconds": measure(
+            lambda: _run_python(["-c", "import camera_distortion"]), repeats
+        ),
+    }
+    loaded = _run_python(
+        ["-c", "import sys, camera_distortion; print('moviepy' in sys.modules)"]
+    ).stdout
+    results["import_moviepy_loaded"] = loaded.strip() == "True"
+
+    with tempfile.TemporaryDirectory() as folder:
+        exif = Image.Exif()
+        exif[0x010F] = "benchmark"  # Make
+        image = Image.fromarray(synthetic_image(image_size))
+        image_folder = os.path.join(folder, "images")
+        os.makedirs(image_folder)
+        for index in range(num_of_images):
+            image.save(os.path.join(image_folder, f"image_{index}.jpg"), exif=exif.tobytes())
+        parameters_file = os.path.join(folder, "parameters.json")
+        camera_model.save(parameters_file)
+
+        first_image_times, total_times = [], []
+        for repeat in range(repeats):
+            # Every run writes into a new folder, the completed images would be skipped
+            out_folder = os.path.join(folder, f"out_{repeat}")
+            start = time.time()
+            _run_python(
+                [
+                    "-m",
+                    "camera_distortion.undistortion.undistort",
+                    image_folder,
+                    "-p",
+                    parameters_file,
+                    "-c",
+                    str(crop),
+                    "-o",
+                    out_folder,
+                    "--no_map_store",
+                ]
+            )
+            total_times.append(time.time() - start)
+            # The outputs are written completely before renamed, the earliest one is the first
+            first_image = min(
+                entry.stat().st_mtime
+                for entry in os.scandir(out_folder)
+                if not entry.name.startswith(".")
+            )
+            first_image_times.append(first_image - start)
+    results["script_first_image_seconds"] = min(first_image_times)
+    results["script_seconds"] = min(total_times)
+    return results
+
+
+# pylint: disable=unsubscriptable-object
+def benchmark_corner_detection(
+    image_paths: Union[List[str], str], calib_pattern: CalibrationPattern
+) -> dict:
+    """
+    Compares the full-resolution and the pyramid calibration pattern detection
+    :param image_paths: Path or list of paths to images or folders containing the images
+    :param calib_pattern: The used calibration pattern
+    :returns: The detection time, the number of the found patterns
+              and the deviation of the corners found by both modes
+    """
+    image_paths = find_images(image_paths)
+    pattern_size = (calib_pattern.calib_width, calib_pattern.calib_height)
+    results = {"images": len(image_paths)}
+    detections = {}
+    for detection_mode in DetectionMode:
+        start = time.perf_counter()
+        detections[detection_mode] = [
+            detect_calibration_points_in_file(image_path, pattern_size, detection_mode)
+            for image_path in image_paths
+        ]
+        elapsed = time.perf_counter() - start
+        results[f"{detection_mode.value}_seconds_per_image"] = elapsed / max(
+            len(image_paths), 1
+        )
+        results[f"{detection_mode.value}_found"] = sum(
+            found for found, _, _ in detections[detection_mode]
+        )
+
+    deviations = [
+        np.linalg.norm(full_corners - pyramid_corners, axis=-1)
+        for (full_found, full_corners, _), (pyramid_found, pyramid_corners, _) in zip(
+            detections[DetectionMode.FULL], detections[DetectionMode.PYRAMID]
+        )
+        if full_found and pyramid_found
+    ]
+    if deviations:
+        deviations = np.concatenate(deviations)
+        results["mean_corner_deviation_pixels"] = float(deviations.mean())
+        results["max_corner_deviation_pixels"] = float(deviations.max())
+    results["speedup"] = (
+        results["full_seconds_per_image"] / results["pyramid_seconds_per_image"]
+        if results["pyramid_seconds_per_image"] > 0
+        else 0.0
+    )
+    return results
+
+
+def run_benchmark(arguments: argparse.Namespace) -> dict:
+    """
+    Runs the benchmark selected by the script's arguments
+    :param arguments: The parsed arguments
+    :returns: The results of the benchmark
+    """
+    if arguments.parameters is None:
+        camera_model = default_camera_model()
+    else:
+        camera_model = CameraModel.from_json(arguments.parameters)
+
+    image_size = (arguments.width, arguments.height)
+    benchmarks = {
+        "map_formats": lambda: benchmark_map_formats(
+            camera_model, image_size, arguments.crop, arguments.repeats
+        ),
+        "points": lambda: benchmark_points(
+            camera_model, image_size, arguments.crop, arguments.num_points, arguments.repeats
+        ),
+        "redistortion": lambda: benchmark_redistortion(
+            camera_model, image_size, arguments.crop, arguments.repeats
+        ),
+        "map_interpolation": lambda: benchmark_map_interpolation(
+            camera_model, image_size, arguments.crop, arguments.max_map_error
+        ),
+        "image_path": lambda: benchmark_image_path(
+            camera_model, image_size, arguments.crop, arguments.num_images
+        ),
+        "startup": lambda: benchmark_startup(
+            camera_model, image_size, arguments.crop, arguments.num_images, arguments.repeats
+        ),
+        "corner_detection": lambda: benchmark_corner_detection(
+            arguments.images,
+            CalibrationPattern(arguments.calib_width, arguments.calib_height, 1.0),
+        ),
+    }
+    if arguments.benchmark not in benchmarks:
+        raise ValueError(f"Unknown benchmark {arguments.benchmark}")
+    return benchmarks[arguments.benchmark]()
+
+
+if __name__ == "__main__":
+    benchmark_arguments = benchmark_argsparser().parse_args(sys.argv[1:])
+    init_logger(logger)
+    for result_name, result in run_benchmark(benchmark_arguments).items():
+        logger.info("%s: %s", result_name, result)
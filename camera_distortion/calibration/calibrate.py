@@ -19,9 +19,16 @@ import argparse
 import logging
 import os
 import sys
+from typing import Union
 
 from camera_distortion.util.logger import init_logger
 from camera_distortion import CameraModel, CalibrationPattern
+from camera_distortion.detection import DetectionMode, DetectionOptions
+from camera_distortion.view_selection import ViewSelector
+from camera_distortion.util.detection_cache import (
+    DetectionCache,
+    default_detection_cache_path,
+)
 
 logger = logging.getLogger(__file__)
 
@@ -41,6 +48,27 @@ def calibrate_argsparser() -> argparse.ArgumentParser:
         type=str,
         help="Path of the folder containing calibration images",
     )
+    parser.add_argument(
+        "-v",
+        "--video",
+        type=str,
+        default=None,
+        help="Path of a calibration video, calibrates from its frames instead of images",
+    )
+    parser.add_argument(
+        "-s",
+        "--stride",
+        type=int,
+        default=10,
+        help="Every stride-th frame of the calibration video is scanned for the pattern",
+    )
+    parser.add_argument(
+        "-sf",
+        "--save_frames",
+        type=str,
+        default=None,
+        help="Folder for saving the frames of the video used for the calibration",
+    )
     parser.add_argument(
         "-cam", "--camera", type=str, default="custom", help="The name of the camera"
     )
@@ -79,14 +107,75 @@ def calibrate_argsparser() -> argparse.ArgumentParser:
         default=False,
         help="Show calibration points",
     )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=1,
+        help="Number of the worker processes detecting the calibration points, "
+        "0 uses every CPU core. Ignored if the calibration points are shown",
+    )
+    parser.add_argument(
+        "-dm",
+        "--detection_mode",
+        type=str,
+        choices=[detection_mode.value for detection_mode in DetectionMode],
+        default=DetectionMode.FULL.value,
+        help="Mode of the calibration pattern detection. 'pyramid' detects on downscaled "
+        "greyscale images and refines on the full resolution, faster on large images",
+    )
+    parser.add_argument(
+        "-mv",
+        "--max_views",
+        type=int,
+        default=None,
+        help="Use only this many diverse views for the calibration, stop the detection once "
+        "they are found and drop the outlier views. All the views are used if not given",
+    )
+    parser.add_argument(
+        "-ct",
+        "--coverage_target",
+        type=float,
+        default=0.8,
+        help="Ratio of the image which needs to be covered by the calibration points "
+        "before the detection stops, used with --max_views",
+    )
+    parser.add_argument(
+        "-u",
+        "--update",
+        type=str,
+        default=None,
+        help="Path of an existing parameter file, which is updated with the images "
+        "starting from its parameters",
+    )
+    parser.add_argument(
+        "-dc",
+        "--detection_cache",
+        type=str,
+        default=default_detection_cache_path(),
+        help="File for caching the detected calibration points between the runs",
+    )
+    parser.add_argument(
+        "--no_detection_cache",
+        action="store_true",
+        default=False,
+        help="Detect the calibration points on every image again",
+    )
     return parser
 
 
+# pylint: disable=too-many-arguments,unsubscriptable-object
 def calibrate(
     image_folder_path: str,
     calib_pattern: CalibrationPattern,
     camera_name: str,
     show_points: bool,
+    workers: int = 1,
+    detection_mode: DetectionMode = DetectionMode.FULL,
+    detection_cache: Union[str, None] = None,  # pylint: disable=unsubscriptable-object
+    max_views: Union[int, None] = None,  # pylint: disable=unsubscriptable-object
+    coverage_target: float = 0.8,
+    previous_parameters: Union[str, None] = None,
 ) -> str:
     """
     This function determines the camera calibration parameters using 'png' and 'jpg'
@@ -99,13 +188,37 @@ def calibrate(
     :param calib_pattern: The used calibration pattern
     :param camera_name: The name of the camera
     :param show_points: Indicates whether to show calibration points or not
+    :param workers: Number of the worker processes detecting the calibration points
+    :param detection_mode: The mode of the calibration pattern detection
+    :param detection_cache: File for caching the detected calibration points, not cached if None
+    :param max_views: The number of the diverse views used for the calibration, see
+                      `ViewSelector`, every view is used if None
+    :param coverage_target: The ratio of the image covered by the calibration points before the
+                            detection stops, used with `max_views`
+    :param previous_parameters: Path of an existing parameter file, if given the model is
+                                updated starting from its parameters
     :returns: Path to the created parameter file
     """
-    # Calculate the camera parameters
-    camera_parameters, total_reproj_error = CameraModel.from_images(
-        image_folder_path, calib_pattern, camera_name, show_points
+    options = DetectionOptions(
+        workers,
+        detection_mode,
+        None
+        if max_views is None
+        else ViewSelector(max_views=max_views, coverage_target=coverage_target),
+        None if detection_cache is None else DetectionCache(detection_cache),
     )
 
+    # Calculate the camera parameters
+    if previous_parameters is None:
+        camera_parameters, reproj_error = CameraModel.from_images(
+            image_folder_path, calib_pattern, camera_name, show_points, options
+        )
+    else:
+        camera_parameters, reproj_error, error_delta = CameraModel.from_json(
+            previous_parameters
+        ).recalibrate(image_folder_path, calib_pattern, options)
+        logger.info("Change of the RMS reprojection error: %+.4f px", error_delta)
+
     # Show parameters
     logger.debug("Camera parameters: %s", camera_parameters)
 
@@ -115,10 +228,58 @@ def calibrate(
     camera_parameters.save(parameter_file)
 
     logger.info(
-        "Calibration finished, total reprojection error: %s, parameters saved to %s",
-        total_reproj_error,
+        "Calibration finished, reprojection error: %s, parameters saved to %s",
+        reproj_error,
         parameter_file,
     )
+    logger.info("Images with the largest errors: %s", reproj_error.worst_views())
+    return parameter_file
+
+
+# pylint: disable=too-many-arguments,unsubscriptable-object
+def calibrate_video(
+    video_path: str,
+    calib_pattern: CalibrationPattern,
+    camera_name: str,
+    num_of_images: int = 20,
+    frame_stride: int = 10,
+    frames_folder: Union[str, None] = None,
+) -> str:
+    """
+    This function determines the camera calibration parameters using a calibration video
+    about a checkerboard calibration image. The frames are detected in memory, no intermediate
+    images are written unless requested.
+
+    :param video_path: Path of the calibration video
+    :param calib_pattern: The used calibration pattern
+    :param camera_name: The name of the camera
+    :param num_of_images: The number of the frames used for the calibration
+    :param frame_stride: Every `frame_stride`-th frame is scanned for the pattern
+    :param frames_folder: Folder for saving the frames used for the calibration, not saved if None
+    :returns: Path to the created parameter file
+    """
+    # Calculate the camera parameters
+    camera_parameters, reproj_error = CameraModel.from_video(
+        video_path,
+        calib_pattern,
+        camera_name,
+        num_of_images,
+        frame_stride,
+        frames_folder,
+    )
+    logger.debug("Camera parameters: %s", camera_parameters)
+
+    # Save data
+    parameter_file = os.path.join(os.path.dirname(video_path), "params.json")
+    logger.debug("Saving camera parameters to %s", parameter_file)
+    camera_parameters.save(parameter_file)
+
+    logger.info(
+        "Calibration finished, reprojection error: %s, parameters saved to %s",
+        reproj_error,
+        parameter_file,
+    )
+    logger.info("Frames with the largest errors: %s", reproj_error.worst_views())
     return parameter_file
 
 
@@ -130,9 +291,27 @@ if __name__ == "__main__":
         calib_height=arguments.calib_height,
         calib_size=arguments.calib_size,
     )
-    calibrate(
-        image_folder_path=arguments.images,
-        calib_pattern=calibration_pattern,
-        camera_name=arguments.camera,
-        show_points=arguments.show_points,
-    )
+    if arguments.video is not None:
+        calibrate_video(
+            video_path=arguments.video,
+            calib_pattern=calibration_pattern,
+            camera_name=arguments.camera,
+            num_of_images=arguments.num_images,
+            frame_stride=arguments.stride,
+            frames_folder=arguments.save_frames,
+        )
+    else:
+        calibrate(
+            image_folder_path=arguments.images,
+            calib_pattern=calibration_pattern,
+            camera_name=arguments.camera,
+            show_points=arguments.show_points,
+            workers=arguments.jobs,
+            detection_mode=DetectionMode(arguments.detection_mode),
+            detection_cache=None
+            if arguments.no_detection_cache
+            else arguments.detection_cache,
+            max_views=arguments.max_views,
+            coverage_target=arguments.coverage_target,
+            previous_parameters=arguments.update,
+        )
@@ -12,16 +12,42 @@ __maintainer__ = "Peter Kocsis"
 __email__ = "peter.kocsis@tum.de"
 __status__ = "Released"
 
+import hashlib
 import json
 import logging
-from typing import Union, List, Tuple
+import os
+from functools import partial
+from typing import TYPE_CHECKING, Union, List, Tuple
 
 import cv2
 import numpy as np
-from moviepy.video.io.VideoFileClip import VideoFileClip
+from camera_distortion.detection import (
+    CalibrationPoints,
+    DetectionOptions,
+    detect_calibration_points_in_files,
+)
+from camera_distortion import point_distortion
+from camera_distortion.frame_selection import save_frames, scan_video, select_frames
+from camera_distortion.reprojection import ReprojectionError, reprojection_error
+from camera_distortion.undistortion_maps import (
+    MapFormat,
+    MapGeometry,
+    create_maps,
+    load_mapping,
+    undistort_image_tiled,
+)
+from camera_distortion.undistortion_plan import UndistortionPlan
+from camera_distortion.view_selection import ViewSelector
+from camera_distortion.util.cache import MapCache
 from camera_distortion.util.json import serialize
+from camera_distortion.util.map_store import MapStore
+from camera_distortion.util.shared_maps import SharedMapRegistry
 from camera_distortion.util.io import find_images
 
+if TYPE_CHECKING:
+    # moviepy is slow to import and only the video functions need it
+    from moviepy.video.io.VideoFileClip import VideoFileClip
+
 
 class CalibrationPattern:
     """
@@ -55,6 +81,7 @@ class CalibrationPattern:
         ].T.reshape(-1, 2)
 
 
+# pylint: disable=too-many-public-methods
 class CameraModel:
     """
     Class for handling the camera model.
@@ -66,6 +93,24 @@ class CameraModel:
 
     logger = logging.getLogger(__name__)
 
+    # Compiled undistortion plans shared by every model, keyed by the mapping key, see `mapping_key`
+    map_cache = MapCache()
+    # The fingerprint, the new intrinsic matrix and the valid region of the undistorted images
+    # derived once for every parameters, image size and cropping
+    _derivations = MapCache(max_bytes=1024 ** 2)
+    # Optional persistent store of the maps, consulted when the maps are not in the cache.
+    # It can be set per model by assigning it to the instance
+    map_store: Union[MapStore, None] = None  # pylint: disable=unsubscriptable-object
+    # Optional maps published in shared memory by another process, consulted before the store.
+    # It can be set per model by assigning it to the instance
+    # pylint: disable=unsubscriptable-object
+    shared_maps: Union[SharedMapRegistry, None] = None
+    # Optional maximal positional error in pixels, the redistortion maps are interpolated from a
+    # coarse grid within this error instead of inverting the distortion on every pixel,
+    # see `map_interpolation`. It can be set per model by assigning it to the instance
+    # pylint: disable=unsubscriptable-object
+    max_map_error: Union[float, None] = None
+
     def __init__(self):
         """
         Initialize empty object.
@@ -112,22 +157,25 @@ class CameraModel:
     @classmethod
     def _find_calibration_points_on_image(
         cls,
-        image_paths: Union[List[str], str],  # pylint: disable=unsubscriptable-object
+        image_paths: List[str],
         calib_pattern: CalibrationPattern,
         show_points: bool,
-    ) -> Tuple[list, list, Tuple[int, int]]:
+        options: DetectionOptions,
+    ) -> CalibrationPoints:
         """
-        Extracts the calibration points on the calibration images
-        :param image_paths: The path or list of paths to the calibrationj images
+        Extracts the calibration points on the calibration images.
+        The results are processed in the order of the images, so the calibration is reproducible.
+        :param image_paths: The list of paths to the calibrationj images
         :param calib_pattern: The used calibration pattern
         :param show_points: Indicates whether to show the found point or not
-        :returns: The found calibration points with reference coordinates and the image shape
+        :param options: The options of the detection, see `DetectionOptions`
+        :returns: The found calibration points with reference coordinates, the view names are
+                  the paths of the images the pattern has been found on
         """
-        calib_object_points = []
         calib_det_points = []
+        calib_image_paths = []
         image_shape = None
-
-        criteria = (cv2.TERM_CRITERIA_EPS + cv2.TERM_CRITERIA_MAX_ITER, 30, 0.1)
+        pattern_size = (calib_pattern.calib_width, calib_pattern.calib_height)
 
         # prepare object points based on the actual dimensions of the calibration board
         # like (0,0,0), (25,0,0), (50,0,0) ....,(200,125,0)
@@ -136,100 +184,123 @@ class CameraModel:
         )
         calibration_object_point[:, :2] = calib_pattern.calibration_points()
 
-        # Loop through the image_pathes.
-        # Find checkerboard corners and save the data to calib_det_points.
-        for image_path in image_paths:
-
-            # Loading image_pathes
-            cls.logger.debug("Loading image %s", image_path)
-            image = cv2.imread(str(image_path))
-
-            # Converting to grayscale
-            cls.logger.debug("Converting image %s to grayscale", image_path)
-            grey_image = cv2.cvtColor(image, cv2.COLOR_RGB2GRAY)
-            image_shape = grey_image.shape
-
-            # Find chessboard corners
-            cls.logger.debug("Find chessboard corners on image %s", image_path)
-            found, corners = cv2.findChessboardCorners(
-                grey_image,
-                (calib_pattern.calib_width, calib_pattern.calib_height),
-                cv2.CALIB_CB_ADAPTIVE_THRESH + cv2.CALIB_CB_NORMALIZE_IMAGE,
-            )
+        view_selector = options.view_selector
+        if view_selector is not None:
+            view_selector.reset()
 
-            if not found:
-                cls.logger.warning("Cannot find corners on image %s", image_path)
-                continue
-
-            cls.logger.debug(
-                "%i corners have been found on image %s", len(corners), image_path
-            )
-
-            # Add the "true" checkerboard corners
-            calib_object_points.append(calibration_object_point)
-
-            # Improve the accuracy of the checkerboard corners found in the image
-            # and save them to the calib_det_points variable.
-            cv2.cornerSubPix(grey_image, corners, (20, 20), (-1, -1), criteria)
-            calib_det_points.append(corners)
-
-            if show_points:
-                # Draw chessboard corners
-                cv2.drawChessboardCorners(
-                    image,
-                    (calib_pattern.calib_width, calib_pattern.calib_height),
-                    corners,
-                    found,
+        # Loop through the detections in the order of the images
+        # and save the found checkerboard corners to calib_det_points.
+        detections = detect_calibration_points_in_files(
+            image_paths, pattern_size, show_points, options
+        )
+        try:
+            for image_path, (found, corners, image_shape) in zip(
+                image_paths, detections
+            ):
+                if not found:
+                    cls.logger.warning("Cannot find corners on image %s", image_path)
+                    continue
+
+                cls.logger.debug(
+                    "%i corners have been found on image %s", len(corners), image_path
                 )
 
-                # Show the image with the chessboard corners overlaid.
-                cv2.imshow("Corners", image)
-
-            # Check for interruption
-            key_code = cv2.waitKey(0)
-            if key_code == 27:
-                cls.logger.debug("ESC pressed, interrupting")
-                raise RuntimeError("The image collection has been interrupted!")
-
-        if show_points:
-            cv2.destroyWindow("Corners")
-
-        return calib_object_points, calib_det_points, image_shape
+                # Add the detected checkerboard corners
+                calib_det_points.append(corners)
+                calib_image_paths.append(image_path)
+
+                if view_selector is not None:
+                    view_selector.add(corners, pattern_size, image_shape)
+                    if view_selector.is_complete():
+                        cls.logger.info(
+                            "Enough diverse views found, stopping the detection"
+                        )
+                        view_selector.stop_detection()
+                        break
+        finally:
+            # Stops the pending detections
+            detections.close()
+
+        # The "true" checkerboard corners are the same on every view
+        return CalibrationPoints(
+            [calibration_object_point] * len(calib_det_points),
+            calib_det_points,
+            image_shape,
+            calib_image_paths,
+        )
 
-    # pylint: disable=too-many-locals
+    # pylint: disable=unsubscriptable-object
     @classmethod
     def _calibrate_model(
         cls,
-        calib_object_points: list,
-        calib_det_points: list,
-        image_shape: Tuple[int, int],
-    ) -> Tuple[np.ndarray, np.ndarray, float]:
+        points: CalibrationPoints,
+        initial_model: Union["CameraModel", None] = None,
+    ) -> Tuple[np.ndarray, np.ndarray, ReprojectionError]:
         """
         Estimate the model parameters given the calibration points and reference points
-        :param calib_object_points: Reference points from the pattern
-        :param calib_det_points: Determined calibration points from the images
-        :param image_shape: The shape of the image
+        :param points: The calibration points of the views
+        :param initial_model: If given, the optimization starts from its parameters
         :returns: The scaled intrinsic camera matrix,
-                  the distortion coefficients and the total reprojection error
+                  the distortion coefficients and the reprojection error
         """
         cls.logger.info("Calibration points collected, calculating camera parameters")
+        image_shape = points.image_shape
+        if initial_model is None:
+            intrinsic_guess, distortion_guess, flags = None, None, 0
+        else:
+            intrinsic_guess = initial_model.scaled_intrinsic_matrix(image_shape[1::-1])
+            distortion_guess = np.array(initial_model.distortion_coeffs, np.float64)
+            flags = cv2.CALIB_USE_INTRINSIC_GUESS
         _, intrinsic_matrix, dist_coefficients, rvecs, tvecs = cv2.calibrateCamera(
-            calib_object_points, calib_det_points, image_shape[::-1], None, None
+            points.object_points,
+            points.image_points,
+            image_shape[::-1],
+            intrinsic_guess,
+            distortion_guess,
+            flags=flags,
         )
 
-        # Calculate the total reprojection error.  The closer to zero the better.
-        errors = []
-        for calib_object_point, calib_det_point, rvec, tvec in zip(
-            calib_object_points, calib_det_points, rvecs, tvecs
-        ):
-            image_points2, _ = cv2.projectPoints(
-                calib_object_point, rvec, tvec, intrinsic_matrix, dist_coefficients
-            )
-            error = cv2.norm(calib_det_point, image_points2, cv2.NORM_L2) / len(
-                image_points2
+        # Calculate the reprojection error.  The closer to zero the better.
+        error = reprojection_error(
+            points, rvecs, tvecs, intrinsic_matrix, dist_coefficients
+        )
+        cls.logger.debug("Views with the largest errors: %s", error.worst_views())
+        return intrinsic_matrix, dist_coefficients, error
+
+    # pylint: disable=unsubscriptable-object
+    @classmethod
+    def _calibrate_selected_views(
+        cls,
+        points: CalibrationPoints,
+        view_selector: ViewSelector,
+        initial_model: Union["CameraModel", None] = None,
+    ) -> Tuple[np.ndarray, np.ndarray, ReprojectionError]:
+        """
+        Estimate the model parameters using only the views selected by the view selector,
+        the outlier views are dropped and the model is re-solved
+        :param points: The calibration points of the views
+        :param view_selector: The view selector, which has seen every view
+        :param initial_model: If given, the optimization starts from its parameters
+        :returns: The scaled intrinsic camera matrix,
+                  the distortion coefficients and the reprojection error
+        """
+        points = points.subset(view_selector.select())
+        while True:
+            (
+                intrinsic_matrix,
+                dist_coefficients,
+                reproject_error,
+            ) = cls._calibrate_model(points, initial_model)
+            outliers = set(view_selector.find_outliers(reproject_error))
+            if not outliers:
+                break
+            cls.logger.info("Dropping %i outlier views", len(outliers))
+            points = points.subset(
+                idx for idx in range(len(points.image_points)) if idx not in outliers
             )
-            errors.append(error)
-        return intrinsic_matrix, dist_coefficients, sum(errors) / len(calib_object_points)
+
+        cls.logger.info("View selection: %s", view_selector.statistics)
+        return intrinsic_matrix, dist_coefficients, reproject_error
 
     @classmethod
     def from_images(
@@ -238,7 +309,8 @@ class CameraModel:
         calib_pattern: CalibrationPattern,
         camera_name: str = "custom",
         show_points: bool = False,
-    ) -> Tuple["CameraModel", float]:
+        options: DetectionOptions = DetectionOptions(),
+    ) -> Tuple["CameraModel", ReprojectionError]:
         """
         Create object by obtaining parameters from calibration images.
         :param image_paths: Path or list of pathes to images or folders containing
@@ -247,8 +319,10 @@ class CameraModel:
         :param camera_name: The name of the camera, default: "custom"
         :param calib_pattern: The used calibration pattern
         :param show_points: Indicates whether to show the extracted points or not
+        :param options: The options of the detection, e.g. the number of the worker processes
+                        or the view selector, see `DetectionOptions`
         :returns: New object with the parameters obtained from the calibration images and the
-                  reprojection error
+                  reprojection error of every used calibration image
         :raise: Runtime error if none of the images contained information for the calibration,
                 i.e. no calibration pattern could be recognized on any of them
         """
@@ -261,14 +335,10 @@ class CameraModel:
             n_images,
         )
 
-        (
-            calib_object_points,
-            calib_det_points,
-            image_shape,
-        ) = cls._find_calibration_points_on_image(
-            image_paths, calib_pattern, show_points
+        points = cls._find_calibration_points_on_image(
+            image_paths, calib_pattern, show_points, options
         )
-        if len(calib_det_points) == 0:
+        if len(points.image_points) == 0:
             raise RuntimeError(
                 "Unable to calculate the parameters, "
                 "none of the given images contained "
@@ -276,19 +346,240 @@ class CameraModel:
             )
 
         # Calibrate the camera
+        if options.view_selector is None:
+            (
+                intrinsic_matrix,
+                dist_coefficients,
+                reproject_error,
+            ) = cls._calibrate_model(points)
+        else:
+            (
+                intrinsic_matrix,
+                dist_coefficients,
+                reproject_error,
+            ) = cls._calibrate_selected_views(points, options.view_selector)
+
+        image_shape = points.image_shape
+        obj = cls.from_values(
+            camera_name,
+            intrinsic_matrix / np.array([image_shape[1], image_shape[0], 1])[:, None],
+            dist_coefficients,
+        )
+
+        return obj, reproject_error
+
+    # pylint: disable=too-many-arguments,too-many-locals,unsubscriptable-object
+    @classmethod
+    def from_video(
+        cls,
+        video_path: str,
+        calib_pattern: CalibrationPattern,
+        camera_name: str = "custom",
+        num_of_images: int = 20,
+        frame_stride: int = 10,
+        frames_folder: Union[str, None] = None,
+    ) -> Tuple["CameraModel", ReprojectionError]:
+        """
+        Create object by obtaining parameters from a calibration video.
+        The decoded frames are streamed into the pattern detection, the corners are kept in
+        memory, so no intermediate images are written. The sharp frames with the most diverse
+        poses are used for the calibration, see `camera_distortion.frame_selection`.
+        :param video_path: Path to the calibration video
+        :param calib_pattern: The used calibration pattern
+        :param camera_name: The name of the camera, default: "custom"
+        :param num_of_images: The number of the frames used for the calibration
+        :param frame_stride: Every `frame_stride`-th frame is scanned for the pattern
+        :param frames_folder: If given, the selected frames are saved to this folder
+        :returns: New object with the parameters obtained from the calibration video and the
+                  reprojection error of every selected frame
+        :raise: Runtime error if the video cannot be opened or the calibration pattern could not
+                be recognized on any of its frames
+        """
+        pattern_size = (calib_pattern.calib_width, calib_pattern.calib_height)
+        video = cv2.VideoCapture(video_path)
+        if not video.isOpened():
+            raise RuntimeError(f"Unable to open video {video_path}")
+
+        try:
+            cls.logger.info("Calculating camera calibration from video %s", video_path)
+            image_shape = (
+                int(video.get(cv2.CAP_PROP_FRAME_HEIGHT)),
+                int(video.get(cv2.CAP_PROP_FRAME_WIDTH)),
+            )
+            detections, num_of_frames = scan_video(
+                video, pattern_size, frame_stride, refine=True
+            )
+            selected = select_frames(detections, num_of_images)
+            cls.logger.info(
+                "%i frames scanned, pattern found on %i, %i selected",
+                num_of_frames,
+                len(detections),
+                len(selected),
+            )
+            if len(selected) == 0:
+                raise RuntimeError(
+                    "Unable to calculate the parameters, "
+                    "none of the frames of the given video contained "
+                    "recognizable calibration pattern!"
+                )
+            if frames_folder is not None:
+                save_frames(
+                    video,
+                    [detection.frame_idx for detection in selected],
+                    frames_folder,
+                    os.path.splitext(os.path.basename(video_path))[0],
+                )
+        finally:
+            video.release()
+
+        calibration_object_point = np.zeros(
+            (calib_pattern.num_of_rectangles(), 3), np.float32
+        )
+        calibration_object_point[:, :2] = calib_pattern.calibration_points()
         (
             intrinsic_matrix,
             dist_coefficients,
-            total_reproject_error,
-        ) = cls._calibrate_model(calib_object_points, calib_det_points, image_shape)
+            reproject_error,
+        ) = cls._calibrate_model(
+            CalibrationPoints(
+                [calibration_object_point] * len(selected),
+                [detection.corners.astype(np.float32) for detection in selected],
+                image_shape,
+                [f"{video_path}:{detection.frame_idx}" for detection in selected],
+            )
+        )
 
         obj = cls.from_values(
             camera_name,
             intrinsic_matrix / np.array([image_shape[1], image_shape[0], 1])[:, None],
             dist_coefficients,
         )
+        return obj, reproject_error
 
-        return obj, total_reproject_error
+    # pylint: disable=unsubscriptable-object
+    def recalibrate(
+        self,
+        image_paths: Union[List[str], str],
+        calib_pattern: CalibrationPattern,
+        options: DetectionOptions = DetectionOptions(),
+    ) -> Tuple["CameraModel", ReprojectionError, float]:
+        """
+        Updates the model with new calibration images.
+        The optimization starts from the parameters of this model, so it converges in fewer
+        iterations. The calibration points of the images already in the detection cache are not
+        detected again, so only the new images need to be processed.
+        :param image_paths: Path or list of pathes to the previous and the new calibration
+                            images or folders containing them
+        :param calib_pattern: The used calibration pattern
+        :param options: The options of the detection, see `from_images`
+        :returns: New object with the updated parameters, its reprojection error and the change
+                  of the RMS reprojection error compared to this model on the same views
+        :raise: Runtime error if none of the images contained the calibration pattern
+        """
+        if options.cache is None:
+            self.logger.warning(
+                "No detection cache is set, every image will be processed again"
+            )
+        image_paths = find_images(image_paths)
+        points = self._find_calibration_points_on_image(
+            image_paths, calib_pattern, False, options
+        )
+        if len(points.image_points) == 0:
+            raise RuntimeError(
+                "Unable to calculate the parameters, "
+                "none of the given images contained "
+                "recognizable calibration pattern!"
+            )
+
+        if options.view_selector is None:
+            (
+                intrinsic_matrix,
+                dist_coefficients,
+                reproject_error,
+            ) = self._calibrate_model(points, self)
+        else:
+            (
+                intrinsic_matrix,
+                dist_coefficients,
+                reproject_error,
+            ) = self._calibrate_selected_views(points, options.view_selector, self)
+
+        image_shape = points.image_shape
+        obj = self.from_values(
+            self.camera_name,
+            intrinsic_matrix / np.array([image_shape[1], image_shape[0], 1])[:, None],
+            dist_coefficients,
+        )
+
+        # Score the previous model on the views used by the new one
+        used_views = set(reproject_error.view_names)
+        previous_error = self.reprojection_error(
+            points.subset(
+                idx
+                for idx, image_path in enumerate(points.view_names)
+                if image_path in used_views
+            )
+        )
+        error_delta = reproject_error.rms - previous_error.rms
+        self.logger.info(
+            "Model updated, RMS reprojection error %.4f -> %.4f px",
+            previous_error.rms,
+            reproject_error.rms,
+        )
+        return obj, reproject_error, error_delta
+
+    def reprojection_error(self, points: CalibrationPoints) -> ReprojectionError:
+        """
+        Scores the model on calibration points not used for its calibration.
+        The pose of every view is estimated with the parameters of the model.
+        :param points: The calibration points of the views
+        :returns: The reprojection error
+        """
+        intrinsic_matrix = self.scaled_intrinsic_matrix(points.image_shape[1::-1])
+        rvecs = []
+        tvecs = []
+        for calib_object_point, calib_det_point in zip(
+            points.object_points, points.image_points
+        ):
+            _, rvec, tvec = cv2.solvePnP(
+                calib_object_point,
+                calib_det_point,
+                intrinsic_matrix,
+                self.distortion_coeffs,
+            )
+            rvecs.append(rvec)
+            tvecs.append(tvec)
+        return reprojection_error(
+            points, rvecs, tvecs, intrinsic_matrix, self.distortion_coeffs
+        )
+
+    def evaluate(
+        self,
+        image_paths: Union[List[str], str],  # pylint: disable=unsubscriptable-object
+        calib_pattern: CalibrationPattern,
+        options: DetectionOptions = DetectionOptions(),
+    ) -> ReprojectionError:
+        """
+        Scores the model on calibration images
+        :param image_paths: Path or list of pathes to images or folders containing
+                             the calibration images
+        :param calib_pattern: The used calibration pattern
+        :param options: The options of the detection, see `DetectionOptions`,
+                        every image is scored, the view selector is not used
+        :returns: The reprojection error of every image containing the calibration pattern
+        :raise: Runtime error if none of the images contained the calibration pattern
+        """
+        image_paths = find_images(image_paths)
+        points = self._find_calibration_points_on_image(
+            image_paths, calib_pattern, False, options._replace(view_selector=None)
+        )
+        if len(points.image_points) == 0:
+            raise RuntimeError(
+                "Unable to evaluate the parameters, "
+                "none of the given images contained "
+                "recognizable calibration pattern!"
+            )
+        return self.reprojection_error(points)
 
     @classmethod
     def from_json(cls, path: str) -> "CameraModel":
@@ -321,63 +612,329 @@ class CameraModel:
         factor = np.append(np.array(image_size), 1)
         return self.intrinsic_matrix * factor[:, None]
 
-    def get_undistortion_mapping(
+    def undistorted_intrinsic_matrix(
         self, image_size: Tuple[int, int], crop: float
-    ) -> Tuple[np.ndarray, np.ndarray]:
+    ) -> np.ndarray:
         """
-        Calculates the mapping between the distorted and undistorted image
+        Calculates the intrinsic matrix of the undistorted image
         :param image_size: The size of the image (width, height)
         :param crop: Cropping parameter for the undistortion
-        :returns: Mapping in x and y directions
+        :returns: The optimal new intrinsic matrix for the given image size and cropping
         """
-        intrinsic_matrix = self.scaled_intrinsic_matrix(image_size)
+        return self._derivation(image_size, crop)[1].copy()
 
-        # Scale the images and create a rectification map.
-        new_mat, _ = cv2.getOptimalNewCameraMatrix(
-            intrinsic_matrix,
-            self.distortion_coeffs,
-            image_size,
-            alpha=crop,
-            centerPrincipalPoint=1,
+    def _derivation(
+        self, image_size: Tuple[int, int], crop: float
+    ) -> Tuple[str, np.ndarray, Tuple[int, int, int, int]]:
+        """
+        Calculates the fingerprint of the model and the intrinsic matrix and the valid region of
+        the undistorted image. They are needed by every undistortion, so they are memoized by the
+        values of the parameters, which are compared instead of hashed.
+        :param image_size: The size of the image (width, height)
+        :param crop: Cropping parameter for the undistortion
+        :returns: The fingerprint, the read-only optimal new intrinsic matrix and the region with
+                  only valid pixels (x, y, width, height)
+        """
+        image_size = tuple(int(size) for size in image_size)
+        parameters = tuple(
+            np.ascontiguousarray(parameter, dtype=np.float64).tobytes()
+            for parameter in (self.intrinsic_matrix, self.distortion_coeffs)
         )
-        return cv2.initUndistortRectifyMap(
-            intrinsic_matrix,
-            self.distortion_coeffs,
-            None,
-            new_mat,
-            image_size,
-            m1type=cv2.CV_32FC1,
+
+        def derive():
+            new_mat, roi = cv2.getOptimalNewCameraMatrix(
+                self.scaled_intrinsic_matrix(image_size),
+                self.distortion_coeffs,
+                image_size,
+                alpha=crop,
+                centerPrincipalPoint=1,
+            )
+            new_mat.flags.writeable = False
+            return self.fingerprint(), new_mat, roi
+
+        return self._derivations.get_or_create(
+            parameters + image_size + (float(crop),), derive
+        )
+
+    def fingerprint(self) -> str:
+        """
+        Calculates a fingerprint of the model parameters
+        :returns: Hash of the intrinsic matrix and the distortion coefficients
+        """
+        digest = hashlib.sha1()
+        for parameter in (self.intrinsic_matrix, self.distortion_coeffs):
+            digest.update(np.ascontiguousarray(parameter, dtype=np.float64).tobytes())
+        return digest.hexdigest()
+
+    def mapping_key(
+        self,
+        image_size: Tuple[int, int],
+        crop: float,
+        map_format: MapFormat = MapFormat.FLOAT,
+        redistort: bool = False,
+    ) -> tuple:
+        """
+        Creates the key identifying the undistortion mapping
+        :param image_size: The size of the image (width, height)
+        :param crop: Cropping parameter for the undistortion
+        :param map_format: The format of the maps
+        :param redistort: Indicates whether the key is of the redistortion mapping
+        :returns: The key of the mapping, including `max_map_error` for interpolated
+                  redistortion maps
+        """
+        width, height = image_size
+        key = (
+            self._derivation(image_size, crop)[0],
+            int(width),
+            int(height),
+            float(crop),
+            MapFormat(map_format).value,
         )
+        if not redistort:
+            return key
+        key += ("redistort",)
+        if self.max_map_error is not None:
+            key += (("max_map_error", float(self.max_map_error)),)
+        return key
+
+    def compile(
+        self,
+        image_size: Tuple[int, int],
+        crop: float,
+        map_format: MapFormat = MapFormat.FLOAT,
+        use_cache: bool = True,
+        redistort: bool = False,
+    ) -> UndistortionPlan:
+        """
+        Compiles the undistortion of the images of a given size into an immutable plan.
+        The plan holds the scaled and the new intrinsic matrices, the valid region and the maps,
+        so applying it does not depend on the model anymore. The plans are cached in
+        `CameraModel.map_cache`, the maps are taken from the `shared_maps` or persisted in the
+        `map_store` of the model if configured.
+        :param image_size: The size of the image (width, height)
+        :param crop: Cropping parameter for the undistortion
+        :param map_format: The format of the maps, see `MapFormat`
+        :param use_cache: Indicates whether to use the map cache and store or not
+        :param redistort: Indicates whether to compile the redistortion of undistorted images
+        :returns: The undistortion plan
+        """
+        image_size = tuple(int(size) for size in image_size)
+        map_format = MapFormat(map_format)
+        key = self.mapping_key(image_size, crop, map_format, redistort)
+
+        def create_plan() -> UndistortionPlan:
+            intrinsic_matrix = self.scaled_intrinsic_matrix(image_size)
+            _, new_mat, roi = self._derivation(image_size, crop)
+            max_map_error = self.max_map_error if redistort else None
+            create = partial(
+                create_maps,
+                MapGeometry(intrinsic_matrix, self.distortion_coeffs, new_mat, image_size),
+                map_format,
+                redistort,
+                max_map_error,
+            )
+            return UndistortionPlan(
+                key,
+                image_size,
+                crop,
+                map_format,
+                intrinsic_matrix,
+                self.distortion_coeffs,
+                new_mat,
+                roi,
+                load_mapping(key, create, self.shared_maps, self.map_store)
+                if use_cache
+                else create(),
+                redistort,
+                max_map_error,
+            )
 
-    def undistort_video(self, video: VideoFileClip, crop: float) -> VideoFileClip:
+        if not use_cache:
+            return create_plan()
+        return self.map_cache.get_or_create(key, create_plan)
+
+    def get_undistortion_mapping(
+        self,
+        image_size: Tuple[int, int],
+        crop: float,
+        use_cache: bool = True,
+        map_format: MapFormat = MapFormat.FLOAT,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Calculates the mapping between the distorted and undistorted image.
+        The mappings are taken from the plan compiled by `compile`, so they are cached the same way.
+        The returned arrays are read-only.
+        :param image_size: The size of the image (width, height)
+        :param crop: Cropping parameter for the undistortion
+        :param use_cache: Indicates whether to use the map cache and store or not
+        :param map_format: The format of the maps, see `MapFormat`
+        :returns: Mapping in x and y directions for `MapFormat.FLOAT`, the packed coordinates and
+                  the interpolation table for `MapFormat.FIXED`
+        """
+        return self.compile(image_size, crop, map_format, use_cache).maps
+
+    def get_redistortion_mapping(
+        self,
+        image_size: Tuple[int, int],
+        crop: float,
+        use_cache: bool = True,
+        map_format: MapFormat = MapFormat.FLOAT,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Calculates the mapping between the undistorted and the distorted image, the inverse of
+        `get_undistortion_mapping` with the same cropping. It is cached the same way.
+        :param image_size: The size of the image (width, height)
+        :param crop: Cropping parameter of the undistortion
+        :param use_cache: Indicates whether to use the map cache and store or not
+        :param map_format: The format of the maps, see `MapFormat`
+        :returns: The maps in the requested format
+        """
+        return self.compile(
+            image_size, crop, map_format, use_cache, redistort=True
+        ).maps
+
+    def undistort_video(
+        self,
+        video: "VideoFileClip",
+        crop: float,
+        map_format: MapFormat = MapFormat.FLOAT,
+    ) -> "VideoFileClip":
         """
         Undistort a video
         :param video: The video to be undistorted
         :param crop: Cropping parameter for the undistortion
+        :param map_format: The format of the undistortion maps, see `MapFormat`
         :returns: Undistorted video object
         """
-        width = video.w
-        height = video.h
+        plan = self.compile((video.w, video.h), crop, map_format)
+        return video.fl_image(plan.apply)
 
-        mapx, mapy = self.get_undistortion_mapping((width, height), crop)
-
-        def undistort(image):
-            return cv2.remap(image, mapx, mapy, cv2.INTER_LINEAR)
-
-        return video.fl_image(undistort)
-
-    def undistort_image(self, image: np.ndarray, crop: float) -> np.ndarray:
+    # pylint: disable=unsubscriptable-object
+    def undistort_image(
+        self,
+        image: np.ndarray,
+        crop: float,
+        map_format: MapFormat = MapFormat.FLOAT,
+        dst: Union[np.ndarray, None] = None,
+    ) -> np.ndarray:
         """
         Undistort an image
         :param image: The image as numpy array
         :param crop: Cropping parameter for the undistortion
+        :param map_format: The format of the undistortion maps, see `MapFormat`
+        :param dst: Optional output array with the shape and type of the image
         :returns: Undistorted image as numpy array
         """
-        height, width, _ = image.shape
+        height, width = image.shape[:2]
+        return self.compile((width, height), crop, map_format).apply(image, dst)
+
+    def redistort_video(
+        self,
+        video: "VideoFileClip",
+        crop: float,
+        map_format: MapFormat = MapFormat.FLOAT,
+    ) -> "VideoFileClip":
+        """
+        Redistort an undistorted video to the geometry of the camera
+        :param video: The undistorted video
+        :param crop: Cropping parameter used for the undistortion
+        :param map_format: The format of the redistortion maps, see `MapFormat`
+        :returns: Redistorted video object
+        """
+        plan = self.compile((video.w, video.h), crop, map_format, redistort=True)
+        return video.fl_image(plan.apply)
+
+    # pylint: disable=unsubscriptable-object
+    def redistort_image(
+        self,
+        image: np.ndarray,
+        crop: float,
+        map_format: MapFormat = MapFormat.FLOAT,
+        dst: Union[np.ndarray, None] = None,
+    ) -> np.ndarray:
+        """
+        Redistort an undistorted image to the geometry of the camera, e.g. overlays rendered on
+        the undistorted image. The pixels without source in the undistorted image are black.
+        :param image: The undistorted image as numpy array
+        :param crop: Cropping parameter used for the undistortion
+        :param map_format: The format of the redistortion maps, see `MapFormat`
+        :param dst: Optional output array with the shape and type of the image
+        :returns: Redistorted image as numpy array
+        """
+        height, width = image.shape[:2]
+        plan = self.compile((width, height), crop, map_format, redistort=True)
+        return plan.apply(image, dst)
+
+    def undistort_points(
+        self, points: np.ndarray, image_size: Tuple[int, int], crop: float
+    ) -> np.ndarray:
+        """
+        Undistorts pixel coordinates in bulk.
+        The result is consistent with `get_undistortion_mapping`: a point of the distorted image
+        is mapped to the pixel of the undistorted image whose map entry points to it.
+        For many calls with the same image size `compile` the undistortion once and use
+        `UndistortionPlan.undistort_points`.
+        :param points: The pixel coordinates on the distorted image, shape (..., 2)
+        :param image_size: The size of the image (width, height)
+        :param crop: Cropping parameter for the undistortion
+        :returns: The pixel coordinates on the undistorted image with the shape of the input,
+                  NaN where the distortion can not be inverted
+        """
+        return point_distortion.map_points(
+            points,
+            self.scaled_intrinsic_matrix(image_size),
+            self.undistorted_intrinsic_matrix(image_size, crop),
+            lambda normalized: point_distortion.undistort_points(
+                normalized, self.distortion_coeffs
+            ),
+        )
 
-        mapx, mapy = self.get_undistortion_mapping((width, height), crop)
-        # Undistort the image
-        return cv2.remap(image, mapx, mapy, cv2.INTER_LINEAR)
+    def distort_points(
+        self, points: np.ndarray, image_size: Tuple[int, int], crop: float
+    ) -> np.ndarray:
+        """
+        Distorts pixel coordinates in bulk, the inverse of `undistort_points`.
+        The result is the same as the undistortion maps at the given points.
+        :param points: The pixel coordinates on the undistorted image, shape (..., 2)
+        :param image_size: The size of the image (width, height)
+        :param crop: Cropping parameter for the undistortion
+        :returns: The pixel coordinates on the distorted image with the shape of the input
+        """
+        return point_distortion.map_points(
+            points,
+            self.undistorted_intrinsic_matrix(image_size, crop),
+            self.scaled_intrinsic_matrix(image_size),
+            lambda normalized: point_distortion.distort_points(
+                normalized, self.distortion_coeffs
+            ),
+        )
+
+    def undistort_image_tiled(
+        self,
+        image: np.ndarray,
+        crop: float,
+        max_bytes: int = 256 * 1024 ** 2,
+        workers: Union[int, None] = None,  # pylint: disable=unsubscriptable-object
+    ) -> np.ndarray:
+        """
+        Undistort a large image in horizontal bands using a pool of threads.
+        Every band computes only its part of the undistortion maps and remaps only the source
+        rows it needs, so the memory used besides the input and output images is bounded by
+        `max_bytes`. The result is the same as of `undistort_image` with float maps.
+        :param image: The image as numpy array
+        :param crop: Cropping parameter for the undistortion
+        :param max_bytes: The maximal total size of the maps of the bands processed in parallel
+        :param workers: The number of the threads, None uses every CPU core
+        :returns: Undistorted image as numpy array
+        """
+        height, width = image.shape[:2]
+        geometry = MapGeometry(
+            self.scaled_intrinsic_matrix((width, height)),
+            self.distortion_coeffs,
+            self.undistorted_intrinsic_matrix((width, height), crop),
+            (width, height),
+        )
+        return undistort_image_tiled(image, geometry, max_bytes, workers)
 
     def __str__(self):
         """
@@ -2,4 +2,4 @@
 """
 Module for collecting calibration images from calibration video
 """
-from .collect import collect_calibration_images
+from .collect import collect_calibration_images, select_calibration_images
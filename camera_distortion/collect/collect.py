@@ -4,6 +4,7 @@ The calibration images can be extracted from a calibration video.
 The extracted images will be saved in a given folder and then they can be used for calibration.
 
 The extracted images should be clear, not blurred and the calibration pattern needs to be visible.
+The images can be selected manually while playing the video, or automatically without any GUI.
 """
 __author__ = "Peter Kocsis"
 __copyright__ = "Peter Kocsis"
@@ -17,10 +18,12 @@ import os
 import sys
 import argparse
 import logging
-from typing import Union
+import time
+from typing import List, Tuple, Union
 
 import cv2
 
+from camera_distortion.frame_selection import save_frames, scan_video, select_frames
 from camera_distortion.util.logger import init_logger
 
 logger = logging.getLogger(__file__)
@@ -47,6 +50,34 @@ def collect_calibration_images_argsparser() -> argparse.ArgumentParser:
         default=20,
         help="Number of the images which needs to be collected for the calibration",
     )
+    parser.add_argument(
+        "-a",
+        "--auto",
+        action="store_true",
+        default=False,
+        help="Select the images automatically without GUI",
+    )
+    parser.add_argument(
+        "-s",
+        "--stride",
+        type=int,
+        default=10,
+        help="Every stride-th frame is scanned by the automatic selection",
+    )
+    parser.add_argument(
+        "-ch",
+        "--calib_height",
+        type=int,
+        default=6,
+        help="Number of the square blocks on the calibration image vertically",
+    )
+    parser.add_argument(
+        "-cw",
+        "--calib_width",
+        type=int,
+        default=9,
+        help="Number of the square blocks on the calibration image horizontally",
+    )
     return parser
 
 
@@ -152,11 +183,85 @@ def collect_calibration_images(
     logger.info("Calibration images collected from %s", video_path)
 
 
+# pylint: disable=too-many-locals,too-many-arguments,unsubscriptable-object
+def select_calibration_images(
+    video_path: str,
+    output_path: Union[str, None],
+    num_of_images: int,
+    pattern_size: Tuple[int, int] = (9, 6),
+    frame_stride: int = 10,
+    min_sharpness_ratio: float = 0.5,
+) -> List[str]:
+    """
+    Selects calibration images from a video file automatically, without any GUI
+
+    Every `frame_stride`-th frame is scanned for the pattern on a downscaled copy, then the sharp
+    frames with the most diverse poses are selected, see `camera_distortion.frame_selection`.
+    Finally the selected frames are read again and saved.
+
+    :param video_path: Path to the video from that the calibration images will be aquired
+    :param output_path: Path of the output folder (the same folder as the video if None)
+    :param num_of_images: The number of images to be collected
+    :param pattern_size: The number of the corners (width, height)
+    :param frame_stride: Every `frame_stride`-th frame is scanned
+    :param min_sharpness_ratio: The frames less sharp than this ratio of the median sharpness
+                                of the detected patterns are rejected
+    :returns: The paths of the selected images
+    """
+    logger.info("Selecting images from video %s automatically", video_path)
+    video = cv2.VideoCapture(video_path)
+    if not video.isOpened():
+        raise RuntimeError(f"Unable to open video {video_path}")
+    video_name = os.path.splitext(os.path.basename(video_path))[0]
+    video_fps = video.get(cv2.CAP_PROP_FPS)
+
+    try:
+        start = time.perf_counter()
+        detections, num_of_frames = scan_video(video, pattern_size, frame_stride)
+        elapsed = time.perf_counter() - start
+        logger.info(
+            "%i frames scanned in %.1f s (%.1fx playback speed), pattern found on %i",
+            num_of_frames,
+            elapsed,
+            num_of_frames / video_fps / elapsed if video_fps and elapsed else 0.0,
+            len(detections),
+        )
+
+        selected = select_frames(detections, num_of_images, min_sharpness_ratio)
+        if len(selected) < num_of_images:
+            logger.warning(
+                "Only %i sharp images found instead of %i", len(selected), num_of_images
+            )
+
+        if output_path is None:
+            output_path = os.path.dirname(video_path)
+        image_paths = save_frames(
+            video,
+            [detection.frame_idx for detection in selected],
+            output_path,
+            video_name,
+        )
+    finally:
+        video.release()
+
+    logger.info("%i calibration images selected from %s", len(image_paths), video_path)
+    return image_paths
+
+
 if __name__ == "__main__":
     arguments = collect_calibration_images_argsparser().parse_args(sys.argv[1:])
     init_logger(logger)
-    collect_calibration_images(
-        video_path=arguments.video,
-        output_path=arguments.out_folder,
-        num_of_images=arguments.num_images,
-    )
+    if arguments.auto:
+        select_calibration_images(
+            video_path=arguments.video,
+            output_path=arguments.out_folder,
+            num_of_images=arguments.num_images,
+            pattern_size=(arguments.calib_width, arguments.calib_height),
+            frame_stride=arguments.stride,
+        )
+    else:
+        collect_calibration_images(
+            video_path=arguments.video,
+            output_path=arguments.out_folder,
+            num_of_images=arguments.num_images,
+        )
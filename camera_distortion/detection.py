@@ -0,0 +1,363 @@
+#!/usr/bin/env python
+"""
+Module for detecting the calibration pattern on images.
+The functions are defined on module level, so they can be executed by worker processes.
+"""
+__author__ = "Peter Kocsis"
+__copyright__ = "Peter Kocsis"
+__credits__ = ["MIT License"]
+__version__ = "0.1"
+__maintainer__ = "Peter Kocsis"
+__email__ = "peter.kocsis@tum.de"
+__status__ = "Released"
+
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+from enum import Enum
+from functools import partial
+from typing import TYPE_CHECKING, Callable, Iterable, Iterator, List, NamedTuple, Tuple, Union
+
+import cv2
+import numpy as np
+
+from camera_distortion.util.detection_cache import DetectionCache
+
+if TYPE_CHECKING:
+    # The view selection imports the detection
+    from camera_distortion.view_selection import ViewSelector
+
+logger = logging.getLogger(__file__)
+
+# Termination criteria of the sub-pixel corner refinement
+SUBPIX_CRITERIA = (cv2.TERM_CRITERIA_EPS + cv2.TERM_CRITERIA_MAX_ITER, 30, 0.1)
+
+# Flags of the chessboard detection, the pyramid detection rejects images without pattern early
+DETECTION_FLAGS = cv2.CALIB_CB_ADAPTIVE_THRESH + cv2.CALIB_CB_NORMALIZE_IMAGE
+PYRAMID_DETECTION_FLAGS = DETECTION_FLAGS + cv2.CALIB_CB_FAST_CHECK
+
+# The pyramid detection searches the corners on the first level not larger than this size
+PYRAMID_MAX_SIZE = 1024
+
+
+class DetectionMode(Enum):
+    """
+    Mode of the calibration pattern detection
+
+    FULL: The corners are searched on the full-resolution image decoded in colour.
+    PYRAMID: The image is decoded directly to greyscale and the corners are searched on the first
+    pyramid level not larger than `PYRAMID_MAX_SIZE` with `cv2.CALIB_CB_FAST_CHECK`, so images
+    without the pattern are rejected early. The found corners are scaled back and refined on the
+    full-resolution image.
+    """
+
+    FULL = "full"
+    PYRAMID = "pyramid"
+
+
+class DetectionOptions(NamedTuple):
+    """
+    Options of the calibration pattern detection on a set of images
+
+    workers: The number of the worker processes, None or 0 uses every CPU core. The points are
+    detected serially when they are shown.
+    mode: The mode of the pattern detection, see `DetectionMode`
+    view_selector: If given, the detected views are added to it and the detection stops once
+    enough diverse views are found. Only the views selected by it are used for the calibration
+    and the outlier views are dropped, the statistics of the selection are stored in it.
+    cache: If given, the images found in the cache are not processed again, unless the points are
+    shown. The new detections are saved to it.
+    """
+
+    workers: Union[int, None] = 1  # pylint: disable=unsubscriptable-object
+    mode: DetectionMode = DetectionMode.FULL
+    view_selector: Union["ViewSelector", None] = None  # pylint: disable=unsubscriptable-object
+    cache: Union[DetectionCache, None] = None  # pylint: disable=unsubscriptable-object
+
+
+class CalibrationPoints(NamedTuple):
+    """
+    Calibration points found on a set of views
+
+    object_points: The reference points from the pattern of every view
+    image_points: The detected calibration points of every view
+    image_shape: The shape of the images
+    view_names: The names of the views, e.g. the image paths
+    """
+
+    object_points: List[np.ndarray]
+    image_points: List[np.ndarray]
+    image_shape: Tuple[int, int]
+    view_names: Union[List[str], None] = None  # pylint: disable=unsubscriptable-object
+
+    def subset(self, indices: Iterable[int]) -> "CalibrationPoints":
+        """
+        Selects some of the views
+        :param indices: The indices of the selected views
+        :returns: The calibration points of the selected views
+        """
+        indices = list(indices)
+        return CalibrationPoints(
+            [self.object_points[idx] for idx in indices],
+            [self.image_points[idx] for idx in indices],
+            self.image_shape,
+            None if self.view_names is None else [self.view_names[idx] for idx in indices],
+        )
+
+
+def pyramid_levels(image_shape: Tuple[int, int], max_size: int) -> int:
+    """
+    Calculates the number of the pyramid levels needed to fit the image into the size
+    :param image_shape: The shape of the image
+    :param max_size: The maximal size of the image
+    :returns: The number of the pyramid levels
+    """
+    levels = 0
+    while max(image_shape[:2]) > max_size * 2 ** levels:
+        levels += 1
+    return levels
+
+
+# pylint: disable=unsubscriptable-object
+def _find_corners_on_pyramid(
+    grey_image: np.ndarray, pattern_size: Tuple[int, int]
+) -> Tuple[bool, Union[np.ndarray, None]]:
+    """
+    Finds the chessboard corners on a downscaled pyramid level of a greyscale image
+    :param grey_image: The greyscale image
+    :param pattern_size: The number of the corners (width, height)
+    :returns: Whether the pattern has been found and the corners scaled to the full resolution
+    """
+    levels = pyramid_levels(grey_image.shape, PYRAMID_MAX_SIZE)
+    pyramid_image = grey_image
+    for _ in range(levels):
+        pyramid_image = cv2.pyrDown(pyramid_image)
+
+    found, corners = cv2.findChessboardCorners(
+        pyramid_image, pattern_size, PYRAMID_DETECTION_FLAGS
+    )
+    if not found:
+        return False, None
+    # The pixel x of a pyramid level is the pixel 2 * x of the previous level
+    return True, corners * 2 ** levels
+
+
+# pylint: disable=unsubscriptable-object
+def detect_calibration_points(
+    grey_image: np.ndarray,
+    pattern_size: Tuple[int, int],
+    detection_mode: DetectionMode = DetectionMode.FULL,
+) -> Tuple[bool, Union[np.ndarray, None]]:
+    """
+    Finds the chessboard corners on a greyscale image and refines them to sub-pixel accuracy
+    :param grey_image: The greyscale image
+    :param pattern_size: The number of the corners (width, height)
+    :param detection_mode: The mode of the detection, see `DetectionMode`
+    :returns: Whether the pattern has been found and the refined corners
+    """
+    if DetectionMode(detection_mode) == DetectionMode.PYRAMID:
+        found, corners = _find_corners_on_pyramid(grey_image, pattern_size)
+    else:
+        found, corners = cv2.findChessboardCorners(
+            grey_image, pattern_size, DETECTION_FLAGS
+        )
+    if not found:
+        return False, None
+    return True, refine_calibration_points(grey_image, corners)
+
+
+def refine_calibration_points(
+    grey_image: np.ndarray, corners: np.ndarray
+) -> np.ndarray:
+    """
+    Refines the chessboard corners to sub-pixel accuracy
+    :param grey_image: The greyscale image
+    :param corners: The corners found on the image, refined in place
+    :returns: The refined corners
+    """
+    # Improve the accuracy of the checkerboard corners found in the image
+    cv2.cornerSubPix(grey_image, corners, (20, 20), (-1, -1), SUBPIX_CRITERIA)
+    return corners
+
+
+def detect_calibration_points_in_file(
+    image_path: str,
+    pattern_size: Tuple[int, int],
+    detection_mode: DetectionMode = DetectionMode.FULL,
+) -> Tuple[bool, Union[np.ndarray, None], Tuple[int, int]]:
+    """
+    Loads an image and finds the chessboard corners on it
+    :param image_path: The path of the image
+    :param pattern_size: The number of the corners (width, height)
+    :param detection_mode: The mode of the detection, see `DetectionMode`
+    :returns: Whether the pattern has been found, the refined corners and the image shape
+    """
+    logger.debug("Loading image %s", image_path)
+    if DetectionMode(detection_mode) == DetectionMode.PYRAMID:
+        grey_image = cv2.imread(str(image_path), cv2.IMREAD_GRAYSCALE)
+    else:
+        image = cv2.imread(str(image_path))
+        grey_image = cv2.cvtColor(image, cv2.COLOR_RGB2GRAY)
+
+    logger.debug("Find chessboard corners on image %s", image_path)
+    found, corners = detect_calibration_points(grey_image, pattern_size, detection_mode)
+    return found, corners, grey_image.shape
+
+
+def _ordered_results(
+    executor: ProcessPoolExecutor, function: Callable, items: Iterable
+) -> Iterator:
+    """
+    Executes a function on every item in the executor
+    :param executor: The executor
+    :param function: The function to be executed
+    :param items: The items passed to the function
+    :returns: Generator of the results in the order of the items,
+              the pending executions are cancelled when it is closed
+    """
+    futures = [executor.submit(function, item) for item in items]
+    try:
+        for future in futures:
+            yield future.result()
+    finally:
+        for future in futures:
+            future.cancel()
+
+
+def detect_calibration_points_in_files(
+    image_paths: List[str],
+    pattern_size: Tuple[int, int],
+    show_points: bool,
+    options: DetectionOptions,
+) -> Iterator:
+    """
+    Detects the calibration points on the calibration images.
+    The detection runs in a pool of worker processes if more workers are requested.
+    Showing the points is supported only in serial mode.
+    The images found in the detection cache of the options are not processed again, unless
+    the points are shown.
+    :param image_paths: The list of paths to the calibrationj images
+    :param pattern_size: The number of the corners (width, height)
+    :param show_points: Indicates whether to show the found point or not
+    :param options: The options of the detection, see `DetectionOptions`
+    :returns: Generator of the detections in the order of the images,
+              the pending detections are stopped when it is closed
+    """
+    if show_points:
+        try:
+            for image_path in image_paths:
+                yield _find_and_show_calibration_points(
+                    image_path, pattern_size, options.mode
+                )
+        finally:
+            cv2.destroyWindow("Corners")
+        return
+
+    workers = options.workers or os.cpu_count()
+    executor = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+    try:
+        detect = partial(
+            partial(_ordered_results, executor) if executor else map,
+            partial(
+                detect_calibration_points_in_file,
+                pattern_size=pattern_size,
+                detection_mode=options.mode,
+            ),
+        )
+        if options.cache is None:
+            yield from detect(image_paths)
+        else:
+            yield from _cached_detections(image_paths, detect, pattern_size, options)
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+
+def _cached_detections(
+    image_paths: List[str],
+    detect: Callable[[List[str]], Iterable],
+    pattern_size: Tuple[int, int],
+    options: DetectionOptions,
+) -> Iterator:
+    """
+    Gets the detections of the images from the detection cache and detects the missing ones.
+    The new detections are saved to the cache, even if the iteration is interrupted.
+    :param image_paths: The paths of the images
+    :param detect: Function detecting the calibration points on a list of images
+    :param pattern_size: The number of the corners (width, height)
+    :param options: The options of the detection with the detection cache
+    :returns: Generator of the detections in the order of the images
+    """
+    cache = options.cache
+    keys = [
+        cache.key(image_path, pattern_size, DetectionMode(options.mode).value)
+        for image_path in image_paths
+    ]
+    cached_detections = [cache.get(key) for key in keys]
+    missing_paths = [
+        image_path
+        for image_path, detection in zip(image_paths, cached_detections)
+        if detection is None
+    ]
+    logger.info(
+        "%i of %i detections found in the cache",
+        len(image_paths) - len(missing_paths),
+        len(image_paths),
+    )
+
+    new_detections = iter(detect(missing_paths))
+    try:
+        for image_path, key, detection in zip(image_paths, keys, cached_detections):
+            if detection is None:
+                detection = next(new_detections, None)
+                if detection is None:
+                    raise RuntimeError(f"No detection has been returned for {image_path}")
+                cache.put(key, image_path, detection)
+            yield detection
+    finally:
+        if hasattr(new_detections, "close"):
+            new_detections.close()
+        cache.save()
+
+
+# pylint: disable=unsubscriptable-object
+def _find_and_show_calibration_points(
+    image_path: str,
+    pattern_size: Tuple[int, int],
+    detection_mode: DetectionMode,
+) -> Tuple[bool, Union[np.ndarray, None], Tuple[int, int]]:
+    """
+    Extracts the calibration points on a calibration image and shows them
+    :param image_path: The path to the calibration image
+    :param pattern_size: The number of the corners (width, height)
+    :param detection_mode: The mode of the pattern detection, see `DetectionMode`
+    :returns: Whether the pattern has been found, the refined corners and the image shape
+    """
+    # Loading image_pathes
+    logger.debug("Loading image %s", image_path)
+    image = cv2.imread(str(image_path))
+
+    # Converting to grayscale
+    logger.debug("Converting image %s to grayscale", image_path)
+    grey_image = cv2.cvtColor(image, cv2.COLOR_RGB2GRAY)
+
+    # Find chessboard corners
+    logger.debug("Find chessboard corners on image %s", image_path)
+    found, corners = detect_calibration_points(
+        grey_image, pattern_size, detection_mode
+    )
+
+    if found:
+        # Draw chessboard corners
+        cv2.drawChessboardCorners(image, pattern_size, corners, found)
+
+        # Show the image with the chessboard corners overlaid.
+        cv2.imshow("Corners", image)
+
+        # Check for interruption
+        key_code = cv2.waitKey(0)
+        if key_code == 27:
+            logger.debug("ESC pressed, interrupting")
+            raise RuntimeError("The image collection has been interrupted!")
+
+    return found, corners, grey_image.shape
@@ -0,0 +1,263 @@
+#!/usr/bin/env python
+"""
+Module for selecting calibration frames from videos.
+The frames are scanned for the calibration pattern on downscaled copies, only the pose, the
+sharpness and optionally the refined corners of the pattern are kept, so the memory usage does
+not depend on the length of the video. The sharp frames with the most diverse poses are selected.
+"""
+__author__ = "Peter Kocsis"
+__copyright__ = "Peter Kocsis"
+__credits__ = ["MIT License"]
+__version__ = "0.1"
+__maintainer__ = "Peter Kocsis"
+__email__ = "peter.kocsis@tum.de"
+__status__ = "Released"
+
+import logging
+import os
+from typing import List, NamedTuple, Tuple, Union
+
+import cv2
+import numpy as np
+
+from camera_distortion.detection import (
+    PYRAMID_DETECTION_FLAGS,
+    refine_calibration_points,
+)
+
+logger = logging.getLogger(__file__)
+
+# The frames are scanned for the pattern downscaled to this size
+SELECTION_MAX_SIZE = 640
+
+# Bin limits of the pose descriptor, the sharpest frame of every bin is selected first
+_POSITION_BINS = 3
+_SCALE_LIMITS = [0.3, 0.5]
+_TILT_LIMITS = [-0.1, 0.1]
+
+
+class FrameDetection(NamedTuple):
+    """
+    The calibration pattern detected on a video frame.
+    `sharpness` is the sharpness of the pattern, see `pattern_sharpness`, `descriptor` is its pose
+    descriptor, see `pose_descriptor`, and `corners` are the corners refined on the
+    full-resolution frame, if requested.
+    """
+
+    frame_idx: int
+    sharpness: float
+    descriptor: np.ndarray
+    corners: Union[np.ndarray, None] = None  # pylint: disable=unsubscriptable-object
+
+
+def pose_descriptor(
+    corners: np.ndarray, pattern_size: Tuple[int, int], frame_size: Tuple[int, int]
+) -> np.ndarray:
+    """
+    Describes the pose of the calibration pattern on a frame
+    :param corners: The detected corners of the pattern
+    :param pattern_size: The number of the corners (width, height)
+    :param frame_size: The size of the frame (width, height)
+    :returns: The center (x, y) and the size of the pattern relative to the frame and
+              the logarithmic ratio of its opposite edges horizontally and vertically
+    """
+    grid = corners.reshape(pattern_size[1], pattern_size[0], 2)
+    outline = np.array([grid[0, 0], grid[0, -1], grid[-1, -1], grid[-1, 0]])
+    x, y = outline[:, 0], outline[:, 1]
+    area = 0.5 * abs(np.dot(x, np.roll(y, 1)) - np.dot(y, np.roll(x, 1)))
+    edge_lengths = np.linalg.norm(outline - np.roll(outline, -1, axis=0), axis=1)
+    top, right, bottom, left = edge_lengths
+    center = corners.reshape(-1, 2).mean(axis=0) / frame_size
+    return np.array(
+        [
+            center[0],
+            center[1],
+            np.sqrt(area / (frame_size[0] * frame_size[1])),
+            np.log(top / bottom),
+            np.log(left / right),
+        ]
+    )
+
+
+def pose_bin(descriptor: np.ndarray) -> Tuple[int, ...]:
+    """
+    Quantizes a pose descriptor
+    :param descriptor: The pose descriptor, see `pose_descriptor`
+    :returns: The bin of the pose
+    """
+    center_x, center_y, size, tilt_x, tilt_y = descriptor
+    return (
+        min(max(int(center_x * _POSITION_BINS), 0), _POSITION_BINS - 1),
+        min(max(int(center_y * _POSITION_BINS), 0), _POSITION_BINS - 1),
+        int(np.digitize(size, _SCALE_LIMITS)),
+        int(np.digitize(tilt_x, _TILT_LIMITS)),
+        int(np.digitize(tilt_y, _TILT_LIMITS)),
+    )
+
+
+def pattern_sharpness(grey_image: np.ndarray, corners: np.ndarray) -> float:
+    """
+    Measures the sharpness of the calibration pattern as the variance of the Laplacian
+    :param grey_image: The greyscale image
+    :param corners: The detected corners of the pattern
+    :returns: The sharpness, the higher the sharper
+    """
+    left, top = np.floor(corners.reshape(-1, 2).min(axis=0)).astype(int)
+    right, bottom = np.ceil(corners.reshape(-1, 2).max(axis=0)).astype(int)
+    pattern_image = grey_image[max(top, 0) : bottom + 1, max(left, 0) : right + 1]
+    return float(cv2.Laplacian(pattern_image, cv2.CV_32F).var())
+
+
+# pylint: disable=unsubscriptable-object
+def select_diverse_poses(
+    descriptors: np.ndarray, count: int, selected: Union[List[int], None] = None
+) -> List[int]:
+    """
+    Selects poses far from each other greedily
+    :param descriptors: The pose descriptors, see `pose_descriptor`
+    :param count: The number of the poses to be selected
+    :param selected: The indices of the already selected poses, the first pose by default
+    :returns: The indices of the distinct selected poses, fewer than `count` if there are not
+              enough distinct poses
+    """
+    # The tilts are weighted to be comparable with the relative positions
+    weighted = descriptors * np.array([1.0, 1.0, 1.0, 2.0, 2.0])
+    selected = list(selected) if selected else [0]
+    distances = np.min(
+        np.linalg.norm(weighted[:, None] - weighted[selected][None], axis=2), axis=1
+    )
+    while len(selected) < min(count, len(descriptors)):
+        # The selected poses are never selected again, neither their duplicates
+        distances[selected] = -np.inf
+        idx = int(np.argmax(distances))
+        if distances[idx] <= 0:
+            break
+        selected.append(idx)
+        distances = np.minimum(
+            distances, np.linalg.norm(weighted - weighted[idx], axis=1)
+        )
+    return selected
+
+
+def scan_video(
+    video: cv2.VideoCapture,
+    pattern_size: Tuple[int, int],
+    frame_stride: int = 10,
+    refine: bool = False,
+) -> Tuple[List[FrameDetection], int]:
+    """
+    Scans every `frame_stride`-th frame of a video for the calibration pattern
+    :param video: The opened video
+    :param pattern_size: The number of the corners (width, height)
+    :param frame_stride: Every `frame_stride`-th frame is scanned
+    :param refine: Indicates whether to refine the corners on the full-resolution frames
+    :returns: The detections on the frames containing the pattern and the number of the frames
+    """
+    detections = []
+    frame_idx = -1
+    while True:
+        # Grabbing skips the conversion of the frames not scanned
+        for _ in range(frame_stride - 1):
+            if not video.grab():
+                return detections, frame_idx + 1
+            frame_idx += 1
+        success, frame = video.read()
+        if not success:
+            return detections, frame_idx + 1
+        frame_idx += 1
+
+        grey_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        frame_size = (grey_frame.shape[1], grey_frame.shape[0])
+        scale = min(1.0, SELECTION_MAX_SIZE / max(frame_size))
+        small_frame = cv2.resize(
+            grey_frame, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA
+        )
+        found, corners = cv2.findChessboardCorners(
+            small_frame, pattern_size, PYRAMID_DETECTION_FLAGS
+        )
+        if not found:
+            continue
+
+        corners = corners / scale
+        if refine:
+            corners = refine_calibration_points(grey_frame, corners)
+        detections.append(
+            FrameDetection(
+                frame_idx,
+                pattern_sharpness(grey_frame, corners),
+                pose_descriptor(corners, pattern_size, frame_size),
+                corners if refine else None,
+            )
+        )
+
+
+def select_frames(
+    detections: List[FrameDetection],
+    num_of_frames: int,
+    min_sharpness_ratio: float = 0.5,
+) -> List[FrameDetection]:
+    """
+    Selects the sharp frames with the most diverse poses.
+    The blurry frames are rejected, the sharpest frame of every pose bin is selected first,
+    then the poses most different from the already selected ones.
+    :param detections: The detections of the frames
+    :param num_of_frames: The number of the frames to be selected
+    :param min_sharpness_ratio: The frames less sharp than this ratio of the median sharpness
+                                of the detections are rejected
+    :returns: The selected detections in the order of the frames
+    """
+    if not detections:
+        return []
+
+    # Reject the blurry frames, the sharpest frames come first
+    min_sharpness = min_sharpness_ratio * np.median(
+        [detection.sharpness for detection in detections]
+    )
+    detections = sorted(
+        (detection for detection in detections if detection.sharpness >= min_sharpness),
+        key=lambda detection: detection.sharpness,
+        reverse=True,
+    )
+    descriptors = np.array([detection.descriptor for detection in detections])
+
+    # Select the sharpest frames of the most diverse pose bins,
+    # then fill up with the most diverse remaining poses
+    bin_bests = {}
+    for idx, descriptor in enumerate(descriptors):
+        bin_bests.setdefault(pose_bin(descriptor), idx)
+    bin_best_indices = sorted(bin_bests.values())
+    selected = [
+        bin_best_indices[idx]
+        for idx in select_diverse_poses(descriptors[bin_best_indices], num_of_frames)
+    ]
+    selected = select_diverse_poses(descriptors, num_of_frames, selected)
+    return sorted(
+        (detections[idx] for idx in selected), key=lambda detection: detection.frame_idx
+    )
+
+
+def save_frames(
+    video: cv2.VideoCapture, frame_indices: List[int], output_path: str, name: str
+) -> List[str]:
+    """
+    Reads frames of a video by seeking and saves them
+    :param video: The opened video
+    :param frame_indices: The indices of the frames
+    :param output_path: Path of the output folder, empty for the current folder
+    :param name: The name of the images, suffixed with the frame index
+    :returns: The paths of the saved images
+    """
+    if output_path:
+        os.makedirs(output_path, exist_ok=True)
+    image_paths = []
+    for frame_idx in frame_indices:
+        video.set(cv2.CAP_PROP_POS_FRAMES, frame_idx)
+        success, frame = video.read()
+        if not success:
+            logger.warning("Unable to read frame %i", frame_idx)
+            continue
+        image_path = os.path.join(output_path, f"{name}_{frame_idx}.png")
+        cv2.imwrite(image_path, frame)
+        logger.debug("Image saved to %s", image_path)
+        image_paths.append(image_path)
+    return image_paths
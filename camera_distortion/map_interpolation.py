@@ -0,0 +1,205 @@
+#!/usr/bin/env python
+"""
+Module for creating the maps of huge images by interpolation.
+The mapping is evaluated exactly only on a coarse grid of nodes and upsampled bilinearly by
+`cv2.resize`. The error of every grid cell is measured in its middle, where the bilinear
+interpolation deviates the most. The cells exceeding the allowed error, e.g. close to the fold of
+the distortion model, and the cells with undefined nodes are calculated exactly pixel by pixel.
+"""
+__author__ = "Peter Kocsis"
+__copyright__ = "Peter Kocsis"
+__credits__ = ["MIT License"]
+__version__ = "0.1"
+__maintainer__ = "Peter Kocsis"
+__email__ = "peter.kocsis@tum.de"
+__status__ = "Released"
+
+import logging
+from typing import Callable, Tuple, Union
+
+import cv2
+import numpy as np
+
+logger = logging.getLogger(__file__)
+
+# The distance of the grid nodes in pixels, halved while it decreases the exact evaluations
+_INITIAL_STEP = 128
+_MIN_STEP = 4
+
+# Interpolation does not pay off if more of the pixels have to be calculated exactly
+_MAX_EXACT_RATIO = 0.5
+
+# The middle of a cell underestimates its error where the mapping is far from quadratic
+_ERROR_MARGIN = 0.5
+
+
+class _Grid:
+    """
+    Coarse grid of the mapping with the error of its cells
+    """
+
+    def __init__(
+        self,
+        mapping: Callable[[np.ndarray], np.ndarray],
+        image_size: Tuple[int, int],
+        step: int,
+        max_error: float,
+    ):
+        """
+        Evaluates the mapping on the nodes and in the middle of the cells
+        :param mapping: The exact mapping of the pixel coordinates, shape (N, 2)
+        :param image_size: The size of the image (width, height)
+        :param step: The approximate distance of the nodes in pixels
+        :param max_error: The maximal positional error in pixels
+        """
+        width, height = image_size
+        self.step = step
+        self.nodes_x = self._nodes(width, step)
+        self.nodes_y = self._nodes(height, step)
+        nodes = np.stack(np.meshgrid(self.nodes_x, self.nodes_y), axis=-1)
+        self.coarse = mapping(nodes.reshape(-1, 2)).reshape(nodes.shape)
+
+        centers = np.stack(
+            np.meshgrid(
+                (self.nodes_x[:-1] + self.nodes_x[1:]) / 2,
+                (self.nodes_y[:-1] + self.nodes_y[1:]) / 2,
+            ),
+            axis=-1,
+        )
+        exact = mapping(centers.reshape(-1, 2)).reshape(centers.shape)
+        coarse = self.coarse
+        interpolated = (
+            coarse[:-1, :-1] + coarse[:-1, 1:] + coarse[1:, :-1] + coarse[1:, 1:]
+        ) / 4
+        with np.errstate(invalid="ignore"):
+            errors = np.hypot(*np.moveaxis(exact - interpolated, -1, 0))
+            # Positions outside of the source image are all remapped to the border value
+            relevant = self._inside(exact, image_size) | self._inside(
+                interpolated, image_size
+            )
+        errors[~relevant] = 0
+        # The undefined nodes spread to the whole cell by the interpolation
+        exceeding = ~(errors <= _ERROR_MARGIN * max_error)
+        exceeding |= ~np.isfinite(interpolated).all(axis=-1)
+        # The error grows fast next to a bad cell, it is not sampled well by the cell middles
+        exceeding = cv2.dilate(exceeding.astype(np.uint8), np.ones((3, 3), np.uint8))
+        # The pixels outside of the outermost nodes are not interpolated by cv2.resize either,
+        # they are handled as a ring of exact cells
+        self.exact_cells = np.pad(exceeding.astype(bool), 1, constant_values=True)
+        self.error = float(np.max(errors, where=~exceeding.astype(bool), initial=0))
+
+    @staticmethod
+    def _nodes(size: int, step: int) -> np.ndarray:
+        """
+        Calculates the positions of the grid nodes along an axis
+        :param size: The size of the image along the axis
+        :param step: The approximate distance of the nodes
+        :returns: The pixel positions of the nodes, where `cv2.resize` samples the coarse map
+        """
+        num_of_nodes = max(2, int(round(size / step)))
+        return (np.arange(num_of_nodes) + 0.5) * size / num_of_nodes - 0.5
+
+    @staticmethod
+    def _inside(points: np.ndarray, image_size: Tuple[int, int]) -> np.ndarray:
+        """
+        Checks which points influence the remapped image
+        :param points: The source coordinates, shape (..., 2)
+        :param image_size: The size of the source image (width, height)
+        :returns: The mask of the points within one pixel of the source image
+        """
+        width, height = image_size
+        inside_x = (points[..., 0] >= -1) & (points[..., 0] <= width)
+        return inside_x & (points[..., 1] >= -1) & (points[..., 1] <= height)
+
+    def exact_pixels(self, image_size: Tuple[int, int]) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Lists the pixels to be calculated exactly
+        :param image_size: The size of the image (width, height)
+        :returns: The x and the y coordinates of the pixels
+        """
+        width, height = image_size
+        # The cell of every pixel column and row, shifted by the ring of the outer cells
+        column_cells = np.searchsorted(self.nodes_x, np.arange(width), side="right")
+        row_cells = np.searchsorted(self.nodes_y, np.arange(height), side="right")
+        pixels_x, pixels_y = [], []
+        for row_cell, rows in zip(*_runs(row_cells)):
+            columns = np.nonzero(self.exact_cells[row_cell][column_cells])[0]
+            band_x, band_y = np.meshgrid(columns, rows)
+            pixels_x.append(band_x.ravel())
+            pixels_y.append(band_y.ravel())
+        return np.concatenate(pixels_x), np.concatenate(pixels_y)
+
+    @property
+    def num_of_evaluations(self) -> int:
+        """
+        Returns the number of the exact evaluations of the nodes and the exact cells
+        """
+        cell_area = (self.nodes_x[1] - self.nodes_x[0]) * (
+            self.nodes_y[1] - self.nodes_y[0]
+        )
+        return int(2 * self.coarse[..., 0].size + self.exact_cells.sum() * cell_area)
+
+
+def _runs(values: np.ndarray) -> Tuple[np.ndarray, list]:
+    """
+    Groups the indices of a sorted array by the values
+    :param values: The sorted values
+    :returns: The distinct values and the indices of each of them
+    """
+    distinct, starts = np.unique(values, return_index=True)
+    return distinct, np.split(np.arange(len(values)), starts[1:])
+
+
+# pylint: disable=unsubscriptable-object
+def interpolate_maps(
+    mapping: Callable[[np.ndarray], np.ndarray],
+    image_size: Tuple[int, int],
+    max_error: float,
+) -> Union[Tuple[Tuple[np.ndarray, np.ndarray], float, int], None]:
+    """
+    Creates float maps by interpolating the mapping evaluated on a coarse grid.
+    The source image is expected to be of the same size, the error is measured only where the
+    mapped positions are within it. The undefined (NaN) positions are mapped outside of it.
+    :param mapping: The exact mapping of the pixel coordinates, shape (N, 2)
+    :param image_size: The size of the image (width, height)
+    :param max_error: The maximal positional error of the maps in pixels
+    :returns: The maps, the measured maximal error and the distance of the grid nodes,
+              None if most of the pixels would have to be calculated exactly
+    """
+    image_size = tuple(int(size) for size in image_size)
+    width, height = image_size
+    grid = _Grid(mapping, image_size, _INITIAL_STEP, max_error)
+    while grid.step // 2 >= _MIN_STEP:
+        finer_grid = _Grid(mapping, image_size, grid.step // 2, max_error)
+        if finer_grid.num_of_evaluations >= grid.num_of_evaluations:
+            break
+        grid = finer_grid
+    if grid.num_of_evaluations > _MAX_EXACT_RATIO * width * height:
+        logger.debug("Interpolation of the maps does not reach %.4f px", max_error)
+        return None
+
+    coarse = grid.coarse.astype(np.float32)
+    map_x, map_y = (
+        cv2.resize(
+            np.ascontiguousarray(coarse[..., axis]),
+            (width, height),
+            interpolation=cv2.INTER_LINEAR,
+        )
+        for axis in range(2)
+    )
+    pixels_x, pixels_y = grid.exact_pixels(image_size)
+    exact = mapping(np.stack((pixels_x, pixels_y), axis=-1))
+    np.nan_to_num(exact, copy=False, nan=-1.0)
+    map_x[pixels_y, pixels_x] = exact[:, 0]
+    map_y[pixels_y, pixels_x] = exact[:, 1]
+
+    logger.info(
+        "Maps of %ix%i interpolated from a %i px grid, %.1f%% calculated exactly, "
+        "maximal error %.4f px",
+        width,
+        height,
+        grid.step,
+        100 * len(pixels_x) / (width * height),
+        grid.error,
+    )
+    return (map_x, map_y), grid.error, grid.step
@@ -0,0 +1,321 @@
+#!/usr/bin/env python
+"""
+Module for distorting and undistorting point coordinates in bulk.
+The distortion model of opencv is evaluated with NumPy on every point at once, the undistortion
+inverts it by Newton's method, which converges in a few iterations even for strong distortions,
+while the fixed-point iteration of `cv2.undistortPoints` needs tens of them.
+"""
+__author__ = "Peter Kocsis"
+__copyright__ = "Peter Kocsis"
+__credits__ = ["MIT License"]
+__version__ = "0.1"
+__maintainer__ = "Peter Kocsis"
+__email__ = "peter.kocsis@tum.de"
+__status__ = "Released"
+
+from typing import Callable, Tuple
+
+import cv2
+import numpy as np
+
+# Number of the distortion coefficients of the rational and thin prism model
+MAX_VECTORIZED_COEFFS = 12
+
+# The points are processed in chunks, so the temporary arrays fit into the CPU cache
+_CHUNK_SIZE = 16384
+
+# Convergence limits of the undistortion in normalized coordinates
+_MAX_ITERATIONS = 20
+_STEP_TOLERANCE = 1e-12
+_RESIDUAL_TOLERANCE = 1e-8
+
+
+def vectorized_coeffs(distortion_coeffs: np.ndarray) -> Tuple[np.ndarray, bool]:
+    """
+    Pads the distortion coefficients to the rational and thin prism model
+    :param distortion_coeffs: The distortion coefficients defined by opencv
+    :returns: The 12 coefficients and whether the model can be evaluated with NumPy,
+              the tilted sensor model can not
+    """
+    coeffs = np.asarray(distortion_coeffs, dtype=np.float64).ravel()
+    vectorized = not np.any(coeffs[MAX_VECTORIZED_COEFFS:])
+    coeffs = coeffs[:MAX_VECTORIZED_COEFFS]
+    return np.pad(coeffs, (0, MAX_VECTORIZED_COEFFS - len(coeffs))), vectorized
+
+
+def _radial_terms(r2: np.ndarray, coeffs: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Calculates the rational radial distortion
+    :param r2: The squared distance of the points from the centre
+    :param coeffs: The 12 distortion coefficients, see `vectorized_coeffs`
+    :returns: The numerator and the denominator of the radial factor
+    """
+    k1, k2, _, _, k3, k4, k5, k6 = coeffs[:8]
+    r4 = r2 * r2
+    r6 = r4 * r2
+    return 1 + k1 * r2 + k2 * r4 + k3 * r6, 1 + k4 * r2 + k5 * r4 + k6 * r6
+
+
+def _radial_derivative(
+    r2: np.ndarray, radial: np.ndarray, denominator: np.ndarray, coeffs: np.ndarray
+) -> np.ndarray:
+    """
+    Calculates the derivative of the radial factor by r2
+    :param r2: The squared distance of the points from the centre
+    :param radial: The radial factor
+    :param denominator: The denominator of the radial factor, see `_radial_terms`
+    :param coeffs: The 12 distortion coefficients, see `vectorized_coeffs`
+    :returns: The derivative of the radial factor
+    """
+    k1, k2, _, _, k3, k4, k5, k6 = coeffs[:8]
+    r4 = r2 * r2
+    numerator_derivative = k1 + 2 * k2 * r2 + 3 * k3 * r4
+    denominator_derivative = k4 + 2 * k5 * r2 + 3 * k6 * r4
+    return (numerator_derivative - radial * denominator_derivative) / denominator
+
+
+def _tangential_and_prism_terms(
+    x: np.ndarray, y: np.ndarray, r2: np.ndarray, coeffs: np.ndarray
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Calculates the tangential and the thin prism distortion
+    :param x: The x coordinates
+    :param y: The y coordinates
+    :param r2: The squared distance of the points from the centre
+    :param coeffs: The 12 distortion coefficients, see `vectorized_coeffs`
+    :returns: The offset of the x and y coordinates
+    """
+    p1, p2 = coeffs[2:4]
+    s1, s2, s3, s4 = coeffs[8:]
+    r4 = r2 * r2
+    offset_x = 2 * p1 * x * y + p2 * (r2 + 2 * x * x) + s1 * r2 + s2 * r4
+    offset_y = p1 * (r2 + 2 * y * y) + 2 * p2 * x * y + s3 * r2 + s4 * r4
+    return offset_x, offset_y
+
+
+def distort_normalized(
+    x: np.ndarray, y: np.ndarray, coeffs: np.ndarray
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Applies the distortion on normalized coordinates
+    :param x: The x coordinates
+    :param y: The y coordinates
+    :param coeffs: The 12 distortion coefficients, see `vectorized_coeffs`
+    :returns: The distorted x and y coordinates
+    """
+    r2 = x * x + y * y
+    numerator, denominator = _radial_terms(r2, coeffs)
+    radial = numerator / denominator
+    offset_x, offset_y = _tangential_and_prism_terms(x, y, r2, coeffs)
+    return x * radial + offset_x, y * radial + offset_y
+
+
+def _distort_normalized_with_jacobian(
+    x: np.ndarray, y: np.ndarray, coeffs: np.ndarray
+) -> Tuple[np.ndarray, ...]:
+    """
+    Applies the distortion on normalized coordinates and calculates its derivatives
+    :param x: The x coordinates
+    :param y: The y coordinates
+    :param coeffs: The 12 distortion coefficients, see `vectorized_coeffs`
+    :returns: The distorted x and y coordinates, the radial factor
+              and the derivatives d(x, y)/d(x, y)
+    """
+    p1, p2 = coeffs[2:4]
+    r2 = x * x + y * y
+    numerator, denominator = _radial_terms(r2, coeffs)
+    radial = numerator / denominator
+    radial_derivative = _radial_derivative(r2, radial, denominator, coeffs)
+    offset_x, offset_y = _tangential_and_prism_terms(x, y, r2, coeffs)
+    # The derivatives of the thin prism terms by r2
+    prism_x = coeffs[8] + 2 * coeffs[9] * r2
+    prism_y = coeffs[10] + 2 * coeffs[11] * r2
+
+    # The derivatives of r2 are 2x and 2y
+    return (
+        x * radial + offset_x,
+        y * radial + offset_y,
+        radial,
+        radial + 2 * x * (x * radial_derivative + prism_x) + 2 * p1 * y + 6 * p2 * x,
+        2 * y * (x * radial_derivative + prism_x) + 2 * p1 * x + 2 * p2 * y,
+        2 * x * (y * radial_derivative + prism_y) + 2 * p1 * x + 2 * p2 * y,
+        radial + 2 * y * (y * radial_derivative + prism_y) + 6 * p1 * y + 2 * p2 * x,
+    )
+
+
+def distort_points(points: np.ndarray, distortion_coeffs: np.ndarray) -> np.ndarray:
+    """
+    Distorts normalized point coordinates
+    :param points: The undistorted normalized coordinates, shape (N, 2)
+    :param distortion_coeffs: The distortion coefficients defined by opencv
+    :returns: The distorted normalized coordinates, shape (N, 2)
+    """
+    points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+    coeffs, vectorized = vectorized_coeffs(distortion_coeffs)
+    if not vectorized:
+        object_points = np.column_stack((points, np.ones(len(points))))
+        distorted, _ = cv2.projectPoints(
+            object_points, np.zeros(3), np.zeros(3), np.eye(3), distortion_coeffs
+        )
+        return distorted.reshape(-1, 2)
+
+    distorted = np.empty_like(points)
+    for start in range(0, len(points), _CHUNK_SIZE):
+        chunk = slice(start, start + _CHUNK_SIZE)
+        distorted[chunk, 0], distorted[chunk, 1] = distort_normalized(
+            points[chunk, 0], points[chunk, 1], coeffs
+        )
+    return distorted
+
+
+def undistort_points(points: np.ndarray, distortion_coeffs: np.ndarray) -> np.ndarray:
+    """
+    Undistorts normalized point coordinates by inverting the distortion with Newton's method
+    :param points: The distorted normalized coordinates, shape (N, 2)
+    :param distortion_coeffs: The distortion coefficients defined by opencv
+    :returns: The undistorted normalized coordinates, shape (N, 2), NaN for the points
+              where the distortion can not be inverted, e.g. beyond the fold of the model
+    """
+    points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+    coeffs, vectorized = vectorized_coeffs(distortion_coeffs)
+    if not vectorized:
+        criteria = (
+            cv2.TERM_CRITERIA_COUNT | cv2.TERM_CRITERIA_EPS,
+            10 * _MAX_ITERATIONS,
+            _STEP_TOLERANCE,
+        )
+        undistorted = cv2.undistortPointsIter(
+            points.reshape(-1, 1, 2), np.eye(3), distortion_coeffs, None, None, criteria
+        )
+        return undistorted.reshape(-1, 2)
+
+    undistorted = np.empty_like(points)
+    for start in range(0, len(points), _CHUNK_SIZE):
+        chunk = slice(start, start + _CHUNK_SIZE)
+        undistorted[chunk] = _undistort_chunk(points[chunk], coeffs)
+    return undistorted
+
+
+def _undistort_chunk(points: np.ndarray, coeffs: np.ndarray) -> np.ndarray:
+    """
+    Undistorts normalized point coordinates, see `undistort_points`
+    :param points: The distorted normalized coordinates, shape (N, 2)
+    :param coeffs: The 12 distortion coefficients, see `vectorized_coeffs`
+    :returns: The undistorted normalized coordinates, shape (N, 2)
+    """
+    target_x, target_y = points[:, 0], points[:, 1]
+    # The distorted point is a good initial guess, the iteration approaches the solution
+    # monotonically where the model is invertible
+    x, y = target_x.copy(), target_y.copy()
+    active = np.arange(len(points))
+    with np.errstate(all="ignore"):
+        for _ in range(_MAX_ITERATIONS):
+            step_x, step_y, determinant = _newton_step(
+                x[active], y[active], target_x[active], target_y[active], coeffs
+            )
+            x[active] -= step_x
+            y[active] -= step_y
+            # The points beyond the fold of the model are not iterated further
+            converging = np.abs(step_x) + np.abs(step_y) > _STEP_TOLERANCE
+            active = active[converging & (determinant > 0)]
+            if len(active) == 0:
+                break
+
+        valid = _valid_solutions(x, y, points, coeffs)
+    undistorted = np.stack((x, y), axis=1)
+    undistorted[~valid] = np.nan
+    return undistorted
+
+
+def _newton_step(
+    x: np.ndarray,
+    y: np.ndarray,
+    target_x: np.ndarray,
+    target_y: np.ndarray,
+    coeffs: np.ndarray,
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Calculates a step of Newton's method inverting the distortion
+    :param x: The current undistorted x coordinates
+    :param y: The current undistorted y coordinates
+    :param target_x: The distorted x coordinates
+    :param target_y: The distorted y coordinates
+    :param coeffs: The 12 distortion coefficients, see `vectorized_coeffs`
+    :returns: The step of the x and y coordinates to be subtracted
+              and the determinant of the Jacobian
+    """
+    distorted_x, distorted_y, _, dx_dx, dx_dy, dy_dx, dy_dy = (
+        _distort_normalized_with_jacobian(x, y, coeffs)
+    )
+    error_x = distorted_x - target_x
+    error_y = distorted_y - target_y
+    determinant = dx_dx * dy_dy - dx_dy * dy_dx
+    return (
+        (dy_dy * error_x - dx_dy * error_y) / determinant,
+        (dx_dx * error_y - dy_dx * error_x) / determinant,
+        determinant,
+    )
+
+
+def _valid_solutions(
+    x: np.ndarray, y: np.ndarray, points: np.ndarray, coeffs: np.ndarray
+) -> np.ndarray:
+    """
+    Checks that the undistorted points are distorted to the points and that they are in the
+    region where the model is one-to-one
+    :param x: The undistorted x coordinates
+    :param y: The undistorted y coordinates
+    :param points: The distorted normalized coordinates, shape (N, 2)
+    :param coeffs: The 12 distortion coefficients, see `vectorized_coeffs`
+    :returns: The mask of the valid solutions
+    """
+    distorted_x, distorted_y, radial, dx_dx, dx_dy, dy_dx, dy_dy = (
+        _distort_normalized_with_jacobian(x, y, coeffs)
+    )
+    residuals = np.hypot(distorted_x - points[:, 0], distorted_y - points[:, 1])
+    valid = (residuals <= _RESIDUAL_TOLERANCE) & (radial > 0)
+    return valid & (dx_dx * dy_dy - dx_dy * dy_dx > 0)
+
+
+def pixels_to_normalized(
+    points: np.ndarray, intrinsic_matrix: np.ndarray
+) -> np.ndarray:
+    """
+    Converts pixel coordinates to normalized coordinates
+    :param points: The pixel coordinates, shape (N, 2)
+    :param intrinsic_matrix: The intrinsic matrix of the image
+    :returns: The normalized coordinates, shape (N, 2)
+    """
+    inverse = np.linalg.inv(intrinsic_matrix)
+    return points @ inverse[:2, :2].T + inverse[:2, 2]
+
+
+def normalized_to_pixels(
+    points: np.ndarray, intrinsic_matrix: np.ndarray
+) -> np.ndarray:
+    """
+    Converts normalized coordinates to pixel coordinates
+    :param points: The normalized coordinates, shape (N, 2)
+    :param intrinsic_matrix: The intrinsic matrix of the image
+    :returns: The pixel coordinates, shape (N, 2)
+    """
+    return points @ intrinsic_matrix[:2, :2].T + intrinsic_matrix[:2, 2]
+
+
+def map_points(
+    points: np.ndarray,
+    source_matrix: np.ndarray,
+    target_matrix: np.ndarray,
+    mapping: Callable[[np.ndarray], np.ndarray],
+) -> np.ndarray:
+    """
+    Maps pixel coordinates between two images through normalized coordinates
+    :param points: The pixel coordinates on the source image, shape (..., 2)
+    :param source_matrix: The intrinsic matrix of the source image
+    :param target_matrix: The intrinsic matrix of the target image
+    :param mapping: Maps the normalized coordinates, shape (N, 2)
+    :returns: The pixel coordinates on the target image with the shape of the input
+    """
+    points = np.asarray(points, dtype=np.float64)
+    normalized = pixels_to_normalized(points.reshape(-1, 2), source_matrix)
+    return normalized_to_pixels(mapping(normalized), target_matrix).reshape(points.shape)
@@ -0,0 +1,216 @@
+#!/usr/bin/env python
+"""
+Module for evaluating the reprojection error of a camera model.
+The points of every view are projected at once with NumPy instead of calling OpenCV view by view,
+so scoring many views is cheap and the residual of every point is kept.
+"""
+__author__ = "Peter Kocsis"
+__copyright__ = "Peter Kocsis"
+__credits__ = ["MIT License"]
+__version__ = "0.1"
+__maintainer__ = "Peter Kocsis"
+__email__ = "peter.kocsis@tum.de"
+__status__ = "Released"
+
+from typing import List, Sequence, Tuple, Union
+
+import cv2
+import numpy as np
+
+from camera_distortion.detection import CalibrationPoints
+from camera_distortion.point_distortion import distort_normalized, vectorized_coeffs
+
+
+def rotation_matrices(rvecs: np.ndarray) -> np.ndarray:
+    """
+    Converts rotation vectors to rotation matrices, the vectorized version of `cv2.Rodrigues`
+    :param rvecs: The rotation vectors with shape (N, 3)
+    :returns: The rotation matrices with shape (N, 3, 3)
+    """
+    rvecs = np.asarray(rvecs, dtype=np.float64).reshape(-1, 3)
+    theta = np.linalg.norm(rvecs, axis=1)
+    # The axis of a zero rotation is arbitrary
+    axis = rvecs / np.where(theta > 0, theta, 1)[:, None]
+    cos, sin = np.cos(theta)[:, None, None], np.sin(theta)[:, None, None]
+
+    cross = np.zeros((len(rvecs), 3, 3))
+    cross[:, 0, 1], cross[:, 0, 2] = -axis[:, 2], axis[:, 1]
+    cross[:, 1, 0], cross[:, 1, 2] = axis[:, 2], -axis[:, 0]
+    cross[:, 2, 0], cross[:, 2, 1] = -axis[:, 1], axis[:, 0]
+    outer = axis[:, :, None] * axis[:, None, :]
+    return cos * np.eye(3) + (1 - cos) * outer + sin * cross
+
+
+def project_points(  # pylint: disable=too-many-arguments
+    object_points: np.ndarray,
+    view_indices: np.ndarray,
+    rvecs: np.ndarray,
+    tvecs: np.ndarray,
+    intrinsic_matrix: np.ndarray,
+    distortion_coeffs: np.ndarray,
+) -> np.ndarray:
+    """
+    Projects the points of multiple views at once, the vectorized version of `cv2.projectPoints`.
+    The tilted sensor model is not vectorized, it falls back to OpenCV.
+    :param object_points: The reference points of every view concatenated, shape (P, 3)
+    :param view_indices: The index of the view of every point, shape (P,)
+    :param rvecs: The rotation vectors of the views, shape (V, 3)
+    :param tvecs: The translation vectors of the views, shape (V, 3)
+    :param intrinsic_matrix: The scaled intrinsic camera matrix
+    :param distortion_coeffs: The distortion coefficients defined by opencv
+    :returns: The projected image points, shape (P, 2)
+    """
+    object_points = np.asarray(object_points, dtype=np.float64).reshape(-1, 3)
+    view_indices = np.asarray(view_indices)
+    rvecs = np.asarray(rvecs, dtype=np.float64).reshape(-1, 3)
+    tvecs = np.asarray(tvecs, dtype=np.float64).reshape(-1, 3)
+    coeffs, vectorized = vectorized_coeffs(distortion_coeffs)
+    if not vectorized:
+        return _project_points_by_view(
+            object_points,
+            view_indices,
+            rvecs,
+            tvecs,
+            intrinsic_matrix,
+            distortion_coeffs,
+        )
+
+    # Transform the points to the camera coordinate system of their views
+    rotations = rotation_matrices(rvecs)[view_indices]
+    camera_points = np.einsum("pij,pj->pi", rotations, object_points)
+    camera_points += tvecs[view_indices]
+    x = camera_points[:, 0] / camera_points[:, 2]
+    y = camera_points[:, 1] / camera_points[:, 2]
+
+    # Apply the distortion
+    distorted_x, distorted_y = distort_normalized(x, y, coeffs)
+
+    return np.stack(
+        (
+            intrinsic_matrix[0, 0] * distorted_x + intrinsic_matrix[0, 2],
+            intrinsic_matrix[1, 1] * distorted_y + intrinsic_matrix[1, 2],
+        ),
+        axis=1,
+    )
+
+
+def _project_points_by_view(  # pylint: disable=too-many-arguments
+    object_points: np.ndarray,
+    view_indices: np.ndarray,
+    rvecs: np.ndarray,
+    tvecs: np.ndarray,
+    intrinsic_matrix: np.ndarray,
+    distortion_coeffs: np.ndarray,
+) -> np.ndarray:
+    """
+    Projects the points view by view with OpenCV, see `project_points`
+    """
+    image_points = np.empty((len(object_points), 2))
+    for idx, (rvec, tvec) in enumerate(zip(rvecs, tvecs)):
+        view_mask = view_indices == idx
+        projected, _ = cv2.projectPoints(
+            object_points[view_mask], rvec, tvec, intrinsic_matrix, distortion_coeffs
+        )
+        image_points[view_mask] = projected.reshape(-1, 2)
+    return image_points
+
+
+class ReprojectionError:
+    """
+    Reprojection error of a camera model on a set of views.
+    It keeps the residual of every point, so the views lowering the quality of the calibration
+    can be found.
+    """
+
+    # pylint: disable=unsubscriptable-object
+    def __init__(
+        self,
+        residuals: np.ndarray,
+        view_indices: np.ndarray,
+        view_names: Union[Sequence[str], None] = None,
+    ):
+        """
+        Initialize the error from the residuals
+        :param residuals: The difference of the detected and the projected points, shape (P, 2)
+        :param view_indices: The index of the view of every point, shape (P,)
+        :param view_names: The names of the views, e.g. the image paths, the indices by default
+        """
+        self.residuals = np.asarray(residuals, dtype=np.float64).reshape(-1, 2)
+        self.view_indices = np.asarray(view_indices)
+        num_of_views = int(self.view_indices.max()) + 1 if len(self.view_indices) else 0
+        self.view_names = (
+            list(view_names)
+            if view_names is not None
+            else [str(idx) for idx in range(num_of_views)]
+        )
+        self.point_errors = np.linalg.norm(self.residuals, axis=1)
+
+        squared_errors = np.bincount(
+            self.view_indices, self.point_errors ** 2, minlength=num_of_views
+        )
+        view_point_counts = np.bincount(self.view_indices, minlength=num_of_views)
+        # The RMS error of every view in pixels
+        self.view_errors = np.sqrt(squared_errors / view_point_counts)
+        # The L2 norm of the residuals of a view divided by its number of points,
+        # averaged over the views as the error has been reported traditionally
+        self.total = float(np.mean(np.sqrt(squared_errors) / view_point_counts))
+        # The RMS error of every point, as reported by `cv2.calibrateCamera`
+        self.rms = float(np.sqrt(np.mean(self.point_errors ** 2)))
+
+    def view_residuals(self, view_idx: int) -> np.ndarray:
+        """
+        Gets the residuals of a single view
+        :param view_idx: The index of the view
+        :returns: The residuals of the points of the view, shape (N, 2)
+        """
+        return self.residuals[self.view_indices == view_idx]
+
+    def worst_views(self, count: int = 5) -> List[Tuple[str, float]]:
+        """
+        Gets the views with the largest errors
+        :param count: The number of the views
+        :returns: The name and the RMS error of the views in decreasing order of the error
+        """
+        order = np.argsort(self.view_errors)[::-1][:count]
+        return [(self.view_names[idx], float(self.view_errors[idx])) for idx in order]
+
+    def __str__(self):
+        """
+        String representation of the object
+        """
+        return (
+            f"total: {self.total:.4f}, RMS: {self.rms:.4f} px "
+            f"over {len(self.view_errors)} views"
+        )
+
+
+def reprojection_error(
+    points: CalibrationPoints,
+    rvecs: np.ndarray,
+    tvecs: np.ndarray,
+    intrinsic_matrix: np.ndarray,
+    distortion_coeffs: np.ndarray,
+) -> ReprojectionError:
+    """
+    Calculates the reprojection error of every point of every view at once
+    :param points: The calibration points of the views
+    :param rvecs: The rotation vectors of the views
+    :param tvecs: The translation vectors of the views
+    :param intrinsic_matrix: The scaled intrinsic camera matrix
+    :param distortion_coeffs: The distortion coefficients defined by opencv
+    :returns: The reprojection error
+    """
+    view_indices = np.repeat(
+        np.arange(len(points.object_points)),
+        [len(object_point) for object_point in points.object_points],
+    )
+    projected_points = project_points(
+        np.concatenate(points.object_points).reshape(-1, 3),
+        view_indices,
+        rvecs,
+        tvecs,
+        intrinsic_matrix,
+        distortion_coeffs,
+    )
+    residuals = np.concatenate(points.image_points).reshape(-1, 2) - projected_points
+    return ReprojectionError(residuals, view_indices, points.view_names)
@@ -0,0 +1,270 @@
+#!/usr/bin/env python
+"""
+Streaming pipeline for processing video frames.
+The decoding, the processing and the encoding of the frames run in separate threads connected by
+bounded queues, so they overlap instead of running lock-step. The processing is distributed among
+multiple worker threads, which run in parallel as OpenCV and the video pipes release the GIL.
+The frames are encoded in their original order.
+"""
+__author__ = "Peter Kocsis"
+__copyright__ = "Peter Kocsis"
+__credits__ = ["MIT License"]
+__version__ = "0.1"
+__maintainer__ = "Peter Kocsis"
+__email__ = "peter.kocsis@tum.de"
+__status__ = "Released"
+
+import logging
+import os
+import queue
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, Union
+
+import numpy as np
+
+logger = logging.getLogger(__file__)
+
+# Marks the end of the frame stream in the queues
+_END_OF_STREAM = object()
+
+
+class StageStatistics:
+    """
+    Statistics of a pipeline stage
+    """
+
+    def __init__(self, name: str, threads: int = 1):
+        """
+        Initialize empty statistics
+        :param name: The name of the stage
+        :param threads: The number of the threads running the stage
+        """
+        self.name = name
+        self.threads = threads
+        self.frames = 0
+        self.busy_seconds = 0.0
+        self._lock = threading.Lock()
+
+    def add(self, busy_seconds: float):
+        """
+        Records a processed frame
+        :param busy_seconds: The time spent on the frame
+        """
+        with self._lock:
+            self.frames += 1
+            self.busy_seconds += busy_seconds
+
+    @property
+    def fps(self) -> float:
+        """
+        Returns the number of the frames the stage can process per second
+        """
+        if self.busy_seconds == 0:
+            return 0.0
+        return self.frames * self.threads / self.busy_seconds
+
+    def __str__(self):
+        """
+        String representation of the object
+        """
+        return f"{self.name}: {self.frames} frames, {self.fps:.1f} fps"
+
+
+# pylint: disable=too-few-public-methods
+class FramePipeline:
+    """
+    Pipeline of a decoder, worker and encoder stages connected by bounded queues.
+    The decoder stays at most `workers + queue_size` frames ahead of the encoder, so the frames
+    finished out of order and waiting for their predecessors are bounded as well.
+    """
+
+    def __init__(
+        self,
+        process_frame: Callable[[np.ndarray], np.ndarray],
+        workers: Union[int, None] = None,  # pylint: disable=unsubscriptable-object
+        queue_size: int = 8,
+    ):
+        """
+        Initialize the pipeline
+        :param process_frame: The function processing a frame, called from multiple threads
+        :param workers: The number of the worker threads, None uses every CPU core
+        :param queue_size: The maximal number of the frames waiting between two stages
+        """
+        self.process_frame = process_frame
+        self.workers = workers or os.cpu_count()
+        self.queue_size = queue_size
+        self._stop = threading.Event()
+        self._errors = []
+
+    def _put(self, target_queue: queue.Queue, item: Any):
+        """
+        Puts an item into a queue, waiting for free space unless the pipeline is stopped
+        """
+        while not self._stop.is_set():
+            try:
+                target_queue.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+    def _get(self, source_queue: queue.Queue) -> Any:
+        """
+        Gets an item from a queue, waiting for it unless the pipeline is stopped
+        """
+        while not self._stop.is_set():
+            try:
+                return source_queue.get(timeout=0.1)
+            except queue.Empty:
+                continue
+        return _END_OF_STREAM
+
+    def _acquire(self, window: threading.Semaphore) -> bool:
+        """
+        Acquires a slot of the reorder window, waiting for it unless the pipeline is stopped
+        :returns: Whether the slot is acquired
+        """
+        while not self._stop.is_set():
+            if window.acquire(timeout=0.1):
+                return True
+        return False
+
+    def _fail(self, error: BaseException):
+        """
+        Records an error and stops every stage
+        """
+        self._errors.append(error)
+        self._stop.set()
+
+    def _decode(
+        self,
+        frames: Iterable[np.ndarray],
+        frame_queue: queue.Queue,
+        statistics: StageStatistics,
+        window: threading.Semaphore,
+    ):
+        """
+        Decoder stage, reads the frames and numbers them, a frame is read when the encoder has
+        written the frame `window` frames before it
+        """
+        try:
+            frame_iterator = iter(frames)
+            idx = 0
+            while self._acquire(window):
+                start = time.perf_counter()
+                frame = next(frame_iterator, _END_OF_STREAM)
+                if frame is _END_OF_STREAM:
+                    break
+                statistics.add(time.perf_counter() - start)
+                self._put(frame_queue, (idx, frame))
+                idx += 1
+        except Exception as e:  # pylint: disable=broad-except
+            self._fail(e)
+        finally:
+            for _ in range(self.workers):
+                self._put(frame_queue, _END_OF_STREAM)
+
+    def _work(
+        self,
+        frame_queue: queue.Queue,
+        result_queue: queue.Queue,
+        statistics: StageStatistics,
+    ):
+        """
+        Worker stage, processes the frames
+        """
+        try:
+            while True:
+                item = self._get(frame_queue)
+                if item is _END_OF_STREAM:
+                    break
+                idx, frame = item
+                start = time.perf_counter()
+                result = self.process_frame(frame)
+                statistics.add(time.perf_counter() - start)
+                self._put(result_queue, (idx, result))
+        except Exception as e:  # pylint: disable=broad-except
+            self._fail(e)
+        finally:
+            self._put(result_queue, _END_OF_STREAM)
+
+    def _encode(
+        self,
+        result_queue: queue.Queue,
+        write_frame: Callable[[np.ndarray], Any],
+        statistics: StageStatistics,
+        window: threading.Semaphore,
+    ):
+        """
+        Encoder stage, writes the frames in the original order, the frames finished out of order
+        wait until their predecessors arrive. A written frame lets the decoder read the next one.
+        """
+        pending = {}
+        next_idx = 0
+        running_workers = self.workers
+        while running_workers > 0:
+            item = self._get(result_queue)
+            if item is _END_OF_STREAM:
+                running_workers -= 1
+                continue
+            idx, result = item
+            pending[idx] = result
+            while next_idx in pending:
+                start = time.perf_counter()
+                write_frame(pending.pop(next_idx))
+                statistics.add(time.perf_counter() - start)
+                window.release()
+                next_idx += 1
+
+    def run(
+        self, frames: Iterable[np.ndarray], write_frame: Callable[[np.ndarray], Any]
+    ) -> Dict[str, StageStatistics]:
+        """
+        Processes the frames and writes the results in the original order.
+        The encoder stage runs in the calling thread.
+        :param frames: The frames to be processed
+        :param write_frame: The function writing a processed frame
+        :returns: The statistics of the decoder, worker and encoder stages
+        :raise: The first error raised by any of the stages
+        """
+        self._stop.clear()
+        self._errors = []
+        statistics = {
+            "decoder": StageStatistics("decoder"),
+            "remap": StageStatistics("remap", self.workers),
+            "encoder": StageStatistics("encoder"),
+        }
+        frame_queue = queue.Queue(self.queue_size)
+        result_queue = queue.Queue(self.queue_size)
+        window = threading.Semaphore(self.workers + self.queue_size)
+        threads = [
+            threading.Thread(
+                target=self._decode,
+                args=(frames, frame_queue, statistics["decoder"], window),
+                daemon=True,
+            )
+        ] + [
+            threading.Thread(
+                target=self._work,
+                args=(frame_queue, result_queue, statistics["remap"]),
+                daemon=True,
+            )
+            for _ in range(self.workers)
+        ]
+        for thread in threads:
+            thread.start()
+
+        try:
+            self._encode(result_queue, write_frame, statistics["encoder"], window)
+        except Exception as e:  # pylint: disable=broad-except
+            self._fail(e)
+        finally:
+            self._stop.set()
+            for thread in threads:
+                thread.join()
+
+        if self._errors:
+            raise self._errors[0]
+        for stage_statistics in statistics.values():
+            logger.debug("%s", stage_statistics)
+        return statistics
@@ -0,0 +1,804 @@
+#!/usr/bin/env python
+"""
+Long-running local undistortion service.
+Every run of the undistortion script pays the interpreter startup, the imports, loading the camera
+model and creating the maps. The service keeps the loaded camera models and the undistortion maps
+warm instead, so a request of a known camera and image size only remaps. It listens on localhost
+HTTP or on a Unix socket and serves the requests on threads, a bounded number of them undistorts
+at the same time, OpenCV releases the GIL while remapping.
+
+Endpoints:
+    POST /undistort/file: JSON with the `media_path`, the `out_folder` and the `parameters` file,
+                          optionally the `crop`, the `map_format` and `redistort`, the response
+                          is JSON with the `output` path
+    POST /undistort/image: encoded image in the body, the `parameters` file, the `crop`, the
+                           `map_format` and `redistort` in the query, the response is the
+                           undistorted image in the same format
+    GET /metrics: JSON of the request, model and map cache metrics
+    GET /health: JSON status
+"""
+__author__ = "Peter Kocsis"
+__copyright__ = "Peter Kocsis"
+__credits__ = ["MIT License"]
+__version__ = "0.1"
+__maintainer__ = "Peter Kocsis"
+__email__ = "peter.kocsis@tum.de"
+__status__ = "Released"
+
+import argparse
+import http.client
+import json
+import logging
+import os
+import socket
+import socketserver
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import BytesIO
+from typing import Dict, Iterator, Tuple, Union
+from urllib.parse import parse_qs, urlencode, urlsplit
+
+from PIL import Image
+
+from camera_distortion.camera_model import CameraModel, MapFormat
+from camera_distortion.undistortion.undistort import (
+    undistort_image,
+    remappable_image_data,
+    undistort_video,
+    undistorted_media_path,
+)
+from camera_distortion.util.buffer_pool import BufferPool
+from camera_distortion.util.io import MediaType, media_type
+from camera_distortion.util.logger import init_logger
+from camera_distortion.util.map_store import MapStore, default_map_store_path
+
+logger = logging.getLogger(__file__)
+
+
+def service_argsparser() -> argparse.ArgumentParser:
+    """
+    Creates a parser for the script's arguments
+    :returns: ArgumentParser object for parsing the script's arguments
+    """
+    parser = argparse.ArgumentParser(
+        description="Service undistorting media files with warm camera models and maps."
+    )
+    parser.add_argument("--host", type=str, default="127.0.0.1", help="The address to listen on")
+    parser.add_argument("--port", type=int, default=8765, help="The port to listen on")
+    parser.add_argument(
+        "-s",
+        "--socket",
+        type=str,
+        default=None,
+        help="Path of a Unix socket to listen on instead of HTTP over TCP",
+    )
+    parser.add_argument(
+        "-j",
+        "--max_concurrent",
+        type=int,
+        default=0,
+        help="Number of the requests undistorted at the same time, 0 uses every CPU core",
+    )
+    parser.add_argument(
+        "--queue_timeout",
+        type=float,
+        default=30.0,
+        help="Seconds a request waits for undistortion before it is rejected as busy",
+    )
+    parser.add_argument(
+        "-ms",
+        "--map_store",
+        type=str,
+        default=default_map_store_path(),
+        help="Folder for persisting the undistortion maps between the runs",
+    )
+    parser.add_argument(
+        "--no_map_store",
+        action="store_true",
+        default=False,
+        help="Do not persist the undistortion maps",
+    )
+    parser.add_argument(
+        "--max_map_error",
+        type=float,
+        default=None,
+        help="Interpolate the redistortion maps from a coarse grid "
+        "with at most this positional error in pixels",
+    )
+    return parser
+
+
+class ServiceBusy(Exception):
+    """
+    Raised when a request can not be undistorted within the queue timeout
+    """
+
+
+class ServiceError(Exception):
+    """
+    Error response of the service
+    """
+
+    def __init__(self, status: int, message: str):
+        """
+        Initialize the error
+        :param status: The HTTP status of the response
+        :param message: The error message of the service
+        """
+        super().__init__(f"{status}: {message}")
+        self.status = status
+        self.message = message
+
+
+class ModelRegistry:
+    """
+    Thread-safe registry of the loaded camera models.
+    The models are keyed by the path of their parameter file and reloaded when it is modified.
+    The maps are cached by the fingerprint of the model parameters, so they stay warm while the
+    parameters are the same.
+    """
+
+    # pylint: disable=unsubscriptable-object
+    def __init__(
+        self,
+        max_map_error: Union[float, None] = None,
+        map_store: Union[MapStore, None] = None,
+    ):
+        """
+        Initialize empty registry
+        :param max_map_error: The maximal error of interpolated redistortion maps of the models in
+                              pixels, None for exact maps
+        :param map_store: The persistent store of the maps of the models, None uses the store set
+                          on `CameraModel`
+        """
+        self.max_map_error = max_map_error
+        self.map_store = map_store
+        self.loads = 0
+        self._models: Dict[str, Tuple[int, CameraModel]] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        """
+        Returns the number of the loaded models
+        """
+        with self._lock:
+            return len(self._models)
+
+    def get(self, parameters_file: str) -> CameraModel:
+        """
+        Gets a camera model, loads it if it is new or its file has been modified
+        :param parameters_file: Path of the camera parameter file
+        :returns: The camera model
+        """
+        path = os.path.abspath(parameters_file)
+        modified = os.stat(path).st_mtime_ns
+        with self._lock:
+            loaded = self._models.get(path)
+            if loaded is not None and loaded[0] == modified:
+                return loaded[1]
+        # Loading is cheap, concurrent loads of the same file are not worth serializing
+        camera_model = CameraModel.from_json(path)
+        camera_model.max_map_error = self.max_map_error
+        if self.map_store is not None:
+            camera_model.map_store = self.map_store
+        with self._lock:
+            self._models[path] = (modified, camera_model)
+            self.loads += 1
+        logger.info("Camera model %s loaded", path)
+        return camera_model
+
+
+class ServiceMetrics:
+    """
+    Thread-safe metrics of the requests of the service
+    """
+
+    def __init__(self):
+        """
+        Initialize empty metrics
+        """
+        self.started = time.time()
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.rejected = 0
+        self._endpoints: Dict[str, Dict[str, float]] = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def request(self, endpoint: str) -> Iterator[Dict[str, int]]:
+        """
+        Context manager measuring a request
+        :param endpoint: The name of the endpoint
+        :returns: Dictionary, the handler sets its `status` to the status of the response
+        """
+        response = {"status": 500}
+        with self._lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        start = time.perf_counter()
+        try:
+            yield response
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                self.in_flight -= 1
+                metrics = self._endpoints.setdefault(
+                    endpoint,
+                    {"requests": 0, "errors": 0, "total_seconds": 0.0, "max_seconds": 0.0},
+                )
+                metrics["requests"] += 1
+                metrics["errors"] += response["status"] >= 400
+                metrics["total_seconds"] += elapsed
+                metrics["max_seconds"] = max(metrics["max_seconds"], elapsed)
+                self.rejected += response["status"] == 503
+
+    def as_dict(self) -> dict:
+        """
+        Returns the metrics
+        :returns: Dictionary with the uptime, the concurrency and the metrics of every endpoint
+        """
+        with self._lock:
+            endpoints = {
+                endpoint: dict(
+                    metrics,
+                    mean_seconds=metrics["total_seconds"] / metrics["requests"],
+                )
+                for endpoint, metrics in self._endpoints.items()
+            }
+            return {
+                "uptime_seconds": time.time() - self.started,
+                "in_flight": self.in_flight,
+                "max_in_flight": self.max_in_flight,
+                "rejected": self.rejected,
+                "endpoints": endpoints,
+            }
+
+
+class UndistortionService:
+    """
+    Undistortion of the requests with warm camera models and maps, independent of the transport
+    """
+
+    # pylint: disable=unsubscriptable-object
+    def __init__(
+        self,
+        max_concurrent: Union[int, None] = None,
+        queue_timeout: float = 30.0,
+        max_map_error: Union[float, None] = None,
+        map_store: Union[str, None] = None,
+    ):
+        """
+        Initialize the service
+        :param max_concurrent: The number of the requests undistorted at the same time,
+                               None uses every CPU core
+        :param queue_timeout: Seconds a request waits for undistortion before it is rejected
+        :param max_map_error: If given, the redistortion maps are interpolated from a coarse grid
+                              with at most this positional error in pixels
+        :param map_store: Folder for persisting the undistortion maps of the models, None uses
+                          the store set on `CameraModel`
+        """
+        self.max_concurrent = max_concurrent or os.cpu_count()
+        self.queue_timeout = queue_timeout
+        self.models = ModelRegistry(
+            max_map_error, None if map_store is None else MapStore(map_store)
+        )
+        self.metrics = ServiceMetrics()
+        self.buffers = BufferPool()
+        self._slots = threading.BoundedSemaphore(self.max_concurrent)
+
+    @contextmanager
+    def _slot(self):
+        """
+        Context manager of an undistortion slot, bounding the concurrency
+        :raise ServiceBusy: If no slot is free within the queue timeout
+        """
+        if not self._slots.acquire(timeout=self.queue_timeout):
+            raise ServiceBusy(f"No free slot within {self.queue_timeout} s")
+        try:
+            yield
+        finally:
+            self._slots.release()
+
+    # pylint: disable=too-many-arguments
+    def undistort_file(
+        self,
+        media_path: str,
+        out_folder: str,
+        parameters_file: str,
+        crop: float = 0.0,
+        map_format: MapFormat = MapFormat.FLOAT,
+        redistort: bool = False,
+    ) -> str:
+        """
+        Undistorts a media file into the output folder, see `undistort_image`
+        :param media_path: The path of the image or video
+        :param out_folder: The output folder path
+        :param parameters_file: Path of the camera parameter file
+        :param crop: Cropping parameter for the undistortion
+        :param map_format: The format of the undistortion maps
+        :param redistort: Indicates whether to redistort an undistorted media file instead
+        :returns: The path of the undistorted media file
+        """
+        if not os.path.isfile(media_path):
+            raise FileNotFoundError(f"No media file {media_path}")
+        file_type = media_type(media_path)
+        if file_type is None:
+            raise ValueError(f"Unknown media type of {media_path}")
+        camera_model = self.models.get(parameters_file)
+        with self._slot():
+            if file_type == MediaType.IMAGE:
+                undistort_image(
+                    media_path,
+                    out_folder,
+                    camera_model,
+                    crop,
+                    map_format,
+                    redistort=redistort,
+                    buffers=self.buffers,
+                )
+            else:
+                undistort_video(
+                    media_path, out_folder, camera_model, crop, map_format, redistort=redistort
+                )
+        return undistorted_media_path(media_path, out_folder, redistort)
+
+    def undistort_bytes(
+        self,
+        data: bytes,
+        parameters_file: str,
+        crop: float = 0.0,
+        map_format: MapFormat = MapFormat.FLOAT,
+        redistort: bool = False,
+    ) -> bytes:
+        """
+        Undistorts an encoded image in memory, the meta-data is kept
+        :param data: The encoded image
+        :param parameters_file: Path of the camera parameter file
+        :param crop: Cropping parameter for the undistortion
+        :param map_format: The format of the undistortion maps
+        :param redistort: Indicates whether to redistort an undistorted image instead
+        :returns: The undistorted image encoded in the format of the input
+        """
+        camera_model = self.models.get(parameters_file)
+        image = Image.open(BytesIO(data))
+        output = BytesIO()
+        save_parameters = {"exif": image.info["exif"]} if "exif" in image.info else {}
+        with self._slot():
+            image_data = remappable_image_data(image)
+            remap = camera_model.redistort_image if redistort else camera_model.undistort_image
+            with self.buffers.buffer(image_data.shape, image_data.dtype) as dst:
+                # The image may share the memory of the buffer, it is encoded before the buffer
+                # is released
+                undistorted_image = Image.fromarray(remap(image_data, crop, map_format, dst=dst))
+                undistorted_image.save(output, format=image.format, **save_parameters)
+        return output.getvalue()
+
+    def status(self) -> dict:
+        """
+        Returns the metrics of the service
+        :returns: Dictionary with the request metrics, the loaded models and the map cache
+        """
+        return dict(
+            self.metrics.as_dict(),
+            max_concurrent=self.max_concurrent,
+            models=len(self.models),
+            model_loads=self.models.loads,
+            map_cache=CameraModel.map_cache.stats(),
+            output_buffers=str(self.buffers),
+        )
+
+
+def _bool_parameter(value: Union[str, bool]) -> bool:
+    """
+    Parses a boolean parameter of a request
+    :param value: The value of the parameter
+    :returns: The boolean value
+    """
+    if isinstance(value, bool):
+        return value
+    return value.lower() in ("1", "true", "yes")
+
+
+class _RequestHandler(BaseHTTPRequestHandler):
+    """
+    Handler of the HTTP requests of the service
+    """
+
+    # Limit of the request bodies, larger requests are rejected
+    max_request_bytes = 512 * 1024 ** 2
+
+    def address_string(self):
+        """
+        Returns the client address, Unix sockets have no address
+        """
+        if isinstance(self.client_address, tuple):
+            return super().address_string()
+        return "local"
+
+    def log_message(self, format, *args):  # pylint: disable=redefined-builtin
+        """
+        Logs the requests to the logger of the module instead of the standard error
+        """
+        logger.debug("%s %s", self.address_string(), format % args)
+
+    @property
+    def service(self) -> UndistortionService:
+        """
+        Returns the service of the server
+        """
+        return self.server.service
+
+    def _send(self, status: int, body: bytes, content_type: str):
+        """
+        Sends a response
+        :param status: The HTTP status
+        :param body: The body of the response
+        :param content_type: The content type of the body
+        """
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_json(self, status: int, value: dict):
+        """
+        Sends a JSON response
+        :param status: The HTTP status
+        :param value: The content of the response
+        """
+        self._send(status, json.dumps(value).encode("utf-8"), "application/json")
+
+    def _read_body(self) -> bytes:
+        """
+        Reads the body of the request
+        :returns: The body
+        """
+        length = int(self.headers.get("Content-Length", 0))
+        if length > self.max_request_bytes:
+            raise OverflowError(f"Request of {length} bytes is too large")
+        return self.rfile.read(length)
+
+    def _handle(self, endpoints: dict):
+        """
+        Calls the handler of the endpoint and sends the errors with their status
+        :param endpoints: The handlers of the paths
+        """
+        url = urlsplit(self.path)
+        handler = endpoints.get(url.path)
+        if handler is None:
+            self._send_json(404, {"error": f"Unknown endpoint {url.path}"})
+            return
+        with self.service.metrics.request(url.path) as response:
+            try:
+                response["status"] = 200
+                handler({key: values[-1] for key, values in parse_qs(url.query).items()})
+            # pylint: disable=broad-except
+            except Exception as e:
+                if isinstance(e, ServiceBusy):
+                    response["status"] = 503
+                elif isinstance(e, FileNotFoundError):
+                    response["status"] = 404
+                elif isinstance(e, OverflowError):
+                    response["status"] = 413
+                elif isinstance(e, (KeyError, ValueError, OSError)):
+                    response["status"] = 400
+                else:
+                    response["status"] = 500
+                    logger.exception("Request %s failed", self.path)
+                self._send_json(response["status"], {"error": f"{type(e).__name__}: {e}"})
+
+    def do_GET(self):  # pylint: disable=invalid-name
+        """
+        Handles the GET requests
+        """
+        self._handle(
+            {
+                "/health": lambda _: self._send_json(200, {"status": "ok"}),
+                "/metrics": lambda _: self._send_json(200, self.service.status()),
+            }
+        )
+
+    def do_POST(self):  # pylint: disable=invalid-name
+        """
+        Handles the POST requests
+        """
+        self._handle({"/undistort/file": self._undistort_file, "/undistort/image": self._image})
+
+    def _undistort_file(self, _):
+        """
+        Undistorts a media file given by the JSON body
+        """
+        request = json.loads(self._read_body())
+        output = self.service.undistort_file(
+            request["media_path"],
+            request["out_folder"],
+            request["parameters"],
+            float(request.get("crop", 0.0)),
+            MapFormat(request.get("map_format", MapFormat.FLOAT.value)),
+            _bool_parameter(request.get("redistort", False)),
+        )
+        self._send_json(200, {"output": output})
+
+    def _image(self, query: dict):
+        """
+        Undistorts the image in the body
+        """
+        data = self._read_body()
+        undistorted = self.service.undistort_bytes(
+            data,
+            query["parameters"],
+            float(query.get("crop", 0.0)),
+            MapFormat(query.get("map_format", MapFormat.FLOAT.value)),
+            _bool_parameter(query.get("redistort", False)),
+        )
+        self._send(200, undistorted, "application/octet-stream")
+
+
+class _ServiceHTTPServer(ThreadingHTTPServer):
+    """
+    HTTP server of the service on TCP, every request is handled on a new thread
+    """
+
+    def __init__(self, server_address: Tuple[str, int], service: UndistortionService):
+        """
+        Initialize the server, listening right away
+        :param server_address: The address and the port to listen on
+        :param service: The service handling the requests
+        """
+        self.service = service
+        super().__init__(server_address, _RequestHandler)
+
+
+class _UnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """
+    HTTP server of the service on a Unix socket, every request is handled on a new thread
+    """
+
+    daemon_threads = True
+
+    def __init__(self, socket_path: str, service: UndistortionService):
+        """
+        Initialize the server, listening right away
+        :param socket_path: The path of the Unix socket
+        :param service: The service handling the requests
+        """
+        self.service = service
+        super().__init__(socket_path, _RequestHandler)
+
+
+# pylint: disable=unsubscriptable-object
+def create_server(
+    service: UndistortionService,
+    host: str = "127.0.0.1",
+    port: int = 8765,
+    socket_path: Union[str, None] = None,
+) -> socketserver.BaseServer:
+    """
+    Creates the server of the service, started by its `serve_forever`
+    :param service: The service
+    :param host: The address to listen on
+    :param port: The port to listen on, 0 selects a free port
+    :param socket_path: Path of a Unix socket to listen on instead of TCP if given
+    :returns: The server
+    """
+    if socket_path is not None:
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+        return _UnixHTTPServer(socket_path, service)
+    return _ServiceHTTPServer((host, port), service)
+
+
+class _UnixHTTPConnection(http.client.HTTPConnection):
+    """
+    HTTP connection over a Unix socket
+    """
+
+    def __init__(self, socket_path: str, timeout: float):
+        """
+        Initialize the connection
+        :param socket_path: Path of the Unix socket
+        :param timeout: The timeout of the socket operations in seconds
+        """
+        super().__init__("localhost", timeout=timeout)
+        self.socket_path = socket_path
+
+    def connect(self):
+        """
+        Connects to the Unix socket
+        """
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self.socket_path)
+
+
+class UndistortionClient:
+    """
+    Client of the undistortion service, every request uses a new connection, so the client can be
+    used from multiple threads
+    """
+
+    # pylint: disable=unsubscriptable-object
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 8765,
+        socket_path: Union[str, None] = None,
+        timeout: float = 600.0,
+    ):
+        """
+        Initialize the client
+        :param host: The address of the service
+        :param port: The port of the service
+        :param socket_path: Path of the Unix socket of the service, used instead of TCP if given
+        :param timeout: The timeout of the requests in seconds
+        """
+        self.host = host
+        self.port = port
+        self.socket_path = socket_path
+        self.timeout = timeout
+
+    def _request(
+        self, method: str, path: str, body: Union[bytes, None] = None, content_type: str = ""
+    ) -> bytes:
+        """
+        Sends a request to the service
+        :param method: The HTTP method
+        :param path: The path and the query of the endpoint
+        :param body: The body of the request
+        :param content_type: The content type of the body
+        :returns: The body of the response
+        :raise ServiceError: If the service responds with an error
+        """
+        if self.socket_path is not None:
+            connection = _UnixHTTPConnection(self.socket_path, self.timeout)
+        else:
+            connection = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+        try:
+            headers = {"Content-Type": content_type} if content_type else {}
+            connection.request(method, path, body=body, headers=headers)
+            response = connection.getresponse()
+            data = response.read()
+        finally:
+            connection.close()
+        if response.status >= 400:
+            try:
+                message = json.loads(data)["error"]
+            except (ValueError, KeyError):
+                message = data.decode("utf-8", errors="replace")
+            raise ServiceError(response.status, message)
+        return data
+
+    # pylint: disable=too-many-arguments
+    def undistort_file(
+        self,
+        media_path: str,
+        out_folder: str,
+        parameters_file: str,
+        crop: float = 0.0,
+        map_format: MapFormat = MapFormat.FLOAT,
+        redistort: bool = False,
+    ) -> str:
+        """
+        Undistorts a media file into the output folder, the paths are of the service's file system
+        :param media_path: The path of the image or video
+        :param out_folder: The output folder path
+        :param parameters_file: Path of the camera parameter file
+        :param crop: Cropping parameter for the undistortion
+        :param map_format: The format of the undistortion maps
+        :param redistort: Indicates whether to redistort an undistorted media file instead
+        :returns: The path of the undistorted media file
+        """
+        request = {
+            "media_path": os.path.abspath(media_path),
+            "out_folder": os.path.abspath(out_folder),
+            "parameters": os.path.abspath(parameters_file),
+            "crop": crop,
+            "map_format": MapFormat(map_format).value,
+            "redistort": redistort,
+        }
+        response = self._request(
+            "POST", "/undistort/file", json.dumps(request).encode("utf-8"), "application/json"
+        )
+        return json.loads(response)["output"]
+
+    def undistort_bytes(
+        self,
+        data: bytes,
+        parameters_file: str,
+        crop: float = 0.0,
+        map_format: MapFormat = MapFormat.FLOAT,
+        redistort: bool = False,
+    ) -> bytes:
+        """
+        Undistorts an encoded image in memory
+        :param data: The encoded image
+        :param parameters_file: Path of the camera parameter file
+        :param crop: Cropping parameter for the undistortion
+        :param map_format: The format of the undistortion maps
+        :param redistort: Indicates whether to redistort an undistorted image instead
+        :returns: The undistorted image encoded in the format of the input
+        """
+        query = urlencode(
+            {
+                "parameters": os.path.abspath(parameters_file),
+                "crop": crop,
+                "map_format": MapFormat(map_format).value,
+                "redistort": redistort,
+            }
+        )
+        return self._request(
+            "POST", f"/undistort/image?{query}", data, "application/octet-stream"
+        )
+
+    def metrics(self) -> dict:
+        """
+        Gets the metrics of the service
+        :returns: The metrics, see `UndistortionService.status`
+        """
+        return json.loads(self._request("GET", "/metrics"))
+
+    def health(self) -> bool:
+        """
+        Checks whether the service is running
+        :returns: True if the service responds
+        """
+        try:
+            return json.loads(self._request("GET", "/health"))["status"] == "ok"
+        except (OSError, ServiceError):
+            return False
+
+
+# pylint: disable=too-many-arguments,unsubscriptable-object
+def serve(
+    host: str = "127.0.0.1",
+    port: int = 8765,
+    socket_path: Union[str, None] = None,
+    max_concurrent: Union[int, None] = None,
+    queue_timeout: float = 30.0,
+    map_store: Union[str, None] = None,
+    max_map_error: Union[float, None] = None,
+):
+    """
+    Runs the undistortion service until it is interrupted
+    :param host: The address to listen on
+    :param port: The port to listen on
+    :param socket_path: Path of a Unix socket to listen on instead of TCP if given
+    :param max_concurrent: The number of the requests undistorted at the same time,
+                           None or 0 uses every CPU core
+    :param queue_timeout: Seconds a request waits for undistortion before it is rejected
+    :param map_store: Folder for persisting the undistortion maps, not persisted if None
+    :param max_map_error: If given, the redistortion maps are interpolated from a coarse grid
+                          with at most this positional error in pixels
+    """
+    service = UndistortionService(max_concurrent, queue_timeout, max_map_error, map_store)
+    with create_server(service, host, port, socket_path) as server:
+        logger.info(
+            "Undistortion service listening on %s with %i concurrent requests",
+            socket_path or f"http://{host}:{server.server_address[1]}",
+            service.max_concurrent,
+        )
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            logger.info("Undistortion service stopped")
+        finally:
+            if socket_path is not None and os.path.exists(socket_path):
+                os.remove(socket_path)
+
+
+if __name__ == "__main__":
+    arguments = service_argsparser().parse_args(sys.argv[1:])
+    init_logger(logger)
+    serve(
+        host=arguments.host,
+        port=arguments.port,
+        socket_path=arguments.socket,
+        max_concurrent=arguments.max_concurrent,
+        queue_timeout=arguments.queue_timeout,
+        map_store=None if arguments.no_map_store else arguments.map_store,
+        max_map_error=arguments.max_map_error,
+    )
@@ -12,22 +12,42 @@ __email__ = "peter.kocsis@tum.de"
 __status__ = "Released"
 
 import argparse
+import json
 import logging
 import os
 import sys
-from typing import List, Union
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from types import SimpleNamespace
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Tuple, Union
 
-import cv2
 import numpy as np
 from PIL import Image
-from moviepy.video.io.VideoFileClip import VideoFileClip
 
-from camera_distortion.camera_model import CameraModel
+from camera_distortion.camera_model import CameraModel, MapFormat
+from camera_distortion.undistortion.pipeline import FramePipeline, StageStatistics
+from camera_distortion.util.buffer_pool import BufferPool
+from camera_distortion.util.discovery import MediaDiscovery
 from camera_distortion.util.logger import init_logger
-from camera_distortion.util.io import get_image_format, find_videos, find_images
+from camera_distortion.util.io import atomic_output, get_image_format
+from camera_distortion.util.job_manifest import MANIFEST_FILE_NAME, JobManifest
+from camera_distortion.util.map_store import MapStore, default_map_store_path
+from camera_distortion.util.shared_maps import (
+    SHARED_MEMORY_AVAILABLE,
+    SharedMapHandle,
+    SharedMapRegistry,
+)
 
 logger = logging.getLogger(__file__)
 
+# The image modes whose pixel values can be interpolated, e.g. not the palette indices
+_REMAPPABLE_MODES = frozenset(["RGB", "RGBA", "L", "I;16", "I", "F"])
+
+# The camera model and the output buffers of a worker process, initialized once by `_init_worker`
+_WORKER = SimpleNamespace(camera_model=None, buffers=None)
+
 
 def undistort_argsparser() -> argparse.ArgumentParser:
     """
@@ -58,63 +78,248 @@ def undistort_argsparser() -> argparse.ArgumentParser:
         "0 will crop all the black pixels, 1 keeps all the pixels",
     )
     parser.add_argument("-o", "--out_folder", type=str, help="The output folder")
+    parser.add_argument(
+        "-mf",
+        "--map_format",
+        type=str,
+        choices=[map_format.value for map_format in MapFormat],
+        default=MapFormat.FLOAT.value,
+        help="Format of the undistortion maps. "
+        "'fixed' uses less memory and remaps faster with at most 1/64 pixel error",
+    )
+    parser.add_argument(
+        "-ms",
+        "--map_store",
+        type=str,
+        default=default_map_store_path(),
+        help="Folder for persisting the undistortion maps between the runs",
+    )
+    parser.add_argument(
+        "--no_map_store",
+        action="store_true",
+        default=False,
+        help="Do not persist the undistortion maps",
+    )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=1,
+        help="Number of the worker processes undistorting the images, "
+        "0 uses every CPU core",
+    )
+    parser.add_argument(
+        "-tm",
+        "--tile_memory",
+        type=int,
+        default=None,
+        help="Undistort the images in bands using at most this many MB for the maps, "
+        "useful for very large images",
+    )
+    parser.add_argument(
+        "--no_shared_maps",
+        action="store_true",
+        default=False,
+        help="Do not share the undistortion maps between the worker processes",
+    )
+    parser.add_argument(
+        "-rd",
+        "--redistort",
+        action="store_true",
+        default=False,
+        help="Redistort undistorted media files to the geometry of the camera, "
+        "the crop must be the same as of the undistortion",
+    )
+    parser.add_argument(
+        "--max_map_error",
+        type=float,
+        default=None,
+        help="Interpolate the redistortion maps from a coarse grid "
+        "with at most this positional error in pixels",
+    )
+    parser.add_argument(
+        "--no_resume",
+        action="store_true",
+        default=False,
+        help="Process every media file, even the ones completed by a previous run "
+        "into the same output folder",
+    )
     return parser
 
 
+def _output_suffix(redistort: bool) -> str:
+    """
+    Gets the suffix of the output file names
+    :param redistort: Indicates whether the media files are redistorted
+    :returns: The suffix
+    """
+    return "_redist" if redistort else "_undist"
+
+
+def undistorted_media_path(media_path: str, out_folder: str, redistort: bool) -> str:
+    """
+    Gets the path of the undistorted media file
+    :param media_path: The path of the media file
+    :param out_folder: The output folder path
+    :param redistort: Indicates whether the media file is redistorted
+    :returns: The path of the output file
+    """
+    name, ext = os.path.splitext(os.path.basename(media_path))
+    return os.path.join(out_folder, f"{name}{_output_suffix(redistort)}{ext}")
+
+
+# pylint: disable=unsubscriptable-object
+def _job_settings(
+    camera_model: CameraModel,
+    crop: float,
+    map_format: MapFormat,
+    redistort: bool,
+    max_map_error: Union[float, None],
+) -> str:
+    """
+    Describes the settings determining the outputs of an undistortion job
+    :param camera_model: The camera model object
+    :param crop: Cropping parameter for the undistortion
+    :param map_format: The format of the undistortion maps
+    :param redistort: Indicates whether the media files are redistorted
+    :param max_map_error: The maximal error of interpolated redistortion maps in pixels or None
+    :returns: The description of the settings
+    """
+    return json.dumps(
+        {
+            "model": camera_model.fingerprint(),
+            "crop": float(crop),
+            "map_format": MapFormat(map_format).value,
+            "redistort": redistort,
+            "max_map_error": max_map_error if redistort else None,
+        },
+        sort_keys=True,
+    )
+
+
+def remappable_image_data(image: Image.Image) -> np.ndarray:
+    """
+    Gets the pixels of an image in a form which can be interpolated by the remapping
+    :param image: The image
+    :returns: The pixels of the image, the images of other modes, e.g. palette or bilevel
+              images, are converted to RGB
+    """
+    if image.mode not in _REMAPPABLE_MODES:
+        image = image.convert("RGB")
+    return np.asarray(image)
+
+
+# pylint: disable=too-many-arguments,too-many-locals
 def undistort_video(
-    video_path: str, out_folder: str, camera_model: CameraModel, crop: float
-):
+    video_path: str,
+    out_folder: str,
+    camera_model: CameraModel,
+    crop: float,
+    map_format: MapFormat = MapFormat.FLOAT,
+    threads: Union[int, None] = None,
+    redistort: bool = False,
+) -> Dict[str, StageStatistics]:
     """
-    Undistorts a single video given the camera parameters but keeps the meta-data
+    Undistorts a single video given the camera parameters but keeps the meta-data.
+    The frames are streamed through a pipeline of decoder, remap-worker and encoder threads.
 
     :param video_path: Path or list of paths of the media files
     :param out_folder: The output folder path
     :param camera_model: The camera model object
     :param crop: Ratio of cropping the undistorted image. 0 will crop all the black pixels,
                  1 keeps all the pixels
+    :param map_format: The format of the undistortion maps
+    :param threads: The number of the remap-worker threads, None uses every CPU core
+    :param redistort: Indicates whether to redistort an undistorted video instead
+    :returns: The statistics of the pipeline stages
     """
+    # moviepy is slow to import, it is not loaded by the image-only runs and workers
+    # pylint: disable=import-outside-toplevel
+    from moviepy.video.io.VideoFileClip import VideoFileClip
+    from moviepy.video.io.ffmpeg_writer import FFMPEG_VideoWriter
+
     os.makedirs(out_folder, exist_ok=True)
     logger.info("Undistorting video file %s", video_path)
     # Read video
     video = VideoFileClip(video_path)
-    file_name, ext = os.path.splitext(os.path.basename(video_path))
-
-    if video is None:
-        logger.error("Cannot open video file %s!", video_path)
-        return
+    file_name = os.path.splitext(os.path.basename(video_path))[0]
     logger.debug("Video file %s read", video_path)
 
-    # Undistort video
-    undistorted_video = camera_model.undistort_video(video, crop)
-    logger.debug("Video file %s undistorted", video_path)
+    plan = camera_model.compile(video.size, crop, map_format, redistort=redistort)
+    suffix = _output_suffix(redistort)
+
+    # Encode the audio beforehand, the encoder muxes it with the undistorted frames
+    undistorted_video_path = undistorted_media_path(video_path, out_folder, redistort)
+    audio_path = None
+    if video.audio is not None:
+        audio_path = os.path.join(out_folder, f"{file_name}{suffix}_TEMP_audio.m4a")
+        video.audio.write_audiofile(
+            audio_path,
+            fps=video.audio.fps,
+            nbytes=video.audio.reader.nbytes,
+            buffersize=video.audio.buffersize,
+            codec="aac",
+            bitrate=str(video.audio.reader.bitrate) + "K",
+            logger=None,
+        )
+
+    # The video is renamed once it is completely encoded
+    with atomic_output(undistorted_video_path) as temp_video_path:
+        writer = FFMPEG_VideoWriter(
+            temp_video_path,
+            video.size,
+            video.fps,
+            codec="libx264",
+            audiofile=audio_path,
+            preset="medium",
+            bitrate=str(video.reader.bitrate) + "K",
+        )
+        try:
+            statistics = FramePipeline(plan.apply, workers=threads).run(
+                video.iter_frames(), writer.write_frame
+            )
+        finally:
+            writer.close()
+            video.close()
+            if audio_path is not None and os.path.exists(audio_path):
+                os.remove(audio_path)
 
-    # Save undistorted video
-    undistorted_video_path = os.path.join(out_folder, f"{file_name}_undist{ext}")
-    undistorted_video.write_videofile(
-        filename=undistorted_video_path,
-        bitrate=str(video.reader.bitrate) + "K",
-        audio=True,
-        audio_fps=video.audio.fps,
-        preset="medium",
-        audio_codec="aac",
-        audio_nbytes=video.audio.reader.nbytes,
-        audio_bitrate=str(video.audio.reader.bitrate) + "K",
-        audio_bufsize=video.audio.buffersize,
+    logger.info(
+        "Undistorted video file saved to %s (%s)",
+        undistorted_video_path,
+        ", ".join(str(stage) for stage in statistics.values()),
     )
-    logger.info("Undistorted video file saved to %s", undistorted_video_path)
+    return statistics
 
 
+# pylint: disable=too-many-arguments,too-many-locals,unsubscriptable-object
 def undistort_image(
-    image_path: str, out_folder: str, camera_model: CameraModel, crop: float
+    image_path: str,
+    out_folder: str,
+    camera_model: CameraModel,
+    crop: float,
+    map_format: MapFormat = MapFormat.FLOAT,
+    tile_memory: Union[int, None] = None,
+    redistort: bool = False,
+    buffers: Union[BufferPool, None] = None,
 ):
     """
-    Undistorts a single image given the camera parameters but keeps the meta-data
+    Undistorts a single image given the camera parameters but keeps the meta-data.
+    The image is remapped in the channel order of PIL without conversions, the output is written
+    into a buffer of the pool if given, so undistorting a batch copies every image only when it is
+    passed from and to PIL.
 
     :param image_path: Path or list of paths of the media files
     :param out_folder: The output folder path
     :param camera_model: The camera model object
     :param crop: Ratio of cropping the undistorted image. 0 will crop all the black pixels,
                  1 keeps all the pixels
+    :param map_format: The format of the undistortion maps
+    :param tile_memory: If given, the image is undistorted in bands using float maps of at most
+                        this many bytes, see `CameraModel.undistort_image_tiled`
+    :param redistort: Indicates whether to redistort an undistorted image instead,
+                      the tile memory is not used then
+    :param buffers: Optional pool of the output buffers, allocated for every image if None
     """
     os.makedirs(out_folder, exist_ok=True)
     logger.info("Undistorting image file %s", image_path)
@@ -123,52 +328,429 @@ def undistort_image(
     image = Image.open(image_path)
     logger.debug("Image file %s read", image_path)
 
-    # Undistort image
-    image_data = cv2.cvtColor(np.array(image), cv2.COLOR_RGB2BGR)
-    undistorted_image_data = camera_model.undistort_image(image_data, crop)
-    undistorted_image = Image.fromarray(
-        cv2.cvtColor(np.array(undistorted_image_data), cv2.COLOR_BGR2RGB)
-    )
-    logger.debug("Image file %s undistorted", image_path)
+    # Undistort image, cv2.remap does not depend on the order of the channels
+    image_data = remappable_image_data(image)
+    tiled = tile_memory is not None and not redistort
+    dst = None
+    if buffers is not None and not tiled:
+        dst = buffers.acquire(image_data.shape, image_data.dtype)
+    try:
+        if tiled:
+            undistorted_image_data = camera_model.undistort_image_tiled(
+                image_data, crop, max_bytes=tile_memory
+            )
+        else:
+            remap = camera_model.redistort_image if redistort else camera_model.undistort_image
+            undistorted_image_data = remap(image_data, crop, map_format, dst=dst)
+        # The image may share the memory of the buffer, e.g. in mode L, RGBA or I;16
+        undistorted_image = Image.fromarray(undistorted_image_data)
+        logger.debug("Image file %s undistorted", image_path)
 
-    # Save undistorted image
-    image_name, ext = os.path.splitext(os.path.basename(image_path))
-    undistorted_image_path = os.path.join(out_folder, f"{image_name}_undist{ext}")
-    with open(undistorted_image_path, "w") as outfile:
-        undistorted_image.save(
-            outfile, format=get_image_format(ext), exif=image.info["exif"]
-        )
+        # Save undistorted image, renamed once it is completely written
+        undistorted_image_path = undistorted_media_path(image_path, out_folder, redistort)
+        ext = os.path.splitext(image_path)[1]
+        with atomic_output(undistorted_image_path) as temp_image_path:
+            undistorted_image.save(
+                temp_image_path, format=get_image_format(ext), exif=image.info["exif"]
+            )
+    finally:
+        # The buffer is reused only after the image has been written
+        if dst is not None:
+            buffers.release(dst)
     logger.info("Undistorted image file saved to %s", undistorted_image_path)
 
 
+class UndistortionSummary:
+    """
+    Summary of undistorting a batch of media files
+    """
+
+    def __init__(self):
+        """
+        Initialize empty summary
+        """
+        self.succeeded = 0
+        self.skipped = 0
+        self.failed = []
+        self.elapsed = 0.0
+
+    @property
+    def processed(self) -> int:
+        """
+        Returns the number of the processed media files, including the skipped ones
+        """
+        return self.succeeded + self.skipped + len(self.failed)
+
+    @property
+    def throughput(self) -> float:
+        """
+        Returns the number of the undistorted media files per second
+        """
+        undistorted = self.succeeded + len(self.failed)
+        return undistorted / self.elapsed if self.elapsed > 0 else 0.0
+
+    # pylint: disable=unsubscriptable-object
+    def add(self, media_path: str, error: Union[str, None]):
+        """
+        Records the result of a media file
+        :param media_path: The path of the media file
+        :param error: The error message or None if the undistortion succeeded
+        """
+        if error is None:
+            self.succeeded += 1
+        else:
+            logger.error("Unable to undistort %s: %s", media_path, error)
+            self.failed.append((media_path, error))
+
+    def __str__(self):
+        """
+        String representation of the object
+        """
+        return (
+            f"{self.succeeded} succeeded, {self.skipped} skipped, {len(self.failed)} failed, "
+            f"{self.throughput:.2f} files/s"
+        )
+
+
+# pylint: disable=unsubscriptable-object
+def _undistort_safely(
+    undistort_function: Callable, media_path: str, *args, **kwargs
+) -> Union[str, None]:
+    """
+    Undistorts a media file without raising errors, so one broken file does not stop the batch
+    :param undistort_function: `undistort_image` or `undistort_video`
+    :param media_path: The path of the media file
+    :param args: The further arguments of the undistort function
+    :param kwargs: The further keyword arguments of the undistort function
+    :returns: The error message or None if the undistortion succeeded
+    """
+    try:
+        undistort_function(media_path, *args, **kwargs)
+    except Exception as e:  # pylint: disable=broad-except
+        logger.debug("Undistortion of %s failed", media_path, exc_info=True)
+        return f"{type(e).__name__}: {e}"
+    return None
+
+
+# pylint: disable=unsubscriptable-object
+def _init_worker(
+    parameters_file: str,
+    map_store: Union[str, None],
+    max_map_error: Union[float, None] = None,
+):
+    """
+    Initializes a worker process by loading the camera model once
+    :param parameters_file: Path of the camera parameter file
+    :param map_store: Folder of the persisted undistortion maps or None
+    :param max_map_error: The maximal error of interpolated redistortion maps in pixels or None
+    """
+    camera_model = CameraModel.from_json(parameters_file)
+    camera_model.max_map_error = max_map_error
+    if map_store is not None:
+        camera_model.map_store = MapStore(map_store)
+    # The shared maps are attached as they arrive with the images
+    camera_model.shared_maps = SharedMapRegistry()
+    _WORKER.camera_model = camera_model
+    _WORKER.buffers = BufferPool()
+
+
+# pylint: disable=too-few-public-methods
+class _ImageMapSharing:
+    """
+    Publishes the undistortion maps of every distinct image size in shared memory, when the first
+    image of the size is discovered
+    """
+
+    # pylint: disable=too-many-arguments
+    def __init__(
+        self,
+        registry: SharedMapRegistry,
+        camera_model: CameraModel,
+        crop: float,
+        map_format: MapFormat,
+        redistort: bool = False,
+    ):
+        """
+        Initialize the sharing
+        :param registry: The registry owning the shared maps
+        :param camera_model: The camera model object
+        :param crop: Cropping parameter for the undistortion
+        :param map_format: The format of the undistortion maps
+        :param redistort: Indicates whether to publish the redistortion maps
+        """
+        self.registry = registry
+        self.camera_model = camera_model
+        self.crop = crop
+        self.map_format = map_format
+        self.redistort = redistort
+        self.enabled = True
+
+    # pylint: disable=unsubscriptable-object
+    def handle(self, image_path: str) -> Union[SharedMapHandle, None]:
+        """
+        Gets the shared maps of an image, publishes them if the image size is new
+        :param image_path: The path of the image
+        :returns: The handle of the maps, None if they can not be shared
+        """
+        if not self.enabled:
+            return None
+        try:
+            # Only the header of the image is read
+            with Image.open(image_path) as image:
+                image_size = image.size
+        except OSError:
+            # Broken images are reported by the workers
+            return None
+        key = self.camera_model.mapping_key(
+            image_size, self.crop, self.map_format, self.redistort
+        )
+        handle = self.registry.handle(key)
+        if handle is not None:
+            return handle
+        try:
+            plan = self.camera_model.compile(
+                image_size,
+                self.crop,
+                self.map_format,
+                use_cache=False,
+                redistort=self.redistort,
+            )
+            handle = self.registry.publish(plan.key, plan.maps)
+        except OSError as e:
+            # The maps published before stay in use
+            logger.warning("Unable to share more undistortion maps, %s", e)
+            self.enabled = False
+            return None
+        logger.debug("Maps of %s shared", image_size)
+        return handle
+
+
+def _bounded_results(
+    executor: ProcessPoolExecutor,
+    function: Callable,
+    items: Iterable,
+    max_pending: int,
+) -> Iterator[Tuple[Any, Any]]:
+    """
+    Executes a function on every item in the executor, taking the next item only when one of at
+    most `max_pending` executions finishes
+    :param executor: The executor
+    :param function: The function to be executed
+    :param items: The items passed to the function, consumed lazily
+    :param max_pending: The maximal number of the submitted, unfinished executions
+    :returns: Generator of the items and their results in the order of the items,
+              the pending executions are cancelled when it is closed
+    """
+    pending = deque()
+    try:
+        for item in items:
+            pending.append((item, executor.submit(function, item)))
+            if len(pending) >= max_pending:
+                item, future = pending.popleft()
+                yield item, future.result()
+        while pending:
+            item, future = pending.popleft()
+            yield item, future.result()
+    finally:
+        for _, future in pending:
+            future.cancel()
+
+
+# pylint: disable=too-many-arguments
+def _undistort_image_in_worker(
+    task: Tuple[str, Union[SharedMapHandle, None]],
+    out_folder: str,
+    crop: float,
+    map_format: MapFormat,
+    tile_memory: Union[int, None],
+    redistort: bool,
+) -> Union[str, None]:
+    """
+    Undistorts an image in a worker process using the camera model of the worker
+    :param task: The path of the image and the handle of its shared maps or None
+    :returns: The error message or None if the undistortion succeeded
+    """
+    image_path, shared_map = task
+    if shared_map is not None:
+        _WORKER.camera_model.shared_maps.attach(shared_map)
+    return _undistort_safely(
+        undistort_image,
+        image_path,
+        out_folder,
+        _WORKER.camera_model,
+        crop,
+        map_format,
+        tile_memory,
+        redistort,
+        _WORKER.buffers,
+    )
+
+
 # pylint: disable=unsubscriptable-object
 def undistort(
     media_path: Union[List[str], str],
     out_folder: str,
     parameters_file: str,
     crop: float,
-):
+    map_format: MapFormat = MapFormat.FLOAT,
+    map_store: Union[str, None] = None,
+    workers: int = 1,
+    tile_memory: Union[int, None] = None,
+    shared_maps: bool = True,
+    redistort: bool = False,
+    max_map_error: Union[float, None] = None,
+    resume: bool = True,
+) -> UndistortionSummary:
     """
-    Undistorts media files given the camera parameters but keeps the meta-data
+    Undistorts media files given the camera parameters but keeps the meta-data.
+    The media files are discovered in the background, the images are undistorted as they are
+    found, so the first output does not wait for the whole tree to be searched. The progress is
+    logged with the total discovered so far.
+    The images can be undistorted in parallel by a pool of worker processes, every worker loads
+    the camera model only once and gets at most two images ahead. The undistortion maps of every
+    image size are published once in shared memory and used by every worker without copying.
+    The videos are undistorted one by one afterwards. A failing file is reported in the summary
+    without stopping the batch.
+    The results are recorded in a manifest in the output folder, a rerun skips the media files
+    completed with the same settings unless they have been modified since. The outputs are
+    written atomically, an interrupted run leaves no partial output.
 
     :param media_path: Path or list of pathes of the media files
     :param out_folder: The output folder path
     :param parameters_file: Path of the camera parameter file
     :param crop: Ratio of cropping the undistorted image. 0 will crop all the black pixels,
                  1 keeps all the pixels
+    :param map_format: The format of the undistortion maps
+    :param map_store: Folder for persisting the undistortion maps, not persisted if None
+    :param workers: Number of the worker processes for the images, None or 0 uses every CPU core
+    :param tile_memory: If given, the images are undistorted in bands using maps of at most
+                        this many bytes per image
+    :param shared_maps: Indicates whether to share the maps between the worker processes,
+                        otherwise every worker creates its own maps
+    :param redistort: Indicates whether to redistort undistorted media files instead, the tile
+                      memory is not used then
+    :param max_map_error: If given, the redistortion maps are interpolated from a coarse grid
+                          with at most this positional error in pixels
+    :param resume: Indicates whether to skip the media files completed by a previous run,
+                   otherwise every media file is processed
+    :returns: The summary of the undistortion
     """
     camera_model = CameraModel.from_json(parameters_file)
+    # Set on the model only, the other models of the process are not affected
+    camera_model.max_map_error = max_map_error
+    if map_store is not None:
+        camera_model.map_store = MapStore(map_store)
+    elif camera_model.map_store is not None:
+        # The store set on the class is used by the workers too
+        map_store = camera_model.map_store.path
     os.makedirs(out_folder, exist_ok=True)
+    workers = workers or os.cpu_count()
+    summary = UndistortionSummary()
+    start_time = time.perf_counter()
+
+    manifest = JobManifest(
+        os.path.join(out_folder, MANIFEST_FILE_NAME),
+        _job_settings(camera_model, crop, map_format, redistort, max_map_error),
+    )
+    with manifest, MediaDiscovery(media_path) as discovery:
 
-    logger.info("Undistorting images")
-    for image_path in find_images(media_path):
-        undistort_image(image_path, out_folder, camera_model, crop)
+        def is_completed(media_path: str) -> bool:
+            """
+            Checks whether a media file has been completed by a previous run and can be skipped
+            """
+            output_path = undistorted_media_path(media_path, out_folder, redistort)
+            if not manifest.is_completed(media_path, output_path) or not resume:
+                return False
+            logger.debug("Skipping completed %s", media_path)
+            summary.skipped += 1
+            return True
+
+        def add_result(media_path: str, error: Union[str, None]):
+            """
+            Records the result of a media file
+            """
+            summary.add(media_path, error)
+            output_path = undistorted_media_path(media_path, out_folder, redistort)
+            manifest.record(media_path, output_path, error)
+            logger.info("Progress: %s", discovery.progress(summary.processed))
+
+        logger.info("Undistorting images with %i workers", workers)
+        image_paths = (
+            image_path for image_path in discovery.iter_images() if not is_completed(image_path)
+        )
+        if workers == 1:
+            buffers = BufferPool()
+            for image_path in image_paths:
+                add_result(
+                    image_path,
+                    _undistort_safely(
+                        undistort_image,
+                        image_path,
+                        out_folder,
+                        camera_model,
+                        crop,
+                        map_format,
+                        tile_memory,
+                        redistort,
+                        buffers,
+                    ),
+                )
+            logger.debug("Output buffers: %s", buffers)
+        else:
+            with SharedMapRegistry() as registry, ProcessPoolExecutor(
+                max_workers=workers,
+                initializer=_init_worker,
+                initargs=(parameters_file, map_store, max_map_error),
+            ) as executor:
+                # The tiled undistortion creates the maps of the bands only
+                sharing = None
+                if not SHARED_MEMORY_AVAILABLE:
+                    logger.debug("Shared memory is not available, the maps are not shared")
+                elif shared_maps and (tile_memory is None or redistort):
+                    sharing = _ImageMapSharing(
+                        registry, camera_model, crop, map_format, redistort
+                    )
+                tasks = (
+                    (image_path, None if sharing is None else sharing.handle(image_path))
+                    for image_path in image_paths
+                )
+                # The discovery is consumed as the workers become free
+                results = _bounded_results(
+                    executor,
+                    partial(
+                        _undistort_image_in_worker,
+                        out_folder=out_folder,
+                        crop=crop,
+                        map_format=map_format,
+                        tile_memory=tile_memory,
+                        redistort=redistort,
+                    ),
+                    tasks,
+                    max_pending=2 * workers,
+                )
+                for (image_path, _), error in results:
+                    add_result(image_path, error)
 
-    logger.info("Undistorting videos")
-    for video_path in find_videos(media_path):
-        undistort_video(video_path, out_folder, camera_model, crop)
+        logger.info("Undistorting videos")
+        for video_path in discovery.video_paths:
+            if is_completed(video_path):
+                continue
+            add_result(
+                video_path,
+                _undistort_safely(
+                    undistort_video,
+                    video_path,
+                    out_folder,
+                    camera_model,
+                    crop,
+                    map_format,
+                    redistort=redistort,
+                ),
+            )
 
-    logger.info("Undistorsion finished!")
+    summary.elapsed = time.perf_counter() - start_time
+    logger.info("Undistorsion finished! %s", summary)
+    return summary
 
 
 if __name__ == "__main__":
@@ -179,4 +761,12 @@ if __name__ == "__main__":
         out_folder=arguments.out_folder,
         parameters_file=arguments.parameters,
         crop=arguments.crop,
+        map_format=MapFormat(arguments.map_format),
+        map_store=None if arguments.no_map_store else arguments.map_store,
+        workers=arguments.jobs,
+        tile_memory=None if arguments.tile_memory is None else arguments.tile_memory * 1024 ** 2,
+        shared_maps=not arguments.no_shared_maps,
+        redistort=arguments.redistort,
+        max_map_error=arguments.max_map_error,
+        resume=not arguments.no_resume,
     )
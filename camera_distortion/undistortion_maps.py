@@ -0,0 +1,270 @@
+#!/usr/bin/env python
+"""
+Module for creating the undistortion and the redistortion maps of a camera model.
+The maps are created from the geometry of the undistortion, see `MapGeometry`, so they do not
+depend on the model and can be recreated by any process, e.g. when an `UndistortionPlan` is
+unpickled.
+"""
+__author__ = "Peter Kocsis"
+__copyright__ = "Peter Kocsis"
+__credits__ = ["MIT License"]
+__version__ = "0.1"
+__maintainer__ = "Peter Kocsis"
+__email__ = "peter.kocsis@tum.de"
+__status__ = "Released"
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+from enum import Enum
+from typing import Callable, NamedTuple, Tuple, Union
+
+import cv2
+import numpy as np
+
+from camera_distortion import map_interpolation, point_distortion
+from camera_distortion.util.map_store import MapStore
+from camera_distortion.util.shared_maps import SharedMapRegistry
+
+# Number of the pixels undistorted at once when creating the redistortion maps
+_REDISTORTION_BAND_POINTS = 1 << 18
+
+
+class MapFormat(Enum):
+    """
+    Format of the undistortion maps
+
+    FLOAT: Two CV_32FC1 maps with the exact source coordinates, 8 bytes per pixel.
+    FIXED: Fixed-point maps created by `cv2.convertMaps`, a CV_16SC2 map with the integer
+    source coordinates and a CV_16UC1 interpolation table, 6 bytes per pixel and faster remapping.
+    The source coordinates are quantized to 1/32 pixel (`cv2.INTER_TAB_SIZE`), so the positional
+    error against the FLOAT maps is at most 1/64 pixel per axis. For 8-bit images it means at most
+    1/32 of the local pixel-to-pixel intensity step, the deviation is below 8 grey levels even on
+    white noise and below 1 grey level on average.
+    """
+
+    FLOAT = "float"
+    FIXED = "fixed"
+
+
+class MapGeometry(NamedTuple):
+    """
+    Geometry of the undistortion of the images of a given size
+
+    intrinsic_matrix: The intrinsic matrix scaled for the image size
+    distortion_coeffs: The distortion coefficients
+    new_intrinsic_matrix: The intrinsic matrix of the undistorted image
+    image_size: The size of the image (width, height)
+    """
+
+    intrinsic_matrix: np.ndarray
+    distortion_coeffs: np.ndarray
+    new_intrinsic_matrix: np.ndarray
+    image_size: Tuple[int, int]
+
+
+def create_undistortion_maps(
+    geometry: MapGeometry, map_format: MapFormat = MapFormat.FLOAT
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Calculates the read-only undistortion maps from the camera matrices
+    :param geometry: The geometry of the undistortion
+    :param map_format: The format of the maps, see `MapFormat`
+    :returns: The maps in the requested format
+    """
+    mapping = cv2.initUndistortRectifyMap(
+        geometry.intrinsic_matrix,
+        geometry.distortion_coeffs,
+        None,
+        geometry.new_intrinsic_matrix,
+        tuple(int(size) for size in geometry.image_size),
+        m1type=cv2.CV_32FC1,
+    )
+    return _finalize_maps(mapping, map_format)
+
+
+def _finalize_maps(
+    mapping: Tuple[np.ndarray, np.ndarray], map_format: MapFormat
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Converts the float maps to the requested format and makes them read-only
+    :param mapping: The float maps
+    :param map_format: The format of the maps, see `MapFormat`
+    :returns: The maps in the requested format
+    """
+    if MapFormat(map_format) == MapFormat.FIXED:
+        mapping = cv2.convertMaps(*mapping, cv2.CV_16SC2)
+    # The maps are shared through the cache, protect them from modification
+    for map_array in mapping:
+        map_array.flags.writeable = False
+    return mapping
+
+
+# pylint: disable=unsubscriptable-object
+def create_redistortion_maps(
+    geometry: MapGeometry,
+    map_format: MapFormat = MapFormat.FLOAT,
+    max_error: Union[float, None] = None,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Calculates the read-only redistortion maps, the inverse of the undistortion maps.
+    Every pixel of the distorted image is undistorted in bulk, see `point_distortion`, in bands of
+    rows to bound the memory. The pixels where the distortion can not be inverted are mapped
+    outside of the undistorted image.
+    :param geometry: The geometry of the undistortion
+    :param map_format: The format of the maps, see `MapFormat`
+    :param max_error: The maximal positional error in pixels of maps interpolated from a coarse
+                      grid, see `map_interpolation`, every pixel is undistorted if None
+    :returns: The maps in the requested format
+    """
+
+    def redistort(points: np.ndarray) -> np.ndarray:
+        return point_distortion.map_points(
+            points,
+            geometry.intrinsic_matrix,
+            geometry.new_intrinsic_matrix,
+            lambda normalized: point_distortion.undistort_points(
+                normalized, geometry.distortion_coeffs
+            ),
+        )
+
+    if max_error is not None:
+        interpolated = map_interpolation.interpolate_maps(
+            redistort, geometry.image_size, max_error
+        )
+        if interpolated is not None:
+            return _finalize_maps(interpolated[0], map_format)
+    return _finalize_maps(_map_in_bands(redistort, geometry.image_size), map_format)
+
+
+def _map_in_bands(
+    mapping: Callable[[np.ndarray], np.ndarray], image_size: Tuple[int, int]
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Evaluates a mapping on every pixel in bands of rows, the undefined coordinates are mapped
+    outside of the image
+    :param mapping: Maps the pixel coordinates, shape (..., 2)
+    :param image_size: The size of the image (width, height)
+    :returns: The float maps
+    """
+    width, height = (int(size) for size in image_size)
+    map_x = np.empty((height, width), dtype=np.float32)
+    map_y = np.empty((height, width), dtype=np.float32)
+    band_height = max(1, _REDISTORTION_BAND_POINTS // width)
+    for top in range(0, height, band_height):
+        rows = slice(top, min(top + band_height, height))
+        pixel_y, pixel_x = np.mgrid[rows, 0:width]
+        mapped = mapping(np.stack((pixel_x, pixel_y), axis=-1))
+        np.nan_to_num(mapped, copy=False, nan=-1.0)
+        map_x[rows] = mapped[..., 0]
+        map_y[rows] = mapped[..., 1]
+    return map_x, map_y
+
+
+# pylint: disable=unsubscriptable-object
+def create_maps(
+    geometry: MapGeometry,
+    map_format: MapFormat = MapFormat.FLOAT,
+    redistort: bool = False,
+    max_error: Union[float, None] = None,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Calculates the undistortion or the redistortion maps
+    :param geometry: The geometry of the undistortion
+    :param map_format: The format of the maps, see `MapFormat`
+    :param redistort: Indicates whether to calculate the redistortion maps
+    :param max_error: The maximal positional error of interpolated redistortion maps,
+                      see `create_redistortion_maps`
+    :returns: The maps in the requested format
+    """
+    if redistort:
+        return create_redistortion_maps(geometry, map_format, max_error)
+    return create_undistortion_maps(geometry, map_format)
+
+
+# pylint: disable=unsubscriptable-object
+def load_mapping(
+    key: tuple,
+    create: Callable[[], Tuple[np.ndarray, np.ndarray]],
+    shared_maps: Union[SharedMapRegistry, None],
+    map_store: Union[MapStore, None],
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Loads a mapping from the shared maps or the map store or calculates and stores it if not found
+    :param key: The key of the mapping
+    :param create: Calculates the mapping if it is not found
+    :param shared_maps: The maps published in shared memory or None
+    :param map_store: The persistent store of the maps or None
+    :returns: The maps
+    """
+    if shared_maps is not None:
+        mapping = shared_maps.load(key)
+        if mapping is not None:
+            return mapping
+    if map_store is not None:
+        mapping = map_store.load(key)
+        if mapping is not None:
+            return mapping
+    mapping = create()
+    if map_store is not None:
+        map_store.save(key, mapping)
+    return mapping
+
+
+# pylint: disable=unsubscriptable-object
+def undistort_image_tiled(
+    image: np.ndarray,
+    geometry: MapGeometry,
+    max_bytes: int,
+    workers: Union[int, None] = None,
+) -> np.ndarray:
+    """
+    Undistort a large image in horizontal bands using a pool of threads,
+    see `CameraModel.undistort_image_tiled`
+    :param image: The image as numpy array
+    :param geometry: The geometry of the undistortion of the image
+    :param max_bytes: The maximal total size of the maps of the bands processed in parallel
+    :param workers: The number of the threads, None uses every CPU core
+    :returns: Undistorted image as numpy array
+    """
+    height, width = image.shape[:2]
+    workers = workers or os.cpu_count()
+    image = np.ascontiguousarray(image)
+    undistorted_image = np.zeros_like(image)
+
+    # Two float maps per band and thread
+    band_height = max(1, min(height, max_bytes // (workers * width * 8)))
+    bands = [
+        (top, min(top + band_height, height)) for top in range(0, height, band_height)
+    ]
+
+    def undistort_band(band: Tuple[int, int]):
+        top, bottom = band
+        # Shifting the principal point gives the maps of the band rows
+        band_mat = geometry.new_intrinsic_matrix.copy()
+        band_mat[1, 2] -= top
+        mapx, mapy = cv2.initUndistortRectifyMap(
+            geometry.intrinsic_matrix,
+            geometry.distortion_coeffs,
+            None,
+            band_mat,
+            (width, bottom - top),
+            m1type=cv2.CV_32FC1,
+        )
+        # The source rows needed by the bilinear interpolation of the band
+        source_top = max(0, int(np.floor(mapy.min())))
+        source_bottom = min(height, int(np.floor(mapy.max())) + 2)
+        if source_bottom <= source_top:
+            return
+        mapy -= source_top
+        cv2.remap(
+            image[source_top:source_bottom],
+            mapx,
+            mapy,
+            cv2.INTER_LINEAR,
+            dst=undistorted_image[top:bottom],
+        )
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for _ in executor.map(undistort_band, bands):
+            pass
+    return undistorted_image
@@ -0,0 +1,254 @@
+#!/usr/bin/env python
+"""
+Module of the compiled undistortion of the images of a given size.
+"""
+__author__ = "Peter Kocsis"
+__copyright__ = "Peter Kocsis"
+__credits__ = ["MIT License"]
+__version__ = "0.1"
+__maintainer__ = "Peter Kocsis"
+__email__ = "peter.kocsis@tum.de"
+__status__ = "Released"
+
+from functools import partial
+from typing import Tuple, Union
+
+import cv2
+import numpy as np
+
+from camera_distortion import point_distortion
+from camera_distortion.undistortion_maps import MapFormat, MapGeometry, create_maps, load_mapping
+
+
+def _read_only_copy(array: np.ndarray) -> np.ndarray:
+    """
+    Copies an array and makes the copy read-only
+    :param array: The array
+    :returns: The read-only copy
+    """
+    array = np.array(array)
+    array.flags.writeable = False
+    return array
+
+
+class UndistortionPlan:
+    """
+    Precomputed undistortion of the images of a given size, created by `CameraModel.compile`.
+    A redistortion plan applies the inverse maps, transforming undistorted images back to the
+    geometry of the camera, its point mappings are the same.
+    The plan is immutable and its arrays are read-only, so it can be shared between threads.
+    Pickling sends only the matrices, the receiving process takes the plan from its map cache
+    or its maps from the shared maps, the map store or recalculates them.
+    """
+
+    __slots__ = (
+        "key",
+        "image_size",
+        "crop",
+        "map_format",
+        "intrinsic_matrix",
+        "distortion_coeffs",
+        "new_intrinsic_matrix",
+        "roi",
+        "maps",
+        "redistort",
+        "max_map_error",
+    )
+    key: tuple
+    image_size: Tuple[int, int]
+    crop: float
+    map_format: MapFormat
+    intrinsic_matrix: np.ndarray
+    distortion_coeffs: np.ndarray
+    new_intrinsic_matrix: np.ndarray
+    roi: Tuple[int, int, int, int]
+    maps: Tuple[np.ndarray, ...]
+    redistort: bool
+    max_map_error: Union[float, None]  # pylint: disable=unsubscriptable-object
+
+    # pylint: disable=too-many-arguments
+    def __init__(
+        self,
+        key: tuple,
+        image_size: Tuple[int, int],
+        crop: float,
+        map_format: MapFormat,
+        intrinsic_matrix: np.ndarray,
+        distortion_coeffs: np.ndarray,
+        new_intrinsic_matrix: np.ndarray,
+        roi: Tuple[int, int, int, int],
+        maps: Tuple[np.ndarray, np.ndarray],
+        redistort: bool = False,
+        max_map_error: Union[float, None] = None,  # pylint: disable=unsubscriptable-object
+    ):
+        """
+        Initialize the plan
+        :param key: The key of the mapping, see `CameraModel.mapping_key`
+        :param image_size: The size of the image (width, height)
+        :param crop: Cropping parameter for the undistortion
+        :param map_format: The format of the maps, see `MapFormat`
+        :param intrinsic_matrix: The intrinsic matrix scaled for the image size
+        :param distortion_coeffs: The distortion coefficients
+        :param new_intrinsic_matrix: The intrinsic matrix of the undistorted image
+        :param roi: The region of the undistorted image with only valid pixels (x, y, width, height)
+        :param maps: The undistortion maps or the redistortion maps
+        :param redistort: Indicates whether the maps are the redistortion maps
+        :param max_map_error: The maximal positional error of interpolated redistortion maps in
+                              pixels, None if the maps are exact
+        """
+        # The plan is immutable, the fields are set bypassing `__setattr__`
+        object.__setattr__(self, "key", key)
+        object.__setattr__(self, "image_size", tuple(int(size) for size in image_size))
+        object.__setattr__(self, "crop", float(crop))
+        object.__setattr__(self, "map_format", MapFormat(map_format))
+        object.__setattr__(self, "intrinsic_matrix", _read_only_copy(intrinsic_matrix))
+        object.__setattr__(self, "distortion_coeffs", _read_only_copy(distortion_coeffs))
+        object.__setattr__(self, "new_intrinsic_matrix", _read_only_copy(new_intrinsic_matrix))
+        object.__setattr__(self, "roi", tuple(int(value) for value in roi))
+        object.__setattr__(self, "maps", tuple(maps))
+        object.__setattr__(self, "redistort", bool(redistort))
+        object.__setattr__(
+            self, "max_map_error", None if max_map_error is None else float(max_map_error)
+        )
+
+    def __setattr__(self, name, value):
+        raise AttributeError("UndistortionPlan is immutable")
+
+    def __delattr__(self, name):
+        raise AttributeError("UndistortionPlan is immutable")
+
+    def __reduce__(self):
+        return (
+            _restore_undistortion_plan,
+            (
+                self.key,
+                self.image_size,
+                self.crop,
+                self.map_format.value,
+                self.intrinsic_matrix,
+                self.distortion_coeffs,
+                self.new_intrinsic_matrix,
+                self.roi,
+                self.redistort,
+                self.max_map_error,
+            ),
+        )
+
+    # pylint: disable=unsubscriptable-object
+    def apply(
+        self, image: np.ndarray, dst: Union[np.ndarray, None] = None
+    ) -> np.ndarray:
+        """
+        Undistort an image, or redistort an undistorted image if the plan is a redistortion plan
+        :param image: The image as numpy array, its size must be the size of the plan
+        :param dst: Optional output array with the shape and type of the image
+        :returns: Undistorted or redistorted image as numpy array
+        """
+        height, width = image.shape[:2]
+        if (width, height) != self.image_size:
+            raise ValueError(
+                f"Image size {width}x{height} does not match the plan "
+                f"{self.image_size[0]}x{self.image_size[1]}"
+            )
+        return cv2.remap(image, *self.maps, cv2.INTER_LINEAR, dst=dst)
+
+    def undistort_points(self, points: np.ndarray) -> np.ndarray:
+        """
+        Undistorts pixel coordinates, see `CameraModel.undistort_points`
+        :param points: The pixel coordinates on the distorted image, shape (..., 2)
+        :returns: The pixel coordinates on the undistorted image
+        """
+        return point_distortion.map_points(
+            points,
+            self.intrinsic_matrix,
+            self.new_intrinsic_matrix,
+            lambda normalized: point_distortion.undistort_points(
+                normalized, self.distortion_coeffs
+            ),
+        )
+
+    def distort_points(self, points: np.ndarray) -> np.ndarray:
+        """
+        Distorts pixel coordinates, see `CameraModel.distort_points`
+        :param points: The pixel coordinates on the undistorted image, shape (..., 2)
+        :returns: The pixel coordinates on the distorted image
+        """
+        return point_distortion.map_points(
+            points,
+            self.new_intrinsic_matrix,
+            self.intrinsic_matrix,
+            lambda normalized: point_distortion.distort_points(
+                normalized, self.distortion_coeffs
+            ),
+        )
+
+    @property
+    def nbytes(self) -> int:
+        """
+        The memory used by the maps of the plan, the size of the plan in the map cache
+        """
+        return sum(mapping.nbytes for mapping in self.maps)
+
+    def crop_valid(self, image: np.ndarray) -> np.ndarray:
+        """
+        Crops an undistorted image to its region with only valid pixels
+        :param image: The undistorted image
+        :returns: View of the valid region of the image
+        """
+        x, y, width, height = self.roi
+        return image[y : y + height, x : x + width]
+
+    def __repr__(self):
+        return (
+            f"UndistortionPlan({self.image_size[0]}x{self.image_size[1]}, "
+            f"crop={self.crop}, map_format={self.map_format.value}, roi={self.roi}"
+            f"{', redistort' if self.redistort else ''}"
+            f"{'' if self.max_map_error is None else f', max_map_error={self.max_map_error}'})"
+        )
+
+
+# pylint: disable=too-many-arguments
+def _restore_undistortion_plan(
+    key: tuple,
+    image_size: Tuple[int, int],
+    crop: float,
+    map_format: str,
+    intrinsic_matrix: np.ndarray,
+    distortion_coeffs: np.ndarray,
+    new_intrinsic_matrix: np.ndarray,
+    roi: Tuple[int, int, int, int],
+    redistort: bool,
+    max_map_error: Union[float, None],  # pylint: disable=unsubscriptable-object
+) -> UndistortionPlan:
+    """
+    Restores an unpickled undistortion plan, the plan is looked up in `CameraModel.map_cache`,
+    its maps in the shared maps and the map store set on the class
+    """
+    # The model imports the plan
+    # pylint: disable=import-outside-toplevel,cyclic-import
+    from camera_distortion.camera_model import CameraModel
+
+    map_format = MapFormat(map_format)
+    create = partial(
+        create_maps,
+        MapGeometry(intrinsic_matrix, distortion_coeffs, new_intrinsic_matrix, image_size),
+        map_format,
+        redistort,
+        max_map_error,
+    )
+    return CameraModel.map_cache.get_or_create(
+        key,
+        lambda: UndistortionPlan(
+            key,
+            image_size,
+            crop,
+            map_format,
+            intrinsic_matrix,
+            distortion_coeffs,
+            new_intrinsic_matrix,
+            roi,
+            load_mapping(key, create, CameraModel.shared_maps, CameraModel.map_store),
+            redistort,
+            max_map_error,
+        ),
+    )
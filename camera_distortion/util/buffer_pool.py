@@ -0,0 +1,106 @@
+"""
+Module for reusing the image buffers between the undistortions
+"""
+__author__ = "Peter Kocsis"
+__copyright__ = "Peter Kocsis"
+__credits__ = ["MIT License"]
+__version__ = "0.1"
+__maintainer__ = "Peter Kocsis"
+__email__ = "peter.kocsis@tum.de"
+__status__ = "Released"
+
+import logging
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__file__)
+
+
+class BufferPool:
+    """
+    Thread-safe pool of reusable image buffers.
+    Undistorting a batch of images of the same size into the buffers of the pool allocates the
+    output only once per concurrent user instead of once per image. The released buffers are
+    kept up to the total size limit, the rest is freed. The allocations and reuses are counted.
+    """
+
+    def __init__(self, max_bytes: int = 512 * 1024 ** 2):
+        """
+        Initialize empty pool
+        :param max_bytes: The maximal total size of the idle buffers in bytes
+        """
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self.allocations = 0
+        self.reuses = 0
+        self._idle: Dict[Tuple[Tuple[int, ...], str], List[np.ndarray]] = defaultdict(list)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        """
+        Returns the number of the idle buffers
+        """
+        with self._lock:
+            return sum(len(buffers) for buffers in self._idle.values())
+
+    def acquire(self, shape: Tuple[int, ...], dtype: np.dtype) -> np.ndarray:
+        """
+        Takes an idle buffer or allocates a new one
+        :param shape: The shape of the buffer
+        :param dtype: The type of the buffer
+        :returns: The buffer with undefined content
+        """
+        key = (tuple(int(size) for size in shape), np.dtype(dtype).str)
+        with self._lock:
+            idle = self._idle.get(key)
+            if idle:
+                self.reuses += 1
+                buffer = idle.pop()
+                self.current_bytes -= buffer.nbytes
+                return buffer
+            self.allocations += 1
+        return np.empty(key[0], dtype=key[1])
+
+    def release(self, buffer: np.ndarray):
+        """
+        Returns a buffer to the pool, it must not be used by the caller afterwards
+        :param buffer: The buffer taken by `acquire`
+        """
+        with self._lock:
+            if self.current_bytes + buffer.nbytes > self.max_bytes:
+                logger.debug("Buffer of %i bytes does not fit the pool", buffer.nbytes)
+                return
+            self._idle[(buffer.shape, buffer.dtype.str)].append(buffer)
+            self.current_bytes += buffer.nbytes
+
+    @contextmanager
+    def buffer(self, shape: Tuple[int, ...], dtype: np.dtype) -> Iterator[np.ndarray]:
+        """
+        Context manager of a buffer, released when the context exits
+        :param shape: The shape of the buffer
+        :param dtype: The type of the buffer
+        :returns: The buffer with undefined content
+        """
+        buffer = self.acquire(shape, dtype)
+        try:
+            yield buffer
+        finally:
+            self.release(buffer)
+
+    def clear(self):
+        """
+        Frees the idle buffers
+        """
+        with self._lock:
+            self._idle.clear()
+            self.current_bytes = 0
+
+    def __str__(self):
+        """
+        String representation of the object
+        """
+        return f"{self.allocations} buffers allocated, {self.reuses} reused"
@@ -0,0 +1,167 @@
+"""
+Module for caching the undistortion maps in memory
+"""
+__author__ = "Peter Kocsis"
+__copyright__ = "Peter Kocsis"
+__credits__ = ["MIT License"]
+__version__ = "0.1"
+__maintainer__ = "Peter Kocsis"
+__email__ = "peter.kocsis@tum.de"
+__status__ = "Released"
+
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Hashable
+
+logger = logging.getLogger(__file__)
+
+
+def nbytes(value: Any) -> int:
+    """
+    Calculates the memory used by a cached value
+    :param value: Array, object with `nbytes` attribute or tuple/list of them
+    :returns: The size of the value in bytes
+    """
+    if isinstance(value, (tuple, list)):
+        return sum(nbytes(item) for item in value)
+    return int(getattr(value, "nbytes", 0))
+
+
+# pylint: disable=too-many-instance-attributes
+class MapCache:
+    """
+    Thread-safe LRU cache for undistortion maps.
+    The cache is bounded by the total size of the stored values, when a new value does not fit
+    the least recently used entries are evicted. Values larger than the limit are not cached.
+    Concurrent requests for the same missing key are computed only once.
+    """
+
+    def __init__(self, max_bytes: int = 1024**3):
+        """
+        Initialize empty cache
+        :param max_bytes: The maximal total size of the cached values in bytes
+        """
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._pending = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        """
+        Returns the number of cached entries
+        """
+        with self._lock:
+            return len(self._entries)
+
+    def __contains__(self, key: Hashable):
+        """
+        Checks whether the key is cached without updating the LRU order or the counters
+        """
+        with self._lock:
+            return key in self._entries
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """
+        Gets a cached value and marks it as the most recently used
+        :param key: The key of the value
+        :param default: The value returned if the key is not cached
+        :returns: The cached value or the default
+        """
+        with self._lock:
+            if key not in self._entries:
+                self.misses += 1
+                return default
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return self._entries[key][0]
+
+    def put(self, key: Hashable, value: Any):
+        """
+        Stores a value, evicting the least recently used entries if necessary
+        :param key: The key of the value
+        :param value: The value to be stored
+        """
+        size = nbytes(value)
+        with self._lock:
+            self._put(key, value, size)
+
+    def _put(self, key: Hashable, value: Any, size: int):
+        """
+        Stores a value, the lock must be held by the caller
+        """
+        if key in self._entries:
+            self.current_bytes -= self._entries.pop(key)[1]
+        if size > self.max_bytes:
+            logger.debug(
+                "Value of %s bytes exceeds the cache limit, not caching it", size
+            )
+            return
+        while self._entries and self.current_bytes + size > self.max_bytes:
+            _, (_, evicted_size) = self._entries.popitem(last=False)
+            self.current_bytes -= evicted_size
+            self.evictions += 1
+        self._entries[key] = (value, size)
+        self.current_bytes += size
+
+    def get_or_create(self, key: Hashable, factory: Callable[[], Any]) -> Any:
+        """
+        Gets a cached value or creates and caches it if missing.
+        The factory is called without holding the lock, so other keys can be served meanwhile.
+        :param key: The key of the value
+        :param factory: Callable creating the value
+        :returns: The cached or the newly created value
+        """
+        while True:
+            with self._lock:
+                if key in self._entries:
+                    self.hits += 1
+                    self._entries.move_to_end(key)
+                    return self._entries[key][0]
+                pending = self._pending.get(key)
+                if pending is None:
+                    self.misses += 1
+                    pending = self._pending[key] = threading.Event()
+                    break
+            # Another thread is creating the same value, wait for it and look again
+            pending.wait()
+
+        try:
+            value = factory()
+            with self._lock:
+                self._put(key, value, nbytes(value))
+            return value
+        finally:
+            with self._lock:
+                del self._pending[key]
+            pending.set()
+
+    def clear(self):
+        """
+        Removes every entry and resets the counters
+        """
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+            self.hits = 0
+            self.misses = 0
+            self.evictions = 0
+
+    def stats(self) -> dict:
+        """
+        Returns the statistics of the cache
+        :returns: Dictionary with the counters and the memory usage
+        """
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self.current_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
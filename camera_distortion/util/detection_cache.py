@@ -0,0 +1,191 @@
+"""
+Module for caching the detected calibration points on disk
+"""
+__author__ = "Peter Kocsis"
+__copyright__ = "Peter Kocsis"
+__credits__ = ["MIT License"]
+__version__ = "0.1"
+__maintainer__ = "Peter Kocsis"
+__email__ = "peter.kocsis@tum.de"
+__status__ = "Released"
+
+import hashlib
+import json
+import logging
+import os
+import uuid
+from typing import List, Tuple, Union
+
+import numpy as np
+
+# A detection is whether the pattern has been found, the refined corners and the image shape
+Detection = Tuple[bool, Union[np.ndarray, None], Tuple[int, ...]]
+
+
+def default_detection_cache_path() -> str:
+    """
+    Gets the default location of the detection cache in the user's cache folder
+    :returns: The path of the cache file
+    """
+    cache_folder = os.environ.get("XDG_CACHE_HOME") or os.path.join(
+        os.path.expanduser("~"), ".cache"
+    )
+    return os.path.join(cache_folder, "camera_distortion", "detections.json")
+
+
+def file_digest(path: str, chunk_size: int = 1024 ** 2) -> str:
+    """
+    Calculates the hash of the content of a file
+    :param path: The path of the file
+    :param chunk_size: The number of the bytes read at once
+    :returns: The hash of the file content
+    """
+    digest = hashlib.sha1()
+    with open(path, "rb") as infile:
+        for chunk in iter(lambda: infile.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class DetectionCache:
+    """
+    Persistent cache of the calibration points detected on images.
+    The entries are keyed by the content of the image, the size of the pattern and the detection
+    mode, so renamed images are still found and modified images are detected again.
+    The cache is stored as a JSON file, which is replaced atomically when saved.
+    """
+
+    logger = logging.getLogger(__name__)
+
+    def __init__(self, path: str):
+        """
+        Initialize the cache from the given file, created when first saved
+        :param path: The path of the JSON file of the cache
+        """
+        self.path = path
+        self._entries = self._read()
+        self._modified = False
+
+    def _read(self) -> dict:
+        """
+        Reads the entries of the cache file
+        :returns: The entries or empty dictionary if the file does not exist or is invalid
+        """
+        try:
+            with open(self.path, "r") as infile:
+                return json.load(infile)
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            self.logger.warning("Unable to read detection cache %s, %s", self.path, e)
+            return {}
+
+    @staticmethod
+    def key(image_path: str, pattern_size: Tuple[int, int], detection_mode: str) -> str:
+        """
+        Calculates the key of the detection on an image
+        :param image_path: The path of the image
+        :param pattern_size: The number of the corners (width, height)
+        :param detection_mode: The name of the detection mode
+        :returns: The key of the detection
+        """
+        return (
+            f"{file_digest(image_path)}-{pattern_size[0]}x{pattern_size[1]}"
+            f"-{detection_mode}"
+        )
+
+    def __len__(self):
+        """
+        Returns the number of cached detections
+        """
+        return len(self._entries)
+
+    def __contains__(self, key: str):
+        """
+        Checks whether the detection of the key is cached
+        """
+        return key in self._entries
+
+    # pylint: disable=unsubscriptable-object
+    def get(self, key: str) -> Union[Detection, None]:
+        """
+        Gets a cached detection
+        :param key: The key of the detection
+        :returns: The detection or None if it is not cached
+        """
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        corners = (
+            np.array(entry["corners"], dtype=np.float32).reshape((-1, 1, 2))
+            if entry["found"]
+            else None
+        )
+        return entry["found"], corners, tuple(entry["shape"])
+
+    def put(self, key: str, image_path: str, detection: Detection):
+        """
+        Stores a detection, the cache file is updated by `save`
+        :param key: The key of the detection
+        :param image_path: The path of the image, stored for inspection only
+        :param detection: The detection
+        """
+        found, corners, image_shape = detection
+        self._entries[key] = {
+            "image": str(image_path),
+            "found": bool(found),
+            "corners": None if corners is None else corners.reshape(-1, 2).tolist(),
+            "shape": list(image_shape),
+        }
+        self._modified = True
+
+    def entries(self) -> List[Tuple[str, str, bool]]:
+        """
+        Lists the cached detections
+        :returns: The key, the image path and whether the pattern has been found of every entry
+        """
+        return [
+            (key, entry["image"], entry["found"])
+            for key, entry in self._entries.items()
+        ]
+
+    def invalidate(self, image_path: Union[str, None] = None) -> int:
+        """
+        Removes the detections of an image or every detection, the cache file is updated by `save`
+        :param image_path: The path of the image, every detection is removed if not given
+        :returns: The number of the removed detections
+        """
+        if image_path is None:
+            keys = list(self._entries)
+        else:
+            digest = file_digest(image_path) if os.path.isfile(image_path) else None
+            keys = [
+                key
+                for key, entry in self._entries.items()
+                if entry["image"] == str(image_path) or key.split("-")[0] == digest
+            ]
+        for key in keys:
+            del self._entries[key]
+        self._modified = self._modified or bool(keys)
+        return len(keys)
+
+    def save(self):
+        """
+        Saves the cache if it has been modified.
+        The file is written to a temporary file which is renamed afterwards, so concurrent
+        processes never see partially written caches.
+        """
+        if not self._modified:
+            return
+        folder = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(folder, exist_ok=True)
+        temp_path = os.path.join(folder, f".tmp-{uuid.uuid4().hex}")
+        try:
+            with open(temp_path, "w") as outfile:
+                json.dump(self._entries, outfile)
+            os.replace(temp_path, self.path)
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+        self._modified = False
+        self.logger.debug("%i detections saved to %s", len(self._entries), self.path)
@@ -0,0 +1,140 @@
+"""
+Module for discovering the media files while they are being processed
+"""
+__author__ = "Peter Kocsis"
+__copyright__ = "Peter Kocsis"
+__credits__ = ["MIT License"]
+__version__ = "0.1"
+__maintainer__ = "Peter Kocsis"
+__email__ = "peter.kocsis@tum.de"
+__status__ = "Released"
+
+import logging
+import queue
+import threading
+from typing import Iterator, List, Union
+
+from camera_distortion.util.io import MediaType, iter_media
+
+logger = logging.getLogger(__file__)
+
+# Marks the end of the discovery in the queue
+_END_OF_DISCOVERY = object()
+
+
+class MediaDiscovery:
+    """
+    Discovers the media files in a background thread.
+    The found images are passed through a bounded queue, so the processing starts with the first
+    image and the discovery runs ahead of it by at most `queue_size` images, the memory does not
+    grow with the number of the files. The videos are collected to be processed after the images.
+    The totals are refined as the discovery continues.
+    """
+
+    # pylint: disable=unsubscriptable-object
+    def __init__(self, paths: Union[str, List[str]], queue_size: int = 1024):
+        """
+        Initialize the discovery, it is started by `start` or entering the context
+        :param paths: The path or list of paths of media files or folders to be searched
+        :param queue_size: The maximal number of the discovered images waiting for processing
+        """
+        self.num_of_images = 0
+        self.video_paths: List[str] = []
+        self.finished = threading.Event()
+        self._queue = queue.Queue(queue_size)
+        self._stop = threading.Event()
+        self._error: Union[BaseException, None] = None
+        self._thread = threading.Thread(target=self._discover, args=(paths,), daemon=True)
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+    @property
+    def total(self) -> int:
+        """
+        Returns the number of the media files discovered so far
+        """
+        return self.num_of_images + len(self.video_paths)
+
+    def start(self):
+        """
+        Starts the discovery thread
+        """
+        if self._thread.ident is None:
+            self._thread.start()
+
+    def stop(self):
+        """
+        Stops the discovery and waits for the thread
+        """
+        self._stop.set()
+        if self._thread.ident is not None:
+            self._thread.join()
+
+    def _put(self, item):
+        """
+        Puts an item into the queue, waiting for free space unless the discovery is stopped
+        """
+        while not self._stop.is_set():
+            try:
+                self._queue.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+    # pylint: disable=unsubscriptable-object
+    def _discover(self, paths: Union[str, List[str]]):
+        """
+        Discovery thread, feeds the queue with the found images
+        :param paths: The path or list of paths of media files or folders to be searched
+        """
+        try:
+            for media_path, media_type in iter_media(paths):
+                if self._stop.is_set():
+                    break
+                if media_type == MediaType.IMAGE:
+                    self.num_of_images += 1
+                    self._put(media_path)
+                else:
+                    self.video_paths.append(media_path)
+        except Exception as e:  # pylint: disable=broad-except
+            self._error = e
+        finally:
+            self.finished.set()
+            self._put(_END_OF_DISCOVERY)
+            logger.debug("Discovered %s", self)
+
+    def iter_images(self) -> Iterator[str]:
+        """
+        Iterates over the images as they are discovered
+        :returns: Generator of the paths of the images, once it is exhausted, every video is
+                  found as well
+        :raise: The error of the discovery
+        """
+        self.start()
+        while True:
+            media_path = self._queue.get()
+            if media_path is _END_OF_DISCOVERY:
+                break
+            yield media_path
+        if self._error is not None:
+            raise self._error
+
+    def progress(self, processed: int) -> str:
+        """
+        Describes the progress of the processing
+        :param processed: The number of the processed media files
+        :returns: The processed and the discovered media files, the total is marked with + while
+                  the discovery is running
+        """
+        return f"{processed}/{self.total}{'' if self.finished.is_set() else '+'}"
+
+    def __str__(self):
+        """
+        String representation of the object
+        """
+        return f"{self.num_of_images} images and {len(self.video_paths)} videos"
@@ -11,39 +11,51 @@ __status__ = "Released"
 
 import logging
 import os
-from pathlib import Path
-from typing import List, Union
+import uuid
+from contextlib import contextmanager
+from enum import Enum
+from typing import Collection, Iterator, List, Tuple, Union
 
 logger = logging.getLogger(__file__)
 
-__IMAGE_EXTENSIONS = [
-    ".bmp",
-    ".dib",  # Windows bitmaps
-    ".jpeg",
-    ".jpg",
-    ".jpe",  # JPEG files
-    ".jp2",  # JPEG 2000 files
-    ".png",  # Portable Network Graphics
-    ".webp",  # WebP
-    ".pbm",
-    ".pgm",
-    ".ppm",
-    ".pxm",
-    ".pnm",  # Portable image format
-    ".pfm",  # Pfiles
-    ".sr",
-    ".ras",  # Sun rasters
-    ".tiff",
-    ".tif",  # TIFF files
-    ".exr",  # OpenEXR Image files
-    ".hdr",
-    ".pic",
-]  # Radiance HDR
-__IMAGE_EXTENSIONS.extend([ext.upper() for ext in __IMAGE_EXTENSIONS])
-
-
-__VIDEO_EXTENSIONS = [".avi", ".mp4"]
-__VIDEO_EXTENSIONS.extend([ext.upper() for ext in __VIDEO_EXTENSIONS])
+# The extensions are matched in lower case
+__IMAGE_EXTENSIONS = frozenset(
+    [
+        ".bmp",
+        ".dib",  # Windows bitmaps
+        ".jpeg",
+        ".jpg",
+        ".jpe",  # JPEG files
+        ".jp2",  # JPEG 2000 files
+        ".png",  # Portable Network Graphics
+        ".webp",  # WebP
+        ".pbm",
+        ".pgm",
+        ".ppm",
+        ".pxm",
+        ".pnm",  # Portable image format
+        ".pfm",  # Pfiles
+        ".sr",
+        ".ras",  # Sun rasters
+        ".tiff",
+        ".tif",  # TIFF files
+        ".exr",  # OpenEXR Image files
+        ".hdr",
+        ".pic",  # Radiance HDR
+    ]
+)
+
+
+__VIDEO_EXTENSIONS = frozenset([".avi", ".mp4"])
+
+
+class MediaType(Enum):
+    """
+    Type of the media files
+    """
+
+    IMAGE = "image"
+    VIDEO = "video"
 
 
 def get_image_format(extension: str):
@@ -59,6 +71,109 @@ def get_image_format(extension: str):
     return extension[1:]
 
 
+@contextmanager
+def atomic_output(path: str) -> Iterator[str]:
+    """
+    Context manager of a temporary path for writing a file, which is renamed to the given path
+    only if the context exits without error, so a file is never left partially written under its
+    final name. The temporary file is hidden and keeps the extension for the format detection.
+    :param path: The final path of the file
+    :returns: The temporary path to be written
+    """
+    folder, file_name = os.path.split(path)
+    name, ext = os.path.splitext(file_name)
+    temp_path = os.path.join(folder, f".{name}.tmp-{uuid.uuid4().hex}{ext}")
+    try:
+        yield temp_path
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+# pylint: disable=unsubscriptable-object
+def media_type(path: str) -> Union[MediaType, None]:
+    """
+    Classifies a file by its extension, case-insensitively
+    :param path: The path of the file
+    :returns: The type of the media file or None if it is not a media file
+    """
+    extension = os.path.splitext(path)[1].lower()
+    if extension in __IMAGE_EXTENSIONS:
+        return MediaType.IMAGE
+    if extension in __VIDEO_EXTENSIONS:
+        return MediaType.VIDEO
+    return None
+
+
+def walk_files(folder: str) -> Iterator[str]:
+    """
+    Iterates over the files in a folder and its subfolders in a single pass.
+    The folders are listed once by `os.scandir`, which gets the type of the entries without
+    further system calls on most file systems. The files of a folder are yielded in the order of
+    their names before the subfolders, symbolic links of folders are not followed.
+    :param folder: The path of the folder
+    :returns: Generator of the paths of the files
+    """
+    folders = [folder]
+    while folders:
+        folder = folders.pop()
+        try:
+            with os.scandir(folder) as entries:
+                entries = sorted(entries, key=lambda entry: entry.name)
+        except OSError as e:
+            logger.warning("Unable to list the folder %s: %s", folder, e)
+            continue
+        subfolders = []
+        for entry in entries:
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    subfolders.append(entry.path)
+                elif entry.is_file():
+                    yield entry.path
+            except OSError as e:
+                logger.debug("Unable to check %s: %s", entry.path, e)
+        # The subfolders are visited in the order of their names
+        folders.extend(reversed(subfolders))
+
+
+# pylint: disable=unsubscriptable-object
+def iter_media(
+    paths: Union[str, os.PathLike, List[Union[str, os.PathLike]]]
+) -> Iterator[Tuple[str, MediaType]]:
+    """
+    Finds the image and video files in a single traversal
+    :param paths: The path or list of paths of media files or folders to be searched
+    :returns: Generator of the paths of the found media files and their types
+    """
+    for file_path in iter_files(paths):
+        file_type = media_type(file_path)
+        if file_type is not None:
+            yield file_path, file_type
+
+
+# pylint: disable=unsubscriptable-object
+def find_media(
+    paths: Union[str, os.PathLike, List[Union[str, os.PathLike]]]
+) -> Tuple[List[str], List[str]]:
+    """
+    Finds the image and video files in a single traversal
+    :param paths: The path or list of paths of media files or folders to be searched
+    :returns: The list of the paths of the found image files and of the found video files
+    """
+    logger.debug("Looking for media files in the pathes %s", paths)
+    found = {MediaType.IMAGE: [], MediaType.VIDEO: []}
+    for file_path, file_type in iter_media(paths):
+        found[file_type].append(file_path)
+    logger.debug(
+        "Found %i image and %i video files",
+        len(found[MediaType.IMAGE]),
+        len(found[MediaType.VIDEO]),
+    )
+    return found[MediaType.IMAGE], found[MediaType.VIDEO]
+
+
 # pylint: disable=unsubscriptable-object
 def find_images(paths: Union[str, List[str]]) -> List[str]:
     """
@@ -68,7 +183,7 @@ def find_images(paths: Union[str, List[str]]) -> List[str]:
     """
     logger.debug("Looking for image files in the pathes %s", paths)
     image_files = find_files(paths, __IMAGE_EXTENSIONS)
-    logger.debug("Found image files: %s", image_files)
+    logger.debug("Found %i image files", len(image_files))
     return image_files
 
 
@@ -81,35 +196,41 @@ def find_videos(pathes: Union[str, List[str]]) -> List[str]:
     """
     logger.debug("Looking for video files in the pathes %s", pathes)
     video_files = find_files(pathes, __VIDEO_EXTENSIONS)
-    logger.debug("Found video files: %s", video_files)
+    logger.debug("Found %i video files", len(video_files))
     return video_files
 
 
+# pylint: disable=unsubscriptable-object
+def iter_files(
+    paths: Union[str, os.PathLike, List[Union[str, os.PathLike]]],
+    extensions: Union[Collection[str], None] = None,
+) -> Iterator[str]:
+    """
+    Finds files in a single traversal
+    :param paths: The path or list of paths of files or folders to be searched, as strings or
+                  path-like objects
+    :param extensions: The extensions to be searched, case-insensitively, every file if None
+    :returns: Generator of the paths of the found files
+    """
+    if extensions is not None:
+        extensions = {extension.lower() for extension in extensions}
+    for path in [paths] if isinstance(paths, (str, os.PathLike)) else paths:
+        path = os.fspath(path)
+        file_paths = walk_files(path) if os.path.isdir(path) else [path]
+        for file_path in file_paths:
+            if extensions is None or os.path.splitext(file_path)[1].lower() in extensions:
+                yield file_path
+
+
 # pylint: disable=unsubscriptable-object
 def find_files(
-    paths: Union[str, List[str]], extensions: Union[List[str], None] = None
+    paths: Union[str, os.PathLike, List[Union[str, os.PathLike]]],
+    extensions: Union[Collection[str], None] = None,
 ) -> List[str]:
     """
     Finds files
     :param paths: The path or list of paths where the image files to be searched
-    :param extensions: The extensions to be searched
+    :param extensions: The extensions to be searched, case-insensitively, every file if None
     :returns: The list of the paths of the found image files
     """
-    if extensions is None:
-        extensions = [".*"]
-    image_pathes = []
-    if isinstance(paths, list):
-        for path in paths:
-            image_pathes.extend(find_files(path, extensions))
-    else:
-        path = paths
-        if os.path.isdir(path):
-            images_in_folder = [
-                str(image_path)
-                for extension in extensions
-                for image_path in Path(path).rglob(f"*{extension}")
-            ]
-            image_pathes.extend(images_in_folder)
-        elif os.path.splitext(path)[1] in extensions:
-            image_pathes.append(path)
-    return image_pathes
+    return list(iter_files(paths, extensions))
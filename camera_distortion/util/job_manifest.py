@@ -0,0 +1,164 @@
+"""
+Module for recording the progress of batch jobs, so they can be resumed
+"""
+__author__ = "Peter Kocsis"
+__copyright__ = "Peter Kocsis"
+__credits__ = ["MIT License"]
+__version__ = "0.1"
+__maintainer__ = "Peter Kocsis"
+__email__ = "peter.kocsis@tum.de"
+__status__ = "Released"
+
+import logging
+import os
+import sqlite3
+import time
+from typing import Dict, Tuple, Union
+
+logger = logging.getLogger(__file__)
+
+# The name of the manifest file in the output folder
+MANIFEST_FILE_NAME = ".camera_distortion_manifest.sqlite"
+
+# The state of an input file, its size and modification time in nanoseconds
+# pylint: disable=unsubscriptable-object
+FileState = Tuple[Union[int, None], Union[int, None]]
+
+
+def file_state(path: str) -> FileState:
+    """
+    Gets the state of a file, which changes when the file is modified
+    :param path: The path of the file
+    :returns: The size and the modification time of the file
+    """
+    stat = os.stat(path)
+    return stat.st_size, stat.st_mtime_ns
+
+
+class JobManifest:
+    """
+    Persistent record of the media files processed by a batch job.
+    Every input is recorded with its size and modification time, the settings of the job, the
+    output and the result. A media file is completed if it has been processed successfully with
+    the same settings, it has not changed since and its output exists, so a rerun of an interrupted
+    or extended job processes only the rest.
+    The manifest is an SQLite database, every result is committed right away, so an interrupted
+    job loses no record. The outputs have to be written atomically, see `util.io.atomic_output`,
+    so a recorded output is always complete.
+    """
+
+    def __init__(self, path: str, settings: str):
+        """
+        Initialize the manifest from the given file, created if not exists
+        :param path: The path of the SQLite file of the manifest
+        :param settings: The description of the settings of the job, the media files processed
+                         with different settings are not completed
+        :raise sqlite3.OperationalError: If the manifest is locked or can not be opened
+        """
+        self.path = path
+        self.settings = settings
+        # The states of the checked inputs until their result is recorded
+        self._states: Dict[str, FileState] = {}
+        try:
+            self._connection = self._connect()
+        except sqlite3.OperationalError:
+            # E.g. the manifest is locked by another run or can not be opened, it is kept intact
+            raise
+        except sqlite3.DatabaseError as e:
+            logger.warning("Corrupt manifest %s is recreated, %s", self.path, e)
+            os.remove(self.path)
+            self._connection = self._connect()
+
+    def _connect(self) -> sqlite3.Connection:
+        """
+        Opens the database and creates the table of the media files
+        :returns: The connection
+        """
+        connection = sqlite3.connect(self.path)
+        try:
+            # The log of the writes survives the interruption of the job
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS media ("
+                "path TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER, settings TEXT, "
+                "output TEXT, error TEXT, finished REAL)"
+            )
+            connection.commit()
+        except sqlite3.DatabaseError:
+            connection.close()
+            raise
+        return connection
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def __len__(self):
+        """
+        Returns the number of the recorded media files
+        """
+        return self._connection.execute("SELECT COUNT(*) FROM media").fetchone()[0]
+
+    def is_completed(self, media_path: str, output_path: str) -> bool:
+        """
+        Checks whether a media file has been completed, the state of the input is kept for
+        recording its result
+        :param media_path: The path of the media file
+        :param output_path: The path of the output of the media file
+        :returns: True if the media file has been completed
+        """
+        media_path = os.path.abspath(media_path)
+        try:
+            state = file_state(media_path)
+        except OSError:
+            # The missing input is reported by its processing
+            return False
+        self._states[media_path] = state
+        row = self._connection.execute(
+            "SELECT size, mtime_ns, settings, output, error FROM media WHERE path = ?",
+            (media_path,),
+        ).fetchone()
+        if row is None or tuple(row[:2]) != state:
+            return False
+        if row[2:] != (self.settings, os.path.abspath(output_path), None):
+            return False
+        # The output could be removed since
+        return os.path.exists(output_path)
+
+    # pylint: disable=unsubscriptable-object
+    def record(self, media_path: str, output_path: str, error: Union[str, None]):
+        """
+        Records the result of a media file
+        :param media_path: The path of the media file
+        :param output_path: The path of the output of the media file
+        :param error: The error message or None if the media file has been processed successfully
+        """
+        media_path = os.path.abspath(media_path)
+        # The input could be modified during the processing, the state of the check is recorded
+        state = self._states.pop(media_path, None)
+        if state is None:
+            try:
+                state = file_state(media_path)
+            except OSError:
+                state = (None, None)
+        self._connection.execute(
+            "INSERT OR REPLACE INTO media VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (
+                media_path,
+                *state,
+                self.settings,
+                os.path.abspath(output_path),
+                error,
+                time.time(),
+            ),
+        )
+        self._connection.commit()
+
+    def close(self):
+        """
+        Closes the manifest
+        """
+        self._connection.close()
@@ -0,0 +1,172 @@
+"""
+Module for storing the undistortion maps on disk
+"""
+__author__ = "Peter Kocsis"
+__copyright__ = "Peter Kocsis"
+__credits__ = ["MIT License"]
+__version__ = "0.1"
+__maintainer__ = "Peter Kocsis"
+__email__ = "peter.kocsis@tum.de"
+__status__ = "Released"
+
+import hashlib
+import logging
+import os
+import shutil
+import uuid
+from typing import Hashable, List, Tuple, Union
+
+import numpy as np
+
+
+def default_map_store_path() -> str:
+    """
+    Gets the default location of the map store in the user's cache folder
+    :returns: The path of the map store
+    """
+    cache_folder = os.environ.get("XDG_CACHE_HOME") or os.path.join(
+        os.path.expanduser("~"), ".cache"
+    )
+    return os.path.join(cache_folder, "camera_distortion", "maps")
+
+
+class MapStore:
+    """
+    Content-addressed store of undistortion maps on disk.
+    Every entry is a folder named after the hash of its key, containing the maps as `.npy` files.
+    The maps are loaded as read-only memory-maps, so loading needs no computation and processes
+    using the same entry share the pages through the page cache of the OS.
+    The store is bounded by the total size of the entries, the least recently used ones are
+    removed when it is exceeded.
+    """
+
+    logger = logging.getLogger(__name__)
+
+    def __init__(self, path: str, max_bytes: int = 4 * 1024 ** 3):
+        """
+        Initialize the store in the given folder
+        :param path: The folder of the store, created if not exists
+        :param max_bytes: The maximal total size of the stored maps in bytes
+        """
+        self.path = path
+        self.max_bytes = max_bytes
+        os.makedirs(self.path, exist_ok=True)
+
+    @staticmethod
+    def _digest(key: Hashable) -> str:
+        """
+        Calculates the address of a key
+        :param key: The key of the maps
+        :returns: The hash of the key
+        """
+        return hashlib.sha1(repr(key).encode("utf-8")).hexdigest()
+
+    def _entry_path(self, key: Hashable) -> str:
+        """
+        Gets the folder of an entry
+        :param key: The key of the maps
+        :returns: The path of the entry folder
+        """
+        return os.path.join(self.path, self._digest(key))
+
+    def __contains__(self, key: Hashable):
+        """
+        Checks whether the maps of the key are stored
+        """
+        return os.path.isdir(self._entry_path(key))
+
+    # pylint: disable=unsubscriptable-object
+    def load(self, key: Hashable) -> Union[Tuple[np.ndarray, ...], None]:
+        """
+        Loads stored maps as read-only memory-maps and marks them as the most recently used
+        :param key: The key of the maps
+        :returns: The maps or None if they are not stored
+        """
+        entry_path = self._entry_path(key)
+        try:
+            map_files = sorted(
+                file_name
+                for file_name in os.listdir(entry_path)
+                if file_name.endswith(".npy")
+            )
+            maps = tuple(
+                np.load(os.path.join(entry_path, file_name), mmap_mode="r")
+                for file_name in map_files
+            )
+            os.utime(entry_path)
+        except (OSError, ValueError) as e:
+            if not isinstance(e, FileNotFoundError):
+                self.logger.warning("Unable to load maps from %s, %s", entry_path, e)
+            return None
+        self.logger.debug("Maps loaded from %s", entry_path)
+        return maps
+
+    def save(self, key: Hashable, maps: Tuple[np.ndarray, ...]):
+        """
+        Saves maps to the store.
+        The maps are written to a temporary folder which is renamed afterwards, so concurrent
+        processes never see partially written entries.
+        :param key: The key of the maps
+        :param maps: The maps to be saved
+        """
+        entry_path = self._entry_path(key)
+        temp_path = os.path.join(self.path, f".tmp-{uuid.uuid4().hex}")
+        os.makedirs(temp_path)
+        try:
+            for idx, map_array in enumerate(maps):
+                np.save(os.path.join(temp_path, f"map{idx}.npy"), map_array)
+            os.rename(temp_path, entry_path)
+            self.logger.debug("Maps saved to %s", entry_path)
+        except OSError:
+            # The entry has been saved by another process meanwhile
+            shutil.rmtree(temp_path, ignore_errors=True)
+        self.evict()
+
+    def entries(self) -> List[Tuple[str, int, float]]:
+        """
+        Lists the stored entries
+        :returns: The path, the size in bytes and the last access time of every entry,
+                  ordered from the least recently used
+        """
+        entries = []
+        with os.scandir(self.path) as folder:
+            for entry in folder:
+                if entry.name.startswith(".") or not entry.is_dir():
+                    continue
+                try:
+                    size = sum(
+                        os.path.getsize(os.path.join(entry.path, file_name))
+                        for file_name in os.listdir(entry.path)
+                    )
+                    entries.append((entry.path, size, entry.stat().st_mtime))
+                except FileNotFoundError:
+                    continue
+        return sorted(entries, key=lambda entry: entry[2])
+
+    def size(self) -> int:
+        """
+        Calculates the total size of the stored maps
+        :returns: The size in bytes
+        """
+        return sum(size for _, size, _ in self.entries())
+
+    def evict(self):
+        """
+        Removes the least recently used entries until the store fits into its size limit
+        """
+        entries = self.entries()
+        total_size = sum(size for _, size, _ in entries)
+        for entry_path, size, _ in entries:
+            if total_size <= self.max_bytes:
+                break
+            self.logger.debug("Evicting maps %s", entry_path)
+            # Memory-maps of removed files stay valid in the processes using them
+            shutil.rmtree(entry_path, ignore_errors=True)
+            total_size -= size
+
+    def clear(self):
+        """
+        Removes every entry of the store
+        """
+        for entry_path, _, _ in self.entries():
+            shutil.rmtree(entry_path, ignore_errors=True)
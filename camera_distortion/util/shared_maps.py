@@ -0,0 +1,226 @@
+"""
+Module for sharing the undistortion maps between processes through shared memory
+"""
+__author__ = "Peter Kocsis"
+__copyright__ = "Peter Kocsis"
+__credits__ = ["MIT License"]
+__version__ = "0.1"
+__maintainer__ = "Peter Kocsis"
+__email__ = "peter.kocsis@tum.de"
+__status__ = "Released"
+
+import errno
+import logging
+import os
+import shutil
+import sys
+from typing import Dict, Hashable, List, NamedTuple, Tuple, Union
+
+import numpy as np
+
+try:
+    from multiprocessing import shared_memory  # novermin
+except ImportError:
+    # Shared memory needs Python 3.8, the maps are not shared between the processes without it
+    shared_memory = None
+
+# Indicates whether the maps can be published in shared memory
+SHARED_MEMORY_AVAILABLE = shared_memory is not None
+
+
+class SharedMapHandle(NamedTuple):
+    """
+    Picklable description of maps published in shared memory, `blocks` lists the name of the
+    shared memory block, the shape and the dtype of every map
+    """
+
+    key: Hashable
+    blocks: List[Tuple[str, Tuple[int, ...], str]]
+
+    @property
+    def nbytes(self) -> int:
+        """
+        Returns the total size of the maps in bytes
+        """
+        return sum(
+            int(np.prod(shape)) * np.dtype(dtype).itemsize
+            for _, shape, dtype in self.blocks
+        )
+
+
+def _open_shared_memory(name: str) -> "shared_memory.SharedMemory":
+    """
+    Attaches to an existing shared memory block without taking over its cleanup
+    :param name: The name of the block
+    :returns: The shared memory block
+    """
+    if sys.version_info >= (3, 13):
+        # Since Python 3.13 the attaching process can opt out of the resource tracking
+        # pylint: disable=unexpected-keyword-arg
+        return shared_memory.SharedMemory(name=name, track=False)  # novermin
+    return shared_memory.SharedMemory(name=name)
+
+
+def _free_shared_memory() -> float:
+    """
+    Gets the free space of the shared memory filesystem
+    :returns: The free space in bytes, infinite if it is not known
+    """
+    if not os.path.isdir("/dev/shm"):
+        return float("inf")
+    return shutil.disk_usage("/dev/shm").free
+
+
+def _map_view(
+    block: "shared_memory.SharedMemory", shape: Tuple[int, ...], dtype: str
+) -> np.ndarray:
+    """
+    Creates a view of a map in a shared memory block.
+    Unlike `np.ndarray`, `np.frombuffer` holds the buffer of the block, so the block can not be
+    unmapped while the view is in use
+    :param block: The shared memory block
+    :param shape: The shape of the map
+    :param dtype: The type of the map
+    :returns: The view of the map
+    """
+    return np.frombuffer(block.buf, dtype=dtype, count=int(np.prod(shape))).reshape(shape)
+
+
+class SharedMapRegistry:
+    """
+    Registry of undistortion maps in shared memory.
+    The owner process publishes every map once and passes the handles to the workers, which
+    attach to them and get read-only NumPy views without copying, so the memory grows with the
+    number of the distinct mappings instead of the number of the workers.
+    Closing the registry releases the views and the owner unlinks the blocks, the memory is freed
+    by the OS once every process has closed them.
+    """
+
+    logger = logging.getLogger(__name__)
+
+    def __init__(self):
+        """
+        Initialize empty registry
+        """
+        self._blocks: List["shared_memory.SharedMemory"] = []
+        self._owned: List["shared_memory.SharedMemory"] = []
+        self._maps: Dict[Hashable, Tuple[np.ndarray, ...]] = {}
+        self._handles: Dict[Hashable, SharedMapHandle] = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def __len__(self):
+        """
+        Returns the number of the registered mappings
+        """
+        return len(self._maps)
+
+    def __contains__(self, key: Hashable):
+        """
+        Checks whether the maps of the key are registered
+        """
+        return key in self._maps
+
+    def publish(self, key: Hashable, maps: Tuple[np.ndarray, ...]) -> SharedMapHandle:
+        """
+        Copies maps into new shared memory blocks, owned by this registry
+        :param key: The key of the maps
+        :param maps: The maps to be shared
+        :returns: The handle of the maps for the workers
+        """
+        if key in self._handles:
+            return self._handles[key]
+        if not SHARED_MEMORY_AVAILABLE:
+            raise OSError(errno.ENOSYS, "Shared memory is not available before Python 3.8")
+        # Writing beyond the free space of the shared memory filesystem would crash the process
+        required_bytes = sum(map_array.nbytes for map_array in maps)
+        if required_bytes > _free_shared_memory():
+            raise OSError(errno.ENOSPC, "Not enough shared memory for the maps")
+        blocks = []
+        shared_maps = []
+        for map_array in maps:
+            block = shared_memory.SharedMemory(
+                create=True, size=max(1, map_array.nbytes)
+            )
+            self._blocks.append(block)
+            self._owned.append(block)
+            shared_map = _map_view(block, map_array.shape, map_array.dtype)
+            shared_map[...] = map_array
+            shared_map.flags.writeable = False
+            blocks.append((block.name, map_array.shape, map_array.dtype.str))
+            shared_maps.append(shared_map)
+        handle = SharedMapHandle(key, blocks)
+        self._maps[key] = tuple(shared_maps)
+        self._handles[key] = handle
+        self.logger.debug("%i bytes of maps published", handle.nbytes)
+        return handle
+
+    def attach(self, handle: SharedMapHandle) -> Tuple[np.ndarray, ...]:
+        """
+        Attaches to maps published by another process
+        :param handle: The handle of the maps
+        :returns: Read-only views of the shared maps
+        """
+        if handle.key in self._maps:
+            return self._maps[handle.key]
+        shared_maps = []
+        for name, shape, dtype in handle.blocks:
+            block = _open_shared_memory(name)
+            self._blocks.append(block)
+            shared_map = _map_view(block, shape, dtype)
+            shared_map.flags.writeable = False
+            shared_maps.append(shared_map)
+        self._maps[handle.key] = tuple(shared_maps)
+        self._handles[handle.key] = handle
+        return self._maps[handle.key]
+
+    # pylint: disable=unsubscriptable-object
+    def load(self, key: Hashable) -> Union[Tuple[np.ndarray, ...], None]:
+        """
+        Gets registered maps
+        :param key: The key of the maps
+        :returns: The shared maps or None if they are not registered
+        """
+        return self._maps.get(key)
+
+    # pylint: disable=unsubscriptable-object
+    def handle(self, key: Hashable) -> Union[SharedMapHandle, None]:
+        """
+        Gets the handle of registered maps
+        :param key: The key of the maps
+        :returns: The handle or None if the maps are not registered
+        """
+        return self._handles.get(key)
+
+    def handles(self) -> List[SharedMapHandle]:
+        """
+        Lists the handles of the registered maps
+        :returns: The handles to be passed to the workers
+        """
+        return list(self._handles.values())
+
+    def close(self):
+        """
+        Releases the registered maps and unlinks the blocks owned by this registry
+        """
+        self._maps.clear()
+        self._handles.clear()
+        for block in self._owned:
+            try:
+                block.unlink()
+            except FileNotFoundError:
+                pass
+        self._owned.clear()
+        in_use = []
+        for block in self._blocks:
+            try:
+                block.close()
+            except BufferError:
+                # Views of the maps are still in use, the block is unmapped when they are freed
+                self.logger.debug("Shared maps %s still in use", block.name)
+                in_use.append(block)
+        self._blocks = in_use
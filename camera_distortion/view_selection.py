@@ -0,0 +1,207 @@
+#!/usr/bin/env python
+"""
+Module for selecting the views used for the calibration.
+Calibration images extracted from videos contain many near-duplicate views, which make the
+calibration slower without improving it. The selector tracks the diversity of the poses and the
+coverage of the image by the pattern as the detections arrive, so the detection can stop once
+enough different views are found. Only the most diverse views are used for the calibration and
+the views with outlier reprojection errors are dropped.
+"""
+__author__ = "Peter Kocsis"
+__copyright__ = "Peter Kocsis"
+__credits__ = ["MIT License"]
+__version__ = "0.1"
+__maintainer__ = "Peter Kocsis"
+__email__ = "peter.kocsis@tum.de"
+__status__ = "Released"
+
+from typing import List, NamedTuple, Tuple, Union
+
+import numpy as np
+
+from camera_distortion.frame_selection import (
+    pose_bin,
+    pose_descriptor,
+    select_diverse_poses,
+)
+from camera_distortion.reprojection import ReprojectionError
+
+
+class ViewSelectionStatistics(NamedTuple):
+    """
+    Statistics of the view selection
+    """
+
+    detected_views: int = 0
+    novel_views: int = 0
+    pose_bins: int = 0
+    coverage: float = 0.0
+    stopped_early: bool = False
+    selected_views: int = 0
+    outlier_views: Tuple[str, ...] = ()
+    outlier_iterations: int = 0
+    initial_rms: Union[float, None] = None  # pylint: disable=unsubscriptable-object
+    final_rms: Union[float, None] = None  # pylint: disable=unsubscriptable-object
+
+    def __str__(self):
+        """
+        String representation of the object
+        """
+        text = (
+            f"{self.detected_views} views detected, {self.novel_views} novel, "
+            f"{self.pose_bins} pose bins, {self.coverage:.0%} image coverage"
+            f"{', detection stopped early' if self.stopped_early else ''}, "
+            f"{self.selected_views} views selected, "
+            f"{len(self.outlier_views)} outliers dropped"
+        )
+        if self.initial_rms is not None:
+            text += f", RMS error {self.initial_rms:.4f} -> {self.final_rms:.4f} px"
+        return text
+
+
+# pylint: disable=too-many-instance-attributes
+class ViewSelector:
+    """
+    Selects the views used for the calibration.
+    A view is novel if its pattern covers new cells of the coverage grid or its pose falls into a
+    new pose bin. The detection can stop once the coverage target is met and enough novel views
+    are found. The selection statistics are collected in `statistics`.
+    """
+
+    # pylint: disable=too-many-arguments
+    def __init__(
+        self,
+        max_views: int = 40,
+        coverage_target: float = 0.8,
+        outlier_ratio: float = 3.0,
+        max_outlier_iterations: int = 2,
+        coverage_grid: Tuple[int, int] = (12, 9),
+    ):
+        """
+        Initialize the selector
+        :param max_views: The number of the views used for the calibration
+        :param coverage_target: The ratio of the coverage grid cells which need to contain
+                                calibration points before the detection stops
+        :param outlier_ratio: The views with larger RMS error than this ratio of the median
+                              RMS error of the views are dropped
+        :param max_outlier_iterations: The maximal number of re-solving without the outliers
+        :param coverage_grid: The number of the cells of the coverage grid (width, height)
+        """
+        self.max_views = max_views
+        self.coverage_target = coverage_target
+        self.outlier_ratio = outlier_ratio
+        self.max_outlier_iterations = max_outlier_iterations
+        self.coverage_grid = coverage_grid
+        self.reset()
+
+    def reset(self):
+        """
+        Forgets the added views
+        """
+        self._covered_cells = np.zeros(self.coverage_grid[::-1], dtype=bool)
+        self._pose_bins = set()
+        self._descriptors = []
+        self._novel = []
+        self.statistics = ViewSelectionStatistics()
+
+    def add(
+        self,
+        corners: np.ndarray,
+        pattern_size: Tuple[int, int],
+        image_shape: Tuple[int, int],
+    ) -> bool:
+        """
+        Adds a detected view
+        :param corners: The detected corners of the pattern
+        :param pattern_size: The number of the corners (width, height)
+        :param image_shape: The shape of the image
+        :returns: Whether the view is novel
+        """
+        image_size = (image_shape[1], image_shape[0])
+        points = corners.reshape(-1, 2) / image_size
+        cells = np.clip(
+            (points * self.coverage_grid).astype(int),
+            0,
+            np.array(self.coverage_grid) - 1,
+        )
+        new_cells = ~self._covered_cells[cells[:, 1], cells[:, 0]]
+        self._covered_cells[cells[:, 1], cells[:, 0]] = True
+
+        descriptor = pose_descriptor(corners, pattern_size, image_size)
+        bin_key = pose_bin(descriptor)
+        novel = bool(new_cells.any()) or bin_key not in self._pose_bins
+        self._pose_bins.add(bin_key)
+        self._descriptors.append(descriptor)
+        self._novel.append(novel)
+
+        self.statistics = self.statistics._replace(
+            detected_views=self.statistics.detected_views + 1,
+            novel_views=self.statistics.novel_views + novel,
+            pose_bins=len(self._pose_bins),
+            coverage=self.coverage,
+        )
+        return novel
+
+    @property
+    def coverage(self) -> float:
+        """
+        Returns the ratio of the coverage grid cells containing calibration points
+        """
+        return float(self._covered_cells.mean())
+
+    def is_complete(self) -> bool:
+        """
+        Checks whether the coverage target is met and enough novel views are found
+        """
+        enough_views = self.statistics.novel_views >= self.max_views
+        return enough_views and self.coverage >= self.coverage_target
+
+    def stop_detection(self):
+        """
+        Records that the detection stopped early, because the selection is complete
+        """
+        self.statistics = self.statistics._replace(stopped_early=True)
+
+    def select(self) -> List[int]:
+        """
+        Selects the most diverse views, the novel views are preferred
+        :returns: The indices of the selected views in the order of their addition
+        """
+        descriptors = np.array(self._descriptors)
+        novel_indices = [idx for idx, novel in enumerate(self._novel) if novel]
+        selected = [
+            novel_indices[idx]
+            for idx in select_diverse_poses(descriptors[novel_indices], self.max_views)
+        ]
+        selected = sorted(select_diverse_poses(descriptors, self.max_views, selected))
+        self.statistics = self.statistics._replace(selected_views=len(selected))
+        return selected
+
+    def find_outliers(self, reprojection_error: ReprojectionError) -> List[int]:
+        """
+        Finds the views with outlier reprojection errors, which should be dropped before
+        re-solving the calibration
+        :param reprojection_error: The reprojection error of the calibration
+        :returns: The indices of the outlier views, empty if the calibration should be kept
+        """
+        initial_rms = self.statistics.initial_rms
+        self.statistics = self.statistics._replace(
+            initial_rms=reprojection_error.rms if initial_rms is None else initial_rms,
+            final_rms=reprojection_error.rms,
+        )
+        if self.statistics.outlier_iterations >= self.max_outlier_iterations:
+            return []
+
+        view_errors = reprojection_error.view_errors
+        outliers = np.flatnonzero(
+            view_errors > self.outlier_ratio * np.median(view_errors)
+        )
+        # Keep enough views for the calibration
+        if len(outliers) == 0 or len(view_errors) - len(outliers) < 3:
+            return []
+        outlier_views = tuple(reprojection_error.view_names[idx] for idx in outliers)
+        self.statistics = self.statistics._replace(
+            outlier_iterations=self.statistics.outlier_iterations + 1,
+            outlier_views=self.statistics.outlier_views + outlier_views,
+        )
+        return outliers.tolist()
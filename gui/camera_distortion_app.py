@@ -20,7 +20,7 @@ import tkinter.ttk as ttk
 from enum import Enum
 from tkinter import filedialog as fd
 from tkinter import messagebox
-from typing import List, Iterable
+from typing import List, Iterable, Tuple
 from urllib.parse import urlparse
 
 import pygubu
@@ -28,8 +28,9 @@ from camera_distortion.calibration import calibrate
 from camera_distortion.camera_model import CameraModel, CalibrationPattern
 from camera_distortion.collect import collect_calibration_images
 from camera_distortion.undistortion.undistort import undistort_image, undistort_video
+from camera_distortion.util.discovery import MediaDiscovery
 from camera_distortion.util.logger import init_logger
-from camera_distortion.util.io import find_images, find_videos
+from camera_distortion.util.map_store import MapStore, default_map_store_path
 
 try:
     from TkinterDnD2 import DND_ALL
@@ -45,15 +46,6 @@ except AttributeError:
     RESOURCE_PATH = os.path.join(PROJECT_PATH, "gui")
 
 
-def _flatten(list_to_flatten: list) -> list:
-    """
-    Flattens a list:
-    :param list_to_flatten: The list to flatten
-    :returns: The flattened list
-    """
-    return [item for sublist in list_to_flatten for item in sublist]
-
-
 class _PathType(Enum):
     FILE = "file"
     DIRECTORY = "directory"
@@ -436,36 +428,79 @@ class CameraDistortionApp:
             )
             return
 
-        all_images = [find_images(media_path) for media_path in media_pathes]
-        all_videos = [find_videos(media_path) for media_path in media_pathes]
-
-        self.image_progress_bar["maximum"] = len(_flatten(all_images))
-        self.video_progress_bar["maximum"] = len(_flatten(all_videos))
-
         camera_parameters = CameraModel.from_json(parameters_file)
+        if camera_parameters.map_store is None:
+            camera_parameters.map_store = MapStore(default_map_store_path())
 
+        # The media files are undistorted as they are discovered,
+        # the image progress bar is indeterminate until the discovery finishes
+        images_done, videos_done = 0, 0
         for idx, media_path in enumerate(media_pathes):
             input_media_list.itemconfig(idx, bg="gold")
+            images_done, videos_done = self._undistort_media(
+                media_path, out_folder, camera_parameters, images_done, videos_done
+            )
+            input_media_list.itemconfig(idx, bg="green")
+
+        self.image_progress_bar.config(mode="determinate", value=0)
+        self.video_progress_bar["value"] = 0
+        self.status_label.config(text="Undistortion finished")
 
-            for image_path in all_images[idx]:
+    def _undistort_media(
+        self,
+        media_path: str,
+        out_folder: str,
+        camera_parameters: CameraModel,
+        images_done: int,
+        videos_done: int,
+    ) -> Tuple[int, int]:
+        """
+        Undistorts the media files of a media path as they are discovered
+        :param media_path: The media file or folder
+        :param out_folder: The output folder
+        :param camera_parameters: The camera model
+        :param images_done: The number of the images processed before
+        :param videos_done: The number of the videos processed before
+        :returns: The number of the processed images and videos, including the previous ones
+        """
+        with MediaDiscovery(media_path) as discovery:
+            images_before = images_done
+            for image_path in discovery.iter_images():
                 rel_path = os.path.relpath(image_path, media_path)
                 out_path = os.path.join(out_folder, os.path.dirname(rel_path))
                 self.status_label.config(text=f"Undistorting {media_path} - {rel_path}")
                 undistort_image(image_path, out_path, camera_parameters, crop=0)
-                self.image_progress_bar["value"] += 1
+                images_done += 1
+                self._show_image_progress(discovery, images_before, images_done)
 
-            for video_path in all_videos[idx]:
+            self.video_progress_bar["maximum"] = videos_done + len(discovery.video_paths)
+            for video_path in discovery.video_paths:
                 rel_path = os.path.relpath(video_path, media_path)
                 out_path = os.path.join(out_folder, os.path.dirname(rel_path))
                 self.status_label.config(text=f"Undistorting {media_path} - {rel_path}")
                 undistort_video(video_path, out_path, camera_parameters, crop=0)
-                self.video_progress_bar["value"] += 1
-
-            input_media_list.itemconfig(idx, bg="green")
-
-        self.image_progress_bar["value"] = 0
-        self.video_progress_bar["value"] = 0
-        self.status_label.config(text="Undistortion finished")
+                videos_done += 1
+                self.video_progress_bar["value"] = videos_done
+        return images_done, videos_done
+
+    def _show_image_progress(
+        self, discovery: MediaDiscovery, images_before: int, images_done: int
+    ):
+        """
+        Shows the progress of the images, the total is known only when the discovery finishes
+        :param discovery: The discovery of the images of the current media path
+        :param images_before: The number of the images of the previous media paths
+        :param images_done: The number of the processed images
+        """
+        if discovery.finished.is_set():
+            self.image_progress_bar.config(
+                mode="determinate",
+                maximum=images_before + discovery.num_of_images,
+                value=images_done,
+            )
+        else:
+            self.image_progress_bar.config(mode="indeterminate")
+            self.image_progress_bar.step()
 
     def _on_start_button(self, event=None):
         """
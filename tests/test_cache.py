@@ -0,0 +1,95 @@
+"""
+Tests of the cache of the undistortion maps
+"""
+__author__ = "Peter Kocsis"
+__copyright__ = "Peter Kocsis"
+__credits__ = ["MIT License"]
+__version__ = "0.1"
+__maintainer__ = "Peter Kocsis"
+__email__ = "peter.kocsis@tum.de"
+__status__ = "Released"
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from camera_distortion.benchmark.benchmark import default_camera_model
+from camera_distortion.camera_model import CameraModel
+from camera_distortion.util.cache import MapCache
+
+
+def test_hits_and_misses():
+    """
+    Tests the counters of the found and the missing keys
+    """
+    cache = MapCache(max_bytes=1000)
+    value = np.zeros(10, dtype=np.uint8)
+    assert cache.get("a") is None
+    cache.put("a", value)
+    assert cache.get("a") is value
+    assert cache.get_or_create("a", lambda: None) is value
+    assert cache.get_or_create("b", lambda: value) is value
+    assert "b" in cache
+    assert cache.stats() == {
+        "entries": 2,
+        "bytes": 20,
+        "max_bytes": 1000,
+        "hits": 2,
+        "misses": 2,
+        "evictions": 0,
+    }
+
+
+def test_eviction():
+    """
+    Tests that the least recently used entries are evicted and too large values are not cached
+    """
+    cache = MapCache(max_bytes=300)
+    for key in ("a", "b", "c"):
+        cache.put(key, np.zeros(100, dtype=np.uint8))
+    cache.get("a")
+    cache.put("d", (np.zeros(50, dtype=np.uint8), np.zeros(50, dtype=np.uint8)))
+    assert "b" not in cache
+    assert all(key in cache for key in ("a", "c", "d"))
+    assert cache.stats()["evictions"] == 1
+    cache.put("e", np.zeros(301, dtype=np.uint8))
+    assert "e" not in cache
+    assert len(cache) == 3
+    assert cache.stats()["bytes"] == 300
+
+
+def test_concurrent_creation():
+    """
+    Tests that the concurrent requests of a missing key create its value only once
+    """
+    cache = MapCache()
+    created = []
+    started = threading.Event()
+
+    def create():
+        created.append(1)
+        started.wait(1.0)
+        return np.zeros(10)
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        futures = [executor.submit(cache.get_or_create, "a", create) for _ in range(8)]
+        started.set()
+        values = [future.result() for future in futures]
+    assert len(created) == 1
+    assert all(value is values[0] for value in values)
+
+
+def test_camera_model_cache():
+    """
+    Tests that the maps of a model are computed once for every image size and cropping
+    """
+    CameraModel.map_cache.clear()
+    camera_model = default_camera_model()
+    maps = camera_model.get_undistortion_mapping((64, 48), 0.5)
+    assert camera_model.get_undistortion_mapping((64, 48), 0.5)[0] is maps[0]
+    assert default_camera_model().get_undistortion_mapping((64, 48), 0.5)[0] is maps[0]
+    assert camera_model.get_undistortion_mapping((64, 48), 0.0)[0] is not maps[0]
+    assert camera_model.get_undistortion_mapping((64, 48), 0.5, use_cache=False)[0] is not maps[0]
+    assert not maps[0].flags.writeable
+    assert CameraModel.map_cache.stats()["misses"] == 2
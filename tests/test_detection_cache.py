@@ -0,0 +1,91 @@
+"""
+Tests of the cache of the calibration point detections
+"""
+__author__ = "Peter Kocsis"
+__copyright__ = "Peter Kocsis"
+__credits__ = ["MIT License"]
+__version__ = "0.1"
+__maintainer__ = "Peter Kocsis"
+__email__ = "peter.kocsis@tum.de"
+__status__ = "Released"
+
+import os
+
+import cv2
+import numpy as np
+import pytest
+
+from camera_distortion import detection
+from camera_distortion.detection import DetectionOptions, detect_calibration_points_in_files
+from camera_distortion.util.detection_cache import DetectionCache
+
+PATTERN_SIZE = (9, 6)
+BOARD_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    "calibration_images",
+    "checkerboard_9x6.png",
+)
+
+
+@pytest.fixture(name="image_paths")
+def image_paths_fixture(tmp_path):
+    """
+    Saves two images of the calibration pattern and an image without it
+    """
+    board = cv2.resize(cv2.imread(BOARD_PATH, cv2.IMREAD_GRAYSCALE), (350, 248))
+    image_paths = []
+    for idx, position in enumerate([(35, 36), (60, 50), None]):
+        image = np.full((320, 420), 255, dtype=np.uint8)
+        if position is not None:
+            left, top = position
+            image[top : top + 248, left : left + 350] = board
+        image_paths.append(str(tmp_path / f"image_{idx}.png"))
+        cv2.imwrite(image_paths[-1], cv2.cvtColor(image, cv2.COLOR_GRAY2BGR))
+    return image_paths
+
+
+def _detect(image_paths, cache_path):
+    """
+    Detects the calibration points with a cache loaded from the given file
+    :param image_paths: The paths of the images
+    :param cache_path: The path of the cache file
+    :returns: The detections
+    """
+    options = DetectionOptions(cache=DetectionCache(cache_path))
+    return list(detect_calibration_points_in_files(image_paths, PATTERN_SIZE, False, options))
+
+
+def test_detection_cache(image_paths, tmp_path, monkeypatch):
+    """
+    Tests that the cached detections are reused and the modified images are detected again
+    """
+    cache_path = str(tmp_path / "cache.json")
+    detected = []
+
+    def detect_and_record(image_path, *args, **kwargs):
+        detected.append(image_path)
+        return detect_file(image_path, *args, **kwargs)
+
+    detect_file = detection.detect_calibration_points_in_file
+    monkeypatch.setattr(detection, "detect_calibration_points_in_file", detect_and_record)
+    detections = _detect(image_paths, cache_path)
+    assert [found for found, _, _ in detections] == [True, True, False]
+    assert detected == image_paths
+
+    # Only the modified image is detected again, the pattern is not found on it anymore
+    detected.clear()
+    cv2.imwrite(image_paths[1], np.full((320, 420, 3), 250, dtype=np.uint8))
+    cached_detections = _detect(image_paths, cache_path)
+    assert detected == image_paths[1:2]
+    assert [found for found, _, _ in cached_detections] == [True, False, False]
+    np.testing.assert_array_equal(cached_detections[0][1], detections[0][1])
+    assert cached_detections[0][2] == detections[0][2]
+
+    # The invalidated image is detected again
+    cache = DetectionCache(cache_path)
+    assert len(cache) == 4
+    assert cache.invalidate(image_paths[0]) == 1
+    cache.save()
+    detected.clear()
+    _detect(image_paths, cache_path)
+    assert detected == image_paths[:1]
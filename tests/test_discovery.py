@@ -0,0 +1,74 @@
+"""
+Tests of the discovery of the media files in the background
+"""
+__author__ = "Peter Kocsis"
+__copyright__ = "Peter Kocsis"
+__credits__ = ["MIT License"]
+__version__ = "0.1"
+__maintainer__ = "Peter Kocsis"
+__email__ = "peter.kocsis@tum.de"
+__status__ = "Released"
+
+import os
+
+import pytest
+
+from camera_distortion.util import discovery as discovery_module
+from camera_distortion.util.discovery import MediaDiscovery
+
+
+@pytest.fixture(name="media_folder")
+def media_folder_fixture(tmp_path):
+    """
+    Creates a folder with images, videos and other files
+    """
+    for file_name in [f"{idx:02d}.png" for idx in range(20)] + ["a.mp4", "b.avi", "c.txt"]:
+        (tmp_path / file_name).write_bytes(b"data")
+    return tmp_path
+
+
+def test_discovery(media_folder):
+    """
+    Tests that the images are streamed in order and the videos are collected
+    """
+    with MediaDiscovery(str(media_folder)) as discovery:
+        images = [os.path.basename(path) for path in discovery.iter_images()]
+        assert discovery.finished.is_set()
+        assert images == [f"{idx:02d}.png" for idx in range(20)]
+        assert [os.path.basename(path) for path in discovery.video_paths] == ["a.mp4", "b.avi"]
+        assert discovery.total == 22
+        assert discovery.progress(5) == "5/22"
+        assert str(discovery) == "20 images and 2 videos"
+
+
+def test_discovery_bounded(media_folder):
+    """
+    Tests that the discovery runs ahead of the processing by at most the size of its queue and
+    it can be stopped before it finishes
+    """
+    with MediaDiscovery(str(media_folder), queue_size=2) as discovery:
+        for processed, _ in enumerate(discovery.iter_images()):
+            # The queued images, the image waiting for space and the processed ones
+            assert discovery.num_of_images <= processed + 4
+            if processed == 3:
+                assert discovery.progress(processed).endswith("+")
+                break
+    assert discovery.num_of_images < 20
+
+
+def test_discovery_error(media_folder, monkeypatch):
+    """
+    Tests that the error of the discovery is raised after the images found before it
+    """
+
+    def failing_iter_media(paths):
+        yield str(media_folder / "00.png"), discovery_module.MediaType.IMAGE
+        raise OSError(f"Unable to list {paths}")
+
+    monkeypatch.setattr(discovery_module, "iter_media", failing_iter_media)
+    with MediaDiscovery(str(media_folder)) as discovery:
+        images = []
+        with pytest.raises(OSError):
+            for image_path in discovery.iter_images():
+                images.append(image_path)
+        assert images == [str(media_folder / "00.png")]
@@ -0,0 +1,89 @@
+"""
+Tests of the calibration frame selection
+"""
+
+__author__ = "Peter Kocsis"
+__copyright__ = "Peter Kocsis"
+__credits__ = ["MIT License"]
+__version__ = "0.1"
+__maintainer__ = "Peter Kocsis"
+__email__ = "peter.kocsis@tum.de"
+__status__ = "Released"
+
+import numpy as np
+
+from camera_distortion.frame_selection import (
+    FrameDetection,
+    pose_descriptor,
+    select_diverse_poses,
+    select_frames,
+)
+
+PATTERN_SIZE = (4, 3)
+FRAME_SIZE = (640, 480)
+
+
+def _pattern_corners(left: float, top: float, spacing: float) -> np.ndarray:
+    """
+    Creates the corners of a fronto-parallel pattern
+    :param left: The x coordinate of the first corner
+    :param top: The y coordinate of the first corner
+    :param spacing: The distance of the neighbouring corners
+    :returns: The corners in the order of the detection
+    """
+    x, y = np.meshgrid(np.arange(PATTERN_SIZE[0]), np.arange(PATTERN_SIZE[1]))
+    return np.column_stack((left + spacing * x.ravel(), top + spacing * y.ravel()))
+
+
+def test_pose_descriptor():
+    """
+    Tests the position, the size and the tilts of a fronto-parallel pattern
+    """
+    descriptor = pose_descriptor(
+        _pattern_corners(280, 200, 40), PATTERN_SIZE, FRAME_SIZE
+    )
+    np.testing.assert_allclose(descriptor[:2], [340 / 640, 240 / 480])
+    np.testing.assert_allclose(descriptor[2], np.sqrt(120 * 80 / (640 * 480)))
+    np.testing.assert_allclose(descriptor[3:], [0.0, 0.0], atol=1e-12)
+
+
+def test_select_diverse_poses():
+    """
+    Tests the greedy selection of the distinct poses
+    """
+    descriptors = np.array(
+        [
+            [0.5, 0.5, 0.3, 0.0, 0.0],
+            [0.1, 0.1, 0.3, 0.0, 0.0],
+            [1.0, 1.0, 0.3, 0.0, 0.0],
+            [0.5, 0.5, 0.3, 0.0, 0.0],
+        ]
+    )
+    # The farthest pose is selected next
+    assert select_diverse_poses(descriptors, 2) == [0, 2]
+    assert select_diverse_poses(descriptors, 3) == [0, 2, 1]
+    # The duplicate of a selected pose is never selected
+    assert select_diverse_poses(descriptors, 4) == [0, 2, 1]
+    assert select_diverse_poses(descriptors[[0, 3, 3]], 3) == [0]
+    assert select_diverse_poses(descriptors, 2, selected=[1]) == [1, 2]
+
+
+def test_select_frames():
+    """
+    Tests that the blurry frames are rejected and the sharpest frame of a pose is selected
+    """
+    positions = [(20, 20), (20, 20), (500, 20), (20, 380), (500, 380)]
+    sharpness = [10.0, 20.0, 15.0, 1.0, 12.0]
+    detections = [
+        FrameDetection(
+            idx,
+            frame_sharpness,
+            pose_descriptor(_pattern_corners(*position, 30), PATTERN_SIZE, FRAME_SIZE),
+        )
+        for idx, (position, frame_sharpness) in enumerate(zip(positions, sharpness))
+    ]
+    selected = select_frames(detections, 3)
+    # The second frame is sharper than the first one of the same pose,
+    # the fourth frame is too blurry, the selection is in the order of the frames
+    assert [detection.frame_idx for detection in selected] == [1, 2, 4]
+    assert select_frames([], 3) == []
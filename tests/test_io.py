@@ -0,0 +1,74 @@
+"""
+Tests of finding the media files
+"""
+__author__ = "Peter Kocsis"
+__copyright__ = "Peter Kocsis"
+__credits__ = ["MIT License"]
+__version__ = "0.1"
+__maintainer__ = "Peter Kocsis"
+__email__ = "peter.kocsis@tum.de"
+__status__ = "Released"
+
+import os
+
+import pytest
+
+from camera_distortion.util.io import MediaType, find_files, find_media, iter_media
+
+FILE_NAMES = [
+    "b.JPG",
+    "a.png",
+    "notes.txt",
+    os.path.join("sub_b", "c.mp4"),
+    os.path.join("sub_a", "nested", "d.jpg"),
+    os.path.join("sub_a", "e.avi"),
+]
+
+
+@pytest.fixture(name="media_folder")
+def media_folder_fixture(tmp_path):
+    """
+    Creates a folder tree with media and other files
+    """
+    for file_name in FILE_NAMES:
+        path = tmp_path / file_name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(b"data")
+    return tmp_path
+
+
+def test_find_files_order(media_folder):
+    """
+    Tests that the files of a folder come in the order of their names before the subfolders
+    """
+    found = [os.path.relpath(path, media_folder) for path in find_files(str(media_folder))]
+    assert found == [
+        "a.png",
+        "b.JPG",
+        "notes.txt",
+        os.path.join("sub_a", "e.avi"),
+        os.path.join("sub_a", "nested", "d.jpg"),
+        os.path.join("sub_b", "c.mp4"),
+    ]
+
+
+def test_find_files_filters(media_folder):
+    """
+    Tests the case-insensitive filtering by the extensions, the single files and path-like paths
+    """
+    found = find_files([media_folder / "sub_a", str(media_folder / "b.JPG")], [".JPG"])
+    assert found == [str(media_folder / "sub_a" / "nested" / "d.jpg"), str(media_folder / "b.JPG")]
+    assert all(isinstance(path, str) for path in found)
+    assert find_files(media_folder / "missing.jpg") == [str(media_folder / "missing.jpg")]
+
+
+def test_find_media(media_folder):
+    """
+    Tests the classification of the media files in a single traversal
+    """
+    images, videos = find_media(str(media_folder))
+    assert [os.path.basename(path) for path in images] == ["a.png", "b.JPG", "d.jpg"]
+    assert [os.path.basename(path) for path in videos] == ["e.avi", "c.mp4"]
+    assert dict(iter_media(str(media_folder / "sub_b"))) == {
+        str(media_folder / "sub_b" / "c.mp4"): MediaType.VIDEO
+    }
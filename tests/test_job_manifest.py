@@ -0,0 +1,99 @@
+"""
+Tests of the job manifest and the resumable batch undistortion
+"""
+__author__ = "Peter Kocsis"
+__copyright__ = "Peter Kocsis"
+__credits__ = ["MIT License"]
+__version__ = "0.1"
+__maintainer__ = "Peter Kocsis"
+__email__ = "peter.kocsis@tum.de"
+__status__ = "Released"
+
+import os
+
+from PIL import Image
+
+from camera_distortion.benchmark.benchmark import default_camera_model, synthetic_image
+from camera_distortion.undistortion.undistort import undistort
+from camera_distortion.util.job_manifest import JobManifest
+
+
+def test_job_manifest_resume(tmp_path):
+    """
+    Tests that only the successfully completed media files are skipped
+    """
+    manifest_path = str(tmp_path / "manifest.sqlite")
+    media_paths = [str(tmp_path / f"{name}.jpg") for name in ("a", "b", "c")]
+    output_paths = [str(tmp_path / f"{name}_out.jpg") for name in ("a", "b", "c")]
+    for path in media_paths + output_paths[:2]:
+        with open(path, "wb") as file:
+            file.write(b"data")
+    with JobManifest(manifest_path, "crop=0.5") as manifest:
+        assert not any(map(manifest.is_completed, media_paths, output_paths))
+        manifest.record(media_paths[0], output_paths[0], None)
+        manifest.record(media_paths[1], output_paths[1], "failed")
+    # The rerun skips only the successful media file
+    with JobManifest(manifest_path, "crop=0.5") as manifest:
+        assert len(manifest) == 2
+        assert manifest.is_completed(media_paths[0], output_paths[0])
+        assert not manifest.is_completed(media_paths[1], output_paths[1])
+        assert not manifest.is_completed(media_paths[2], output_paths[2])
+    # Different settings, a modified input or a removed output are processed again
+    with JobManifest(manifest_path, "crop=0.0") as manifest:
+        assert not manifest.is_completed(media_paths[0], output_paths[0])
+    with open(media_paths[0], "ab") as file:
+        file.write(b"modified")
+    with JobManifest(manifest_path, "crop=0.5") as manifest:
+        assert not manifest.is_completed(media_paths[0], output_paths[0])
+        manifest.record(media_paths[0], output_paths[0], None)
+        assert manifest.is_completed(media_paths[0], output_paths[0])
+        os.remove(output_paths[0])
+        assert not manifest.is_completed(media_paths[0], output_paths[0])
+
+
+def test_job_manifest_corrupt(tmp_path):
+    """
+    Tests that a corrupt manifest is recreated
+    """
+    manifest_path = str(tmp_path / "manifest.sqlite")
+    with open(manifest_path, "wb") as file:
+        file.write(b"not a database" * 100)
+    with JobManifest(manifest_path, "") as manifest:
+        assert len(manifest) == 0
+
+
+def _save_image(path: str, image_size: tuple):
+    """
+    Saves a synthetic image with the meta-data required by the undistortion
+    :param path: The path of the image
+    :param image_size: The size of the image (width, height)
+    """
+    exif = Image.Exif()
+    exif[0x010F] = "camera_distortion"
+    Image.fromarray(synthetic_image(image_size)).save(path, exif=exif.tobytes())
+
+
+def test_undistort_resume(tmp_path):
+    """
+    Tests that a rerun of the batch undistortion skips the completed media files
+    """
+    parameters_file = str(tmp_path / "parameters.json")
+    default_camera_model().save(parameters_file)
+    media_folder = tmp_path / "media"
+    media_folder.mkdir()
+    for name in ("a", "b", "c"):
+        _save_image(str(media_folder / f"{name}.jpg"), (64, 48))
+    out_folder = str(tmp_path / "undistorted")
+
+    summary = undistort(str(media_folder), out_folder, parameters_file, 0.5)
+    assert (summary.succeeded, summary.skipped) == (3, 0)
+    summary = undistort(str(media_folder), out_folder, parameters_file, 0.5)
+    assert (summary.succeeded, summary.skipped) == (0, 3)
+    # A modified input is undistorted again, so is every input with other settings
+    _save_image(str(media_folder / "a.jpg"), (32, 24))
+    summary = undistort(str(media_folder), out_folder, parameters_file, 0.5)
+    assert (summary.succeeded, summary.skipped) == (1, 2)
+    summary = undistort(str(media_folder), out_folder, parameters_file, 0.0)
+    assert (summary.succeeded, summary.skipped) == (3, 0)
+    summary = undistort(str(media_folder), out_folder, parameters_file, 0.0, resume=False)
+    assert (summary.succeeded, summary.skipped) == (3, 0)
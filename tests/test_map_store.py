@@ -0,0 +1,70 @@
+"""
+Tests of the persistent store of the undistortion maps
+"""
+__author__ = "Peter Kocsis"
+__copyright__ = "Peter Kocsis"
+__credits__ = ["MIT License"]
+__version__ = "0.1"
+__maintainer__ = "Peter Kocsis"
+__email__ = "peter.kocsis@tum.de"
+__status__ = "Released"
+
+import os
+
+import numpy as np
+
+from camera_distortion.benchmark.benchmark import default_camera_model
+from camera_distortion.camera_model import CameraModel
+from camera_distortion.util.map_store import MapStore
+
+
+def test_round_trip(tmp_path):
+    """
+    Tests that the saved maps are loaded as read-only memory-maps
+    """
+    store = MapStore(str(tmp_path))
+    maps = (np.arange(12, dtype=np.float32).reshape(3, 4), np.ones((3, 4), dtype=np.float32))
+    assert store.load(("key", 1)) is None
+    store.save(("key", 1), maps)
+    assert ("key", 1) in store and ("key", 2) not in store
+    loaded = store.load(("key", 1))
+    assert len(loaded) == 2
+    for loaded_map, saved_map in zip(loaded, maps):
+        assert isinstance(loaded_map, np.memmap)
+        assert not loaded_map.flags.writeable
+        np.testing.assert_array_equal(loaded_map, saved_map)
+    assert store.size() == sum(size for _, size, _ in store.entries())
+
+
+def test_eviction(tmp_path):
+    """
+    Tests that the least recently used entries are removed when the store is full
+    """
+    maps = (np.zeros(1000, dtype=np.uint8),)
+    store = MapStore(str(tmp_path))
+    for idx in range(3):
+        store.save(idx, maps)
+        entry_path = store.entries()[-1][0]
+        os.utime(entry_path, (idx, idx))
+    entry_size = store.entries()[0][1]
+    store.max_bytes = 2 * entry_size
+    store.evict()
+    assert 0 not in store and 1 in store and 2 in store
+    store.clear()
+    assert not store.entries()
+
+
+def test_camera_model_store(tmp_path):
+    """
+    Tests that the maps of a model are taken from the store once they are saved
+    """
+    CameraModel.map_cache.clear()
+    camera_model = default_camera_model()
+    camera_model.map_store = MapStore(str(tmp_path))
+    maps = camera_model.get_undistortion_mapping((64, 48), 0.5)
+    assert len(camera_model.map_store.entries()) == 1
+    CameraModel.map_cache.clear()
+    loaded = camera_model.get_undistortion_mapping((64, 48), 0.5)
+    assert all(isinstance(mapping, np.memmap) for mapping in loaded)
+    np.testing.assert_array_equal(loaded[0], maps[0])
+    np.testing.assert_array_equal(loaded[1], maps[1])
@@ -0,0 +1,58 @@
+"""
+Tests of the frame pipeline
+"""
+__author__ = "Peter Kocsis"
+__copyright__ = "Peter Kocsis"
+__credits__ = ["MIT License"]
+__version__ = "0.1"
+__maintainer__ = "Peter Kocsis"
+__email__ = "peter.kocsis@tum.de"
+__status__ = "Released"
+
+import time
+
+import numpy as np
+import pytest
+
+from camera_distortion.undistortion.pipeline import FramePipeline
+
+
+def test_pipeline_order():
+    """
+    Tests that the frames are written in their original order and the decoder does not run ahead
+    of the encoder, even if the first frame is processed slowly
+    """
+    decoded, written = [], []
+    in_flight = []
+
+    def frames():
+        for idx in range(100):
+            decoded.append(idx)
+            in_flight.append(len(decoded) - len(written))
+            yield np.full((4, 4), idx)
+
+    def process_frame(frame):
+        if frame[0, 0] == 0:
+            time.sleep(0.2)
+        return frame + 1
+
+    pipeline = FramePipeline(process_frame, workers=4, queue_size=2)
+    statistics = pipeline.run(frames(), lambda frame: written.append(int(frame[0, 0])))
+    assert written == list(range(1, 101))
+    assert max(in_flight) <= 4 + 2
+    assert statistics["remap"].frames == 100
+
+
+def test_pipeline_error():
+    """
+    Tests that the error of a stage is raised
+    """
+
+    def process_frame(frame):
+        if frame[0, 0] == 5:
+            raise ValueError("failed")
+        return frame
+
+    pipeline = FramePipeline(process_frame, workers=2, queue_size=2)
+    with pytest.raises(ValueError):
+        pipeline.run((np.full((4, 4), idx) for idx in range(100)), lambda frame: None)
@@ -0,0 +1,75 @@
+"""
+Tests of the bulk point distortion and undistortion
+"""
+__author__ = "Peter Kocsis"
+__copyright__ = "Peter Kocsis"
+__credits__ = ["MIT License"]
+__version__ = "0.1"
+__maintainer__ = "Peter Kocsis"
+__email__ = "peter.kocsis@tum.de"
+__status__ = "Released"
+
+import cv2
+import numpy as np
+
+from camera_distortion import point_distortion
+from camera_distortion.benchmark.benchmark import default_camera_model
+
+IMAGE_SIZE = (320, 240)
+
+
+def _normalized_grid() -> np.ndarray:
+    """
+    Creates a grid of normalized coordinates within the valid region of the default model
+    :returns: The coordinates, shape (N, 2)
+    """
+    x, y = np.meshgrid(np.linspace(-0.8, 0.8, 21), np.linspace(-0.6, 0.6, 21))
+    return np.column_stack((x.ravel(), y.ravel()))
+
+
+def test_point_distortion_round_trip():
+    """
+    Tests that the undistortion of the points inverts their distortion
+    """
+    coeffs = default_camera_model().distortion_coeffs
+    grid = _normalized_grid()
+    distorted = point_distortion.distort_points(grid, coeffs)
+    undistorted = point_distortion.undistort_points(distorted, coeffs)
+    np.testing.assert_allclose(undistorted, grid, atol=1e-7)
+
+
+def test_distort_points_matches_opencv():
+    """
+    Tests that the distortion of the points is the projection of OpenCV
+    """
+    coeffs = default_camera_model().distortion_coeffs
+    grid = _normalized_grid()
+    projected, _ = cv2.projectPoints(
+        np.column_stack((grid, np.ones(len(grid)))),
+        np.zeros(3),
+        np.zeros(3),
+        np.eye(3),
+        coeffs,
+    )
+    np.testing.assert_allclose(
+        point_distortion.distort_points(grid, coeffs), projected.reshape(-1, 2), atol=1e-9
+    )
+
+
+def test_distort_points_matches_maps():
+    """
+    Tests that the distorted pixels are the entries of the undistortion maps and the shape of
+    the points is kept
+    """
+    camera_model = default_camera_model()
+    map_x, map_y = camera_model.get_undistortion_mapping(IMAGE_SIZE, 0.5)
+    rng = np.random.default_rng(0)
+    pixels = np.stack(
+        (rng.integers(0, IMAGE_SIZE[0], (10, 20)), rng.integers(0, IMAGE_SIZE[1], (10, 20))),
+        axis=-1,
+    )
+    distorted = camera_model.distort_points(pixels.astype(np.float64), IMAGE_SIZE, 0.5)
+    assert distorted.shape == pixels.shape
+    x, y = pixels[..., 0], pixels[..., 1]
+    np.testing.assert_allclose(distorted[..., 0], map_x[y, x], atol=1e-3)
+    np.testing.assert_allclose(distorted[..., 1], map_y[y, x], atol=1e-3)
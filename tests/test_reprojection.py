@@ -0,0 +1,55 @@
+"""
+Tests of the reprojection error
+"""
+
+__author__ = "Peter Kocsis"
+__copyright__ = "Peter Kocsis"
+__credits__ = ["MIT License"]
+__version__ = "0.1"
+__maintainer__ = "Peter Kocsis"
+__email__ = "peter.kocsis@tum.de"
+__status__ = "Released"
+
+import cv2
+import numpy as np
+
+from camera_distortion.benchmark.benchmark import default_camera_model
+from camera_distortion.detection import CalibrationPoints
+from camera_distortion.reprojection import reprojection_error
+
+IMAGE_SIZE = (640, 480)
+
+
+def test_reprojection_error():
+    """
+    Tests the errors of the views against the projection of OpenCV view by view
+    """
+    camera_model = default_camera_model()
+    intrinsic_matrix = camera_model.scaled_intrinsic_matrix(IMAGE_SIZE)
+    x, y = np.meshgrid(np.arange(9), np.arange(6))
+    object_points = np.column_stack((x.ravel(), y.ravel(), np.zeros(x.size))).astype(np.float32)
+    rng = np.random.default_rng(0)
+    rvecs = rng.normal(0.0, 0.2, (3, 3))
+    tvecs = np.column_stack(
+        (rng.uniform(-5, -3, 3), rng.uniform(-3, -2, 3), rng.uniform(12, 16, 3))
+    )
+    image_points = []
+    for idx, (rvec, tvec) in enumerate(zip(rvecs, tvecs)):
+        projected, _ = cv2.projectPoints(
+            object_points, rvec, tvec, intrinsic_matrix, camera_model.distortion_coeffs
+        )
+        # Only the second view is displaced
+        image_points.append(projected + (0.3 if idx == 1 else 0.0))
+    points = CalibrationPoints([object_points] * 3, image_points, IMAGE_SIZE[::-1], ["a", "b", "c"])
+
+    error = reprojection_error(
+        points, rvecs, tvecs, intrinsic_matrix, camera_model.distortion_coeffs
+    )
+    np.testing.assert_allclose(error.view_errors, [0.0, 0.3 * np.sqrt(2), 0.0], atol=1e-4)
+    assert error.worst_views(1)[0][0] == "b"
+    np.testing.assert_allclose(error.view_residuals(1), 0.3, atol=1e-4)
+    np.testing.assert_allclose(error.rms, 0.3 * np.sqrt(2 / 3), atol=1e-4)
+    # The norm of the residuals of every view divided by its number of points, averaged
+    np.testing.assert_allclose(
+        error.total, 0.3 * np.sqrt(2 * len(object_points)) / len(object_points) / 3, atol=1e-4
+    )
@@ -0,0 +1,162 @@
+"""
+Tests of the undistortion service over HTTP
+"""
+__author__ = "Peter Kocsis"
+__copyright__ = "Peter Kocsis"
+__credits__ = ["MIT License"]
+__version__ = "0.1"
+__maintainer__ = "Peter Kocsis"
+__email__ = "peter.kocsis@tum.de"
+__status__ = "Released"
+
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from camera_distortion.benchmark.benchmark import default_camera_model, synthetic_image
+from camera_distortion.undistortion.service import (
+    ServiceError,
+    UndistortionClient,
+    UndistortionService,
+    create_server,
+)
+
+# Small image size, so the maps are computed fast
+IMAGE_SIZE = (64, 48)
+
+
+@pytest.fixture(name="client")
+def client_fixture():
+    """
+    Runs the service on a free port and creates its client
+    """
+    server = create_server(UndistortionService(max_concurrent=4), port=0)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield UndistortionClient(port=server.server_address[1], timeout=60.0)
+    finally:
+        server.shutdown()
+        server.server_close()
+        thread.join()
+
+
+@pytest.fixture(name="parameters_file")
+def parameters_file_fixture(tmp_path):
+    """
+    Saves the camera model of the benchmark
+    """
+    path = str(tmp_path / "parameters.json")
+    default_camera_model().save(path)
+    return path
+
+
+def _encoded_image(image_format: str, **save_parameters) -> bytes:
+    """
+    Encodes a synthetic image
+    :param image_format: The format of the image
+    :returns: The encoded image
+    """
+    output = BytesIO()
+    image = Image.fromarray(synthetic_image(IMAGE_SIZE))
+    image.save(output, format=image_format, **save_parameters)
+    return output.getvalue()
+
+
+def test_undistort_image(client, parameters_file):
+    """
+    Tests the undistortion of an image in memory
+    """
+    data = _encoded_image("PNG")
+    undistorted = client.undistort_bytes(data, parameters_file, crop=0.5)
+    expected = default_camera_model().undistort_image(np.asarray(Image.open(BytesIO(data))), 0.5)
+    with Image.open(BytesIO(undistorted)) as image:
+        assert image.format == "PNG"
+        np.testing.assert_array_equal(np.asarray(image), expected)
+
+
+def test_undistort_file(client, parameters_file, tmp_path):
+    """
+    Tests the undistortion of an image file, its meta-data is kept
+    """
+    # The meta-data is required to undistort a file
+    exif = Image.Exif()
+    exif[0x010F] = "camera_distortion"
+    media_path = str(tmp_path / "image.jpg")
+    with open(media_path, "wb") as image_file:
+        image_file.write(_encoded_image("JPEG", exif=exif.tobytes()))
+    out_folder = str(tmp_path / "undistorted")
+    output = client.undistort_file(media_path, out_folder, parameters_file, crop=0.5)
+    assert os.path.dirname(output) == out_folder
+    with Image.open(output) as image:
+        assert image.size == IMAGE_SIZE
+        assert image.getexif()[0x010F] == "camera_distortion"
+
+
+def test_concurrent_undistort_image(client, parameters_file):
+    """
+    Tests that the concurrent requests do not overwrite each other's output, the greyscale and
+    RGBA images share the memory of the pooled output buffers
+    """
+    camera_model = default_camera_model()
+    requests = []
+    for idx in range(24):
+        mode = "L" if idx % 2 == 0 else "RGBA"
+        image_data = np.random.default_rng(idx).integers(0, 256, (240, 320, 4), dtype=np.uint8)
+        output = BytesIO()
+        Image.fromarray(image_data).convert(mode).save(output, format="PNG")
+        requests.append(output.getvalue())
+    expected = [
+        camera_model.undistort_image(np.asarray(Image.open(BytesIO(data))), 0.5)
+        for data in requests
+    ]
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        responses = list(
+            executor.map(
+                lambda data: client.undistort_bytes(data, parameters_file, crop=0.5), requests
+            )
+        )
+    for response, expected_image in zip(responses, expected):
+        with Image.open(BytesIO(response)) as image:
+            np.testing.assert_array_equal(np.asarray(image), expected_image)
+
+
+def test_errors(client, parameters_file, tmp_path):
+    """
+    Tests the status of the failed requests
+    """
+    with pytest.raises(ServiceError) as error:
+        client._request("GET", "/unknown")  # pylint: disable=protected-access
+    assert error.value.status == 404
+    with pytest.raises(ServiceError) as error:
+        client.undistort_bytes(b"not an image", parameters_file)
+    assert error.value.status == 400
+    with pytest.raises(ServiceError) as error:
+        client.undistort_file(str(tmp_path / "missing.jpg"), str(tmp_path), parameters_file)
+    assert error.value.status == 404
+
+
+def test_metrics(client, parameters_file):
+    """
+    Tests the metrics of the requests
+    """
+    assert client.health()
+    client.undistort_bytes(_encoded_image("PNG"), parameters_file)
+    with pytest.raises(ServiceError):
+        client.undistort_bytes(b"not an image", parameters_file)
+    # The metrics of a request are recorded after its response is sent
+    metrics = client.metrics()
+    deadline = time.monotonic() + 10.0
+    while metrics["in_flight"] > 1 and time.monotonic() < deadline:
+        time.sleep(0.01)
+        metrics = client.metrics()
+    assert metrics["in_flight"] == 1
+    assert metrics["endpoints"]["/undistort/image"]["requests"] == 2
+    assert metrics["endpoints"]["/undistort/image"]["errors"] == 1
+    assert metrics["models"] == 1
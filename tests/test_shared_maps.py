@@ -0,0 +1,75 @@
+"""
+Tests of the undistortion maps shared between processes
+"""
+__author__ = "Peter Kocsis"
+__copyright__ = "Peter Kocsis"
+__credits__ = ["MIT License"]
+__version__ = "0.1"
+__maintainer__ = "Peter Kocsis"
+__email__ = "peter.kocsis@tum.de"
+__status__ = "Released"
+
+import pickle
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pytest
+
+from camera_distortion.util.shared_maps import (
+    SHARED_MEMORY_AVAILABLE,
+    SharedMapHandle,
+    SharedMapRegistry,
+)
+
+pytestmark = pytest.mark.skipif(
+    not SHARED_MEMORY_AVAILABLE, reason="Shared memory needs Python 3.8"
+)
+
+
+def _sums_in_worker(handle: SharedMapHandle) -> list:
+    """
+    Attaches to shared maps in a worker process
+    :param handle: The handle of the maps
+    :returns: The sums of the maps
+    """
+    with SharedMapRegistry() as registry:
+        return [float(shared_map.sum()) for shared_map in registry.attach(handle)]
+
+
+def test_publish_and_attach():
+    """
+    Tests that the published maps are attached without copying in this and in other processes
+    """
+    maps = (np.arange(12, dtype=np.float32).reshape(3, 4), np.ones((3, 4), dtype=np.float32))
+    with SharedMapRegistry() as owner:
+        handle = owner.publish("key", maps)
+        assert owner.publish("key", maps) is handle
+        assert handle.nbytes == sum(map_array.nbytes for map_array in maps)
+        handle = pickle.loads(pickle.dumps(handle))
+        with SharedMapRegistry() as registry:
+            attached = registry.attach(handle)
+            assert "key" in registry and registry.load("key") is attached
+            assert not any(attached_map.flags.writeable for attached_map in attached)
+            np.testing.assert_array_equal(attached[0], maps[0])
+            np.testing.assert_array_equal(attached[1], maps[1])
+            # The blocks can be closed only after the views are released
+            del attached
+        with ProcessPoolExecutor(max_workers=1) as executor:
+            assert executor.submit(_sums_in_worker, handle).result() == [66.0, 12.0]
+
+
+def test_close():
+    """
+    Tests that closing the owner unlinks the blocks, the views in use stay valid and their blocks
+    are closed when the registry is closed after the views are released
+    """
+    owner = SharedMapRegistry()
+    handle = owner.publish("key", (np.arange(12, dtype=np.float32),))
+    shared_map = owner.load("key")[0]
+    owner.close()
+    assert len(owner) == 0 and owner.load("key") is None
+    assert float(shared_map.sum()) == 66.0
+    with pytest.raises(FileNotFoundError):
+        SharedMapRegistry().attach(handle)
+    del shared_map
+    owner.close()
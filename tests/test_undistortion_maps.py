@@ -0,0 +1,101 @@
+"""
+Tests of the undistortion and redistortion maps and the undistortion in bands
+"""
+__author__ = "Peter Kocsis"
+__copyright__ = "Peter Kocsis"
+__credits__ = ["MIT License"]
+__version__ = "0.1"
+__maintainer__ = "Peter Kocsis"
+__email__ = "peter.kocsis@tum.de"
+__status__ = "Released"
+
+import cv2
+import numpy as np
+
+from camera_distortion.benchmark.benchmark import default_camera_model, synthetic_image
+from camera_distortion.camera_model import MapFormat
+
+IMAGE_SIZE = (320, 240)
+
+
+def _smooth_image(image_size: tuple) -> np.ndarray:
+    """
+    Creates an image whose neighbouring pixels differ slightly
+    :param image_size: The size of the image (width, height)
+    :returns: The image as numpy array
+    """
+    width, height = image_size
+    x, y = np.meshgrid(np.linspace(0, 4 * np.pi, width), np.linspace(0, 3 * np.pi, height))
+    channels = [np.sin(x), np.cos(y), np.sin(x + y)]
+    return np.stack([127.5 + 127.5 * channel for channel in channels], axis=-1).astype(np.uint8)
+
+
+def test_fixed_maps():
+    """
+    Tests that the fixed-point maps are the float maps within their precision and smaller
+    """
+    camera_model = default_camera_model()
+    float_maps = camera_model.get_undistortion_mapping(IMAGE_SIZE, 0.5)
+    fixed_maps = camera_model.get_undistortion_mapping(IMAGE_SIZE, 0.5, map_format=MapFormat.FIXED)
+    assert fixed_maps[0].dtype == np.int16 and fixed_maps[0].shape[2] == 2
+    assert sum(mapping.nbytes for mapping in fixed_maps) < sum(
+        mapping.nbytes for mapping in float_maps
+    )
+    map_x, map_y = cv2.convertMaps(*fixed_maps, cv2.CV_32FC1)
+    # The fixed-point maps have 1/32 pixel precision
+    np.testing.assert_allclose(map_x, float_maps[0], atol=1 / 32)
+    np.testing.assert_allclose(map_y, float_maps[1], atol=1 / 32)
+
+    image = _smooth_image(IMAGE_SIZE)
+    float_image = camera_model.undistort_image(image, 0.5).astype(int)
+    fixed_image = camera_model.undistort_image(image, 0.5, MapFormat.FIXED).astype(int)
+    assert np.abs(float_image - fixed_image).max() <= 2
+
+
+def test_tiled_undistortion():
+    """
+    Tests that the undistortion in bands is the same as the undistortion of the whole image
+    """
+    camera_model = default_camera_model()
+    image = synthetic_image(IMAGE_SIZE)
+    expected = camera_model.undistort_image(image, 0.5)
+    # Bands of a few rows, more bands than threads
+    for max_bytes, workers in ((20 * 1024, 2), (200 * 1024, None), (1024 ** 3, 1)):
+        tiled = camera_model.undistort_image_tiled(image, 0.5, max_bytes, workers)
+        np.testing.assert_array_equal(tiled, expected)
+    grey_image = image[..., 0]
+    np.testing.assert_array_equal(
+        camera_model.undistort_image_tiled(grey_image, 0.5, 20 * 1024, 2),
+        camera_model.undistort_image(grey_image, 0.5),
+    )
+
+
+def test_redistortion_maps():
+    """
+    Tests that the redistortion maps invert the undistortion
+    """
+    camera_model = default_camera_model()
+    map_x, map_y = camera_model.get_redistortion_mapping(IMAGE_SIZE, 0.5)
+    undistorted = np.stack((map_x, map_y), axis=-1).astype(np.float64)
+    # The corners of the distorted image can be outside of the undistorted image
+    valid = np.all((undistorted >= 0) & (undistorted <= np.array(IMAGE_SIZE) - 1), axis=-1)
+    assert valid.mean() > 0.5
+    y, x = np.nonzero(valid)
+    distorted = camera_model.distort_points(undistorted[valid], IMAGE_SIZE, 0.5)
+    np.testing.assert_allclose(distorted, np.column_stack((x, y)), atol=1e-3)
+
+
+def test_interpolated_redistortion_maps():
+    """
+    Tests that the interpolated redistortion maps are within the requested error
+    """
+    camera_model = default_camera_model()
+    exact_key = camera_model.mapping_key(IMAGE_SIZE, 0.5, redistort=True)
+    exact_maps = camera_model.get_redistortion_mapping(IMAGE_SIZE, 0.5)
+    camera_model.max_map_error = 0.05
+    assert camera_model.mapping_key(IMAGE_SIZE, 0.5, redistort=True) != exact_key
+    interpolated_maps = camera_model.get_redistortion_mapping(IMAGE_SIZE, 0.5)
+    # The pixels where the distortion can not be inverted are mapped far outside of the image
+    valid = np.all([np.abs(exact_map) < 2 * max(IMAGE_SIZE) for exact_map in exact_maps], axis=0)
+    for exact_map, interpolated_map in zip(exact_maps, interpolated_maps):
+        assert np.abs(interpolated_map - exact_map)[valid].max() <= 0.05
@@ -0,0 +1,67 @@
+"""
+Tests of the compiled undistortion plans
+"""
+__author__ = "Peter Kocsis"
+__copyright__ = "Peter Kocsis"
+__credits__ = ["MIT License"]
+__version__ = "0.1"
+__maintainer__ = "Peter Kocsis"
+__email__ = "peter.kocsis@tum.de"
+__status__ = "Released"
+
+import pickle
+
+import numpy as np
+
+from camera_distortion.benchmark.benchmark import default_camera_model, synthetic_image
+from camera_distortion.camera_model import CameraModel
+
+IMAGE_SIZE = (640, 480)
+
+
+def test_plan_round_trip():
+    """
+    Tests that the distortion of the pixels inverts their undistortion
+    """
+    plan = default_camera_model().compile(IMAGE_SIZE, 0.5)
+    # The corners of a strongly distorted image can be outside of the undistorted image
+    points = np.random.default_rng(0).uniform((160, 120), (480, 360), (1000, 2))
+    undistorted = plan.undistort_points(points)
+    assert np.isfinite(undistorted).all()
+    np.testing.assert_allclose(plan.distort_points(undistorted), points, atol=1e-4)
+    assert np.isnan(plan.undistort_points(np.array([[0.0, 0.0]]))).all()
+
+
+def test_plan_cache():
+    """
+    Tests that compiling the same undistortion again returns the cached plan
+    """
+    CameraModel.map_cache.clear()
+    camera_model = default_camera_model()
+    plan = camera_model.compile(IMAGE_SIZE, 0.5)
+    assert camera_model.compile(IMAGE_SIZE, 0.5) is plan
+    assert default_camera_model().compile(IMAGE_SIZE, 0.5) is plan
+    assert camera_model.compile(IMAGE_SIZE, 0.0) is not plan
+    assert camera_model.compile(IMAGE_SIZE, 0.5, use_cache=False) is not plan
+    assert CameraModel.map_cache.stats()["bytes"] == sum(
+        CameraModel.map_cache.get(key).nbytes
+        for key in (plan.key, camera_model.mapping_key(IMAGE_SIZE, 0.0))
+    )
+
+
+def test_plan_pickle():
+    """
+    Tests that an unpickled plan is the cached plan or is recompiled with the same maps
+    """
+    CameraModel.map_cache.clear()
+    plan = default_camera_model().compile(IMAGE_SIZE, 0.5)
+    data = pickle.dumps(plan)
+    assert len(data) < sum(mapping.nbytes for mapping in plan.maps) // 100
+    assert pickle.loads(data) is plan
+    CameraModel.map_cache.clear()
+    restored = pickle.loads(data)
+    assert restored is not plan
+    assert restored.roi == plan.roi
+    np.testing.assert_array_equal(restored.new_intrinsic_matrix, plan.new_intrinsic_matrix)
+    image = synthetic_image(IMAGE_SIZE)
+    np.testing.assert_array_equal(restored.apply(image), plan.apply(image))
@@ -0,0 +1,69 @@
+"""
+Tests of the selection of the calibration views
+"""
+
+__author__ = "Peter Kocsis"
+__copyright__ = "Peter Kocsis"
+__credits__ = ["MIT License"]
+__version__ = "0.1"
+__maintainer__ = "Peter Kocsis"
+__email__ = "peter.kocsis@tum.de"
+__status__ = "Released"
+
+import numpy as np
+
+from camera_distortion.reprojection import ReprojectionError
+from camera_distortion.view_selection import ViewSelectionStatistics, ViewSelector
+
+PATTERN_SIZE = (4, 3)
+IMAGE_SHAPE = (480, 640)
+
+
+def _pattern_corners(left: float, top: float) -> np.ndarray:
+    """
+    Creates the corners of a fronto-parallel pattern
+    :param left: The x coordinate of the first corner
+    :param top: The y coordinate of the first corner
+    :returns: The corners in the shape of the detection
+    """
+    x, y = np.meshgrid(np.arange(PATTERN_SIZE[0]), np.arange(PATTERN_SIZE[1]))
+    corners = np.column_stack((left + 60 * x.ravel(), top + 60 * y.ravel()))
+    return corners.astype(np.float32).reshape(-1, 1, 2)
+
+
+def test_view_selection():
+    """
+    Tests that the duplicate views are not novel and the detection completes with the coverage
+    """
+    selector = ViewSelector(max_views=4, coverage_target=0.4)
+    positions = [(10, 10), (10, 10), (440, 10), (10, 300), (440, 300)]
+    novel = []
+    for position in positions:
+        # Enough novel views are found only with the last view, which also meets the coverage
+        assert not selector.is_complete()
+        novel.append(selector.add(_pattern_corners(*position), PATTERN_SIZE, IMAGE_SHAPE))
+    assert novel == [True, False, True, True, True]
+    assert selector.is_complete()
+    assert selector.select() == [0, 2, 3, 4]
+    statistics = selector.statistics
+    assert statistics.detected_views == 5
+    assert statistics.novel_views == statistics.selected_views == 4
+    selector.stop_detection()
+    assert selector.statistics.stopped_early and not statistics.stopped_early
+    selector.reset()
+    assert selector.statistics == ViewSelectionStatistics()
+
+
+def test_outliers():
+    """
+    Tests that the views with outlier errors are dropped a limited number of times
+    """
+    selector = ViewSelector(max_outlier_iterations=1)
+    residuals = np.full((5 * 4, 2), 0.1)
+    residuals[8:12] = 2.0
+    error = ReprojectionError(residuals, np.repeat(np.arange(5), 4), list("abcde"))
+    assert selector.find_outliers(error) == [2]
+    assert selector.statistics.outlier_views == ("c",)
+    assert selector.find_outliers(error) == []
+    assert selector.statistics.outlier_iterations == 1
+    assert selector.statistics.initial_rms == selector.statistics.final_rms == error.rms